@@ -0,0 +1,224 @@
+"""
+Fake Telegram Bot API
+Local aiohttp stand-in for api.telegram.org: serves getUpdates to the bot,
+accepts sendMessage/editMessageText, and plays simulated users who tap
+Confirm after a configurable delay. Can answer a fraction of sends with 429.
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional
+from aiohttp import web
+
+class FakeTelegram:
+    """One fake Bot API server plus the simulated users talking to the bot"""
+
+    def __init__(
+        self,
+        confirm_delay: float = 0.0,
+        rate_limit_probability: float = 0.0,
+        retry_after: int = 1,
+        seed: Optional[int] = None
+    ):
+        self.confirm_delay = confirm_delay
+        self.rate_limit_probability = rate_limit_probability
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+        self._updates: List[Dict[str, Any]] = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_update = asyncio.Condition()
+        self.polling = asyncio.Event()
+
+        # Waiters keyed by what the driver expects the bot to do next
+        self._linked: Dict[int, asyncio.Future] = {}
+        self._prompted: Dict[str, asyncio.Future] = {}
+
+        self.counts: Dict[str, int] = {}
+        self.rate_limited = 0
+
+        self.app = web.Application()
+        self.app.router.add_post("/bot{token}/{method}", self.handle)
+        self.app.router.add_get("/bot{token}/{method}", self.handle)
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8081):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # Driver side
+
+    async def _push(self, update: Dict[str, Any]):
+        update["update_id"] = next(self._update_ids)
+        async with self._new_update:
+            self._updates.append(update)
+            self._new_update.notify_all()
+
+    @staticmethod
+    def _user(telegram_id: int) -> Dict[str, Any]:
+        return {"id": telegram_id, "is_bot": False, "first_name": f"user{telegram_id}", "username": f"user{telegram_id}"}
+
+    def expect_link(self, telegram_id: int) -> asyncio.Future:
+        """Future resolved when the bot tells telegram_id that linking succeeded"""
+        future = asyncio.get_running_loop().create_future()
+        self._linked[telegram_id] = future
+        return future
+
+    def expect_prompt(self, login_id: str) -> asyncio.Future:
+        """Future resolved (with the send time) when the login prompt reaches the user"""
+        future = self._prompted.get(login_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._prompted[login_id] = future
+        return future
+
+    async def send_start(self, telegram_id: int, token: str):
+        """The user opens the deep link: /start TOKEN"""
+        await self._push({
+            "message": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": telegram_id, "type": "private"},
+                "from": self._user(telegram_id),
+                "text": f"/start {token}",
+                "entities": [{"type": "bot_command", "offset": 0, "length": 6}]
+            }
+        })
+
+    async def _tap(self, telegram_id: int, message: Dict[str, Any], data: str):
+        if self.confirm_delay:
+            await asyncio.sleep(self.confirm_delay)
+        await self._push({
+            "callback_query": {
+                "id": str(next(self._message_ids)),
+                "from": self._user(telegram_id),
+                "chat_instance": str(telegram_id),
+                "data": data,
+                "message": message
+            }
+        })
+
+    # Bot API side
+
+    @staticmethod
+    async def _params(request: web.Request) -> Dict[str, Any]:
+        if request.content_type == "application/json":
+            return await request.json()
+        params = {}
+        for key, value in (await request.post()).items():
+            try:
+                params[key] = json.loads(value)
+            except (TypeError, ValueError):
+                params[key] = value
+        return params
+
+    @staticmethod
+    def _ok(result: Any) -> web.Response:
+        return web.json_response({"ok": True, "result": result})
+
+    def _maybe_rate_limit(self) -> Optional[web.Response]:
+        if self.rate_limit_probability and self.random.random() < self.rate_limit_probability:
+            self.rate_limited += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after}
+            }, status=429)
+        return None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.counts[method] = self.counts.get(method, 0) + 1
+        params = await self._params(request)
+        handler = getattr(self, f"_api_{method}", None)
+        if handler is None:
+            return self._ok(True)
+        return await handler(params)
+
+    async def _api_getMe(self, params):
+        return self._ok({"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"})
+
+    async def _api_getUpdates(self, params):
+        self.polling.set()
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+
+        # Telegram drops updates below the offset once they are acknowledged
+        self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates and timeout:
+            async with self._new_update:
+                try:
+                    await asyncio.wait_for(self._new_update.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        return self._ok(self._updates[:int(params.get("limit") or 100)])
+
+    async def _api_sendMessage(self, params):
+        limited = self._maybe_rate_limit()
+        if limited is not None:
+            return limited
+
+        chat_id = int(params["chat_id"])
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": params.get("text", "")
+        }
+
+        text = message["text"]
+        if text.startswith("✅ Registration successful"):
+            future = self._linked.pop(chat_id, None)
+            if future is not None and not future.done():
+                future.set_result(time.perf_counter())
+
+        markup = params.get("reply_markup") or {}
+        for row in markup.get("inline_keyboard", []):
+            for button in row:
+                data = button.get("callback_data", "")
+                if data.startswith("login_confirm:"):
+                    login_id = data.split(":", 1)[1]
+                    future = self.expect_prompt(login_id)
+                    if not future.done():
+                        future.set_result(time.perf_counter())
+                    message["reply_markup"] = markup
+                    asyncio.create_task(self._tap(chat_id, message, data))
+        return self._ok(message)
+
+    async def _api_editMessageText(self, params):
+        limited = self._maybe_rate_limit()
+        if limited is not None:
+            return limited
+        return self._ok({
+            "message_id": int(params.get("message_id") or 0),
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id") or 0), "type": "private"},
+            "text": params.get("text", "")
+        })
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the fake Telegram Bot API on its own")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--confirm-delay", type=float, default=0.0)
+    parser.add_argument("--rate-limit-probability", type=float, default=0.0)
+    args = parser.parse_args()
+
+    async def main():
+        fake = FakeTelegram(args.confirm_delay, args.rate_limit_probability)
+        await fake.start(port=args.port)
+        print(f"Fake Telegram Bot API on http://127.0.0.1:{args.port}/bot")
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
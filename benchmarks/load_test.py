@@ -0,0 +1,256 @@
+"""
+End-to-end load test
+Starts the API and the bot against the fake Telegram Bot API, then drives
+registrations and logins from concurrent clients and reports throughput
+and latency percentiles per stage. Runs fully offline.
+
+Usage:
+    python -m benchmarks.load_test --users 200 --logins 3 --concurrency 50
+    python -m benchmarks.load_test --mode combined --json results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+import httpx
+from benchmarks.fake_telegram import FakeTelegram
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+class Stage:
+    """Latency samples and wall time for one stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.samples: List[float] = []
+        self.errors = 0
+        self.started = None
+        self.finished = None
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now - seconds
+        self.finished = now
+
+    def summary(self) -> Dict[str, float]:
+        if not self.samples:
+            return {"count": 0, "errors": self.errors}
+        wall = max(self.finished - self.started, 1e-9)
+        return {
+            "count": len(self.samples),
+            "errors": self.errors,
+            "throughput_per_s": len(self.samples) / wall,
+            "p50_ms": percentile(self.samples, 50) * 1000,
+            "p95_ms": percentile(self.samples, 95) * 1000,
+            "p99_ms": percentile(self.samples, 99) * 1000
+        }
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.api_url = f"http://127.0.0.1:{args.api_port}"
+        self.fake = FakeTelegram(args.confirm_delay, args.rate_limit_probability, seed=args.seed)
+        self.stages = {name: Stage(name) for name in (
+            "register", "link", "start_login", "notify", "status", "login_total"
+        )}
+        self.processes: List[subprocess.Popen] = []
+        self.workdir = tempfile.mkdtemp(prefix="telelogin-bench-")
+
+    def _env(self) -> Dict[str, str]:
+        env = dict(os.environ)
+        env.update({
+            "PYTHONPATH": REPO_ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+            "BOT_TOKEN": "123456:bench",
+            "SECRET_KEY": env.get("SECRET_KEY", "bench-secret-key-not-for-production-use"),
+            "TELEGRAM_API_BASE_URL": f"http://127.0.0.1:{self.args.telegram_port}/bot",
+            "API_BASE_URL": self.api_url,
+            "BOT_NOTIFY_URL": f"http://127.0.0.1:{self.args.bot_port}/notify-login",
+            "BOT_HTTP_PORT": str(self.args.bot_port),
+            "TELEGRAM_GLOBAL_RATE": str(self.args.telegram_rate),
+            "TELEGRAM_PER_CHAT_RATE": str(self.args.per_chat_rate),
+            "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+            # Every simulated client shares 127.0.0.1
+            "LOGIN_LIMIT_PER_IP": "0",
+            "LOGIN_LIMIT_PER_USERNAME": "0",
+            "LOGIN_LIMIT_PER_TELEGRAM_ID": "0",
+            "REGISTER_LIMIT_PER_IP": "0"
+        })
+        return env
+
+    def _spawn(self, *command: str):
+        log = open(os.path.join(self.workdir, f"{command[1]}.log"), "w")
+        self.processes.append(subprocess.Popen(
+            [sys.executable, *command],
+            cwd=self.workdir,
+            env=self._env(),
+            stdout=log,
+            stderr=subprocess.STDOUT
+        ))
+
+    async def start(self):
+        await self.fake.start(port=self.args.telegram_port)
+        if self.args.mode == "combined":
+            self._spawn("-m", "src.combined", "--port", str(self.args.api_port))
+        else:
+            self._spawn("-m", "uvicorn", "src.app:app", "--port", str(self.args.api_port), "--log-level", "warning")
+            self._spawn("-m", "src.bot")
+
+        async with httpx.AsyncClient() as client:
+            deadline = time.monotonic() + 30
+            while time.monotonic() < deadline:
+                try:
+                    if (await client.get(f"{self.api_url}/")).status_code == 200 and self.fake.polling.is_set():
+                        return
+                except httpx.TransportError:
+                    pass
+                if any(process.poll() is not None for process in self.processes):
+                    break
+                await asyncio.sleep(0.1)
+        raise RuntimeError(f"Services did not start; see logs in {self.workdir}")
+
+    async def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        await self.fake.stop()
+
+    async def _timed(self, stage: str, coro):
+        start = time.perf_counter()
+        try:
+            result = await coro
+        except Exception:
+            self.stages[stage].errors += 1
+            raise
+        self.stages[stage].record(time.perf_counter() - start)
+        return result
+
+    async def register(self, client: httpx.AsyncClient, index: int) -> int:
+        """POST /register, then open the deep link and wait for the bot's confirmation"""
+        telegram_id = 100000 + index
+        response = await self._timed("register", client.post("/register", json={"username": f"bench{index}"}))
+        response.raise_for_status()
+        token = response.json()["link"].split("start=", 1)[1].split("&", 1)[0]
+
+        linked = self.fake.expect_link(telegram_id)
+        sent = time.perf_counter()
+        await self.fake.send_start(telegram_id, token)
+        done = await asyncio.wait_for(linked, self.args.timeout)
+        self.stages["link"].record(done - sent)
+        return telegram_id
+
+    async def login(self, client: httpx.AsyncClient, index: int):
+        """start-login, wait for the prompt (the fake user taps Confirm), wait for approval"""
+        started = time.perf_counter()
+        response = await self._timed("start_login", client.post("/auth/start-login", json={"username": f"bench{index}"}))
+        response.raise_for_status()
+        login_id = response.json()["login_id"]
+
+        prompted = await asyncio.wait_for(self.fake.expect_prompt(login_id), self.args.timeout)
+        self.stages["notify"].record(prompted - started)
+
+        deadline = started + self.args.timeout
+        while True:
+            if self.args.status == "wait":
+                request = client.get(f"/status/{login_id}/wait", params={"timeout": self.args.timeout})
+            else:
+                request = client.get(f"/status/{login_id}")
+            status = (await self._timed("status", request)).json()
+            if status["status"] != "pending":
+                break
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"Login {login_id} still pending")
+            await asyncio.sleep(self.args.poll_interval)
+
+        if status["status"] != "approved":
+            raise RuntimeError(f"Login {login_id} ended as {status['status']}")
+        self.stages["login_total"].record(time.perf_counter() - started)
+
+    async def _run_all(self, func, items):
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+        limits = httpx.Limits(max_connections=self.args.concurrency, max_keepalive_connections=self.args.concurrency)
+
+        async with httpx.AsyncClient(base_url=self.api_url, timeout=self.args.timeout + 5, limits=limits) as client:
+            async def one(item):
+                async with semaphore:
+                    try:
+                        await func(client, item)
+                    except Exception as e:
+                        if self.args.verbose:
+                            print(f"  {func.__name__}({item}) failed: {e!r}", file=sys.stderr)
+
+            await asyncio.gather(*(one(item) for item in items))
+
+    async def run(self) -> Dict[str, Dict[str, float]]:
+        users = range(self.args.users)
+        await self._run_all(self.register, users)
+        await self._run_all(self.login, [user for _ in range(self.args.logins) for user in users])
+        results = {name: stage.summary() for name, stage in self.stages.items()}
+        results["telegram"] = {"calls": dict(self.fake.counts), "rate_limited": self.fake.rate_limited}
+        return results
+
+def print_report(results: Dict[str, Dict[str, float]]):
+    print(f"{'stage':<12} {'count':>7} {'errors':>6} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, summary in results.items():
+        if name == "telegram":
+            continue
+        if not summary["count"]:
+            print(f"{name:<12} {0:>7} {summary['errors']:>6}")
+            continue
+        print(
+            f"{name:<12} {summary['count']:>7} {summary['errors']:>6} {summary['throughput_per_s']:>9.1f} "
+            f"{summary['p50_ms']:>9.2f} {summary['p95_ms']:>9.2f} {summary['p99_ms']:>9.2f}"
+        )
+    print(f"telegram calls: {results['telegram']['calls']}, 429s: {results['telegram']['rate_limited']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="TeleLogin end-to-end load test")
+    parser.add_argument("--mode", choices=["split", "combined"], default="split")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--logins", type=int, default=3, help="Logins per user")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--confirm-delay", type=float, default=0.0, help="Seconds before the fake user taps Confirm")
+    parser.add_argument("--rate-limit-probability", type=float, default=0.0, help="Fraction of sends answered with 429")
+    parser.add_argument("--telegram-rate", type=float, default=1000.0, help="Bot's global send rate (Telegram allows 30/s)")
+    parser.add_argument("--per-chat-rate", type=float, default=1.0, help="Bot's per-chat send rate")
+    parser.add_argument("--status", choices=["poll", "wait"], default="poll", help="Poll /status/{id} or long-poll /status/{id}/wait")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=25.0)
+    parser.add_argument("--api-port", type=int, default=18000)
+    parser.add_argument("--bot-port", type=int, default=18001)
+    parser.add_argument("--telegram-port", type=int, default=18081)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Also write results to this file")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    async def run():
+        test = LoadTest(args)
+        await test.start()
+        try:
+            return await test.run()
+        finally:
+            await test.stop()
+
+    results = asyncio.run(run())
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Shard write benchmark
+Several processes (like API workers plus the bot) each run concurrent
+create_login_request + update_login_status loops against one database
+layout, and the combined write rate is reported per shard count
+
+Usage:
+    python -m benchmarks.shard_bench --shards 1 2 4 8 --processes 4 --seconds 5
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+def _worker(db_path: str, shards: int, seconds: float, concurrency: int, users: int, start_at: float, results):
+    from src.database.sharded import create_database
+
+    async def run() -> int:
+        db = create_database(db_path, shards)
+        await db.connect()
+        done = 0
+        await asyncio.sleep(max(0.0, start_at - time.time()))
+        deadline = time.monotonic() + seconds
+
+        async def loop():
+            nonlocal done
+            while time.monotonic() < deadline:
+                login_id = await db.create_login_request(random.randrange(1, users), datetime.utcnow() + timedelta(minutes=2))
+                await db.update_login_status(login_id, "approved", "token")
+                done += 2
+
+        await asyncio.gather(*(loop() for _ in range(concurrency)))
+        await db.close()
+        return done
+
+    results.put(asyncio.run(run()))
+
+def measure(shards: int, processes: int, seconds: float, concurrency: int, users: int) -> float:
+    """Writes per second across all processes"""
+    from src.database.sharded import create_database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "db.sqlite3")
+
+        async def init():
+            db = create_database(db_path, shards)
+            await db.init_db()
+            await db.close()
+        asyncio.run(init())
+
+        results = multiprocessing.Queue()
+        start_at = time.time() + 1.0
+        workers = [
+            multiprocessing.Process(target=_worker, args=(db_path, shards, seconds, concurrency, users, start_at, results))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        total = sum(results.get() for _ in workers)
+        for worker in workers:
+            worker.join()
+    return total / seconds
+
+def main():
+    parser = argparse.ArgumentParser(description="Login-request write throughput by shard count")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--processes", type=int, default=4, help="Writer processes")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent loops per process")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--users", type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"{'shards':>6} {'writes/s':>10} {'speedup':>8}")
+    baseline = None
+    for shards in args.shards:
+        rate = measure(shards, args.processes, args.seconds, args.concurrency, args.users)
+        baseline = baseline or rate
+        print(f"{shards:>6} {rate:>10.0f} {rate / baseline:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
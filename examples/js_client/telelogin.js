@@ -8,9 +8,11 @@ class TeleLoginClient {
     this.apiUrl = apiUrl;
     this.storage = storage === 'sessionStorage' ? sessionStorage : localStorage;
     this.storageKey = 'telelogin_session_token';
+    this.refreshStorageKey = 'telelogin_refresh_token';
     
-    // Load existing token from storage
+    // Load existing tokens from storage
     this.sessionToken = this.storage.getItem(this.storageKey);
+    this.refreshToken = this.storage.getItem(this.refreshStorageKey);
   }
 
   /**
@@ -34,6 +36,20 @@ class TeleLoginClient {
     }
   }
 
+  /**
+   * Set refresh token
+   * The API hands it out only once, so it has to be kept here
+   * @param {string} token 
+   */
+  setRefreshToken(token) {
+    this.refreshToken = token;
+    if (token) {
+      this.storage.setItem(this.refreshStorageKey, token);
+    } else {
+      this.storage.removeItem(this.refreshStorageKey);
+    }
+  }
+
   /**
    * Check if user is authenticated
    * @returns {boolean}
@@ -42,15 +58,75 @@ class TeleLoginClient {
     return !!this.sessionToken;
   }
 
+  /**
+   * Exchange the refresh token for a new session token and refresh token
+   * @returns {Promise<boolean>} false if there is no usable refresh token
+   */
+  async refresh() {
+    if (!this.refreshToken) {
+      return false;
+    }
+
+    const response = await fetch(`${this.apiUrl}/auth/refresh`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ refresh_token: this.refreshToken }),
+    });
+
+    if (response.status === 401) {
+      // Expired or revoked; the user has to log in through Telegram again
+      this.setToken(null);
+      this.setRefreshToken(null);
+      return false;
+    }
+    if (!response.ok) {
+      throw new Error(`Refresh failed: ${response.statusText}`);
+    }
+
+    const data = await response.json();
+    this.setToken(data.session_token);
+    this.setRefreshToken(data.refresh_token);
+    return true;
+  }
+
   /**
    * Logout user
+   * Ends the session on the server too when a refresh token is held
+   * @param {boolean} allSessions End every session of the user
    */
-  logout() {
+  async logout(allSessions = false) {
+    const refreshToken = this.refreshToken;
+    const sessionToken = this.sessionToken;
     this.setToken(null);
+    this.setRefreshToken(null);
+
+    if (!refreshToken) {
+      return;
+    }
+
+    try {
+      await fetch(`${this.apiUrl}/auth/logout`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+          refresh_token: refreshToken,
+          session_token: sessionToken,
+          all_sessions: allSessions
+        }),
+      });
+    } catch (error) {
+      // Local tokens are already gone; the session expires on its own
+      console.warn('Logout request failed:', error);
+    }
   }
 
   /**
    * Make authenticated API request
+   * A 401 triggers one refresh and retry when a refresh token is held
    * @param {string} endpoint 
    * @param {object} options Fetch options
    * @returns {Promise<Response>}
@@ -60,16 +136,20 @@ class TeleLoginClient {
       throw new Error('Not authenticated. Please login first.');
     }
 
-    const headers = {
-      'Content-Type': 'application/json',
-      'Authorization': `Bearer ${this.sessionToken}`,
-      ...(options.headers || {})
-    };
-
-    return fetch(`${this.apiUrl}${endpoint}`, {
+    const send = () => fetch(`${this.apiUrl}${endpoint}`, {
       ...options,
-      headers
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': `Bearer ${this.sessionToken}`,
+        ...(options.headers || {})
+      }
     });
+
+    const response = await send();
+    if (response.status === 401 && await this.refresh()) {
+      return send();
+    }
+    return response;
   }
 
   /**
@@ -100,6 +180,61 @@ class TeleLoginClient {
     }
   }
 
+  /**
+   * Random idempotency key for one login attempt
+   * @returns {string}
+   */
+  _newIdempotencyKey() {
+    if (crypto.randomUUID) {
+      return crypto.randomUUID();
+    }
+    const bytes = crypto.getRandomValues(new Uint8Array(16));
+    return Array.from(bytes, (b) => b.toString(16).padStart(2, '0')).join('');
+  }
+
+  /**
+   * Start a login request, retrying network errors and 503s
+   * Every retry repeats the attempt's idempotency key, so the API hands
+   * back the same login request instead of sending another Telegram prompt
+   * @param {string} username 
+   * @param {number} attempts 
+   * @returns {Promise<object>} start-login response
+   */
+  async startLogin(username, attempts = 3) {
+    const idempotencyKey = this._newIdempotencyKey();
+    let lastError = null;
+
+    for (let attempt = 0; attempt < attempts; attempt++) {
+      if (attempt > 0) {
+        await new Promise((resolve) => setTimeout(resolve, 1000 * attempt));
+      }
+
+      let response;
+      try {
+        response = await fetch(`${this.apiUrl}/auth/start-login`, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+          body: JSON.stringify({ username, idempotency_key: idempotencyKey }),
+        });
+      } catch (error) {
+        lastError = error;
+        continue;
+      }
+
+      if (response.ok) {
+        return response.json();
+      }
+      lastError = new Error(`Login failed: ${response.statusText}`);
+      if (response.status !== 503) {
+        break;
+      }
+    }
+
+    throw lastError;
+  }
+
   /**
    * Start login process
    * @param {string} username 
@@ -109,31 +244,20 @@ class TeleLoginClient {
   async login(username, onStatusChange = null) {
     try {
       // Start login
-      const response = await fetch(`${this.apiUrl}/auth/start-login`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({ username }),
-      });
-
-      if (!response.ok) {
-        throw new Error(`Login failed: ${response.statusText}`);
-      }
-
-      const data = await response.json();
+      const data = await this.startLogin(username);
       const loginId = data.login_id;
 
       if (onStatusChange) {
         onStatusChange('pending');
       }
 
-      // Poll for status
-      const result = await this.pollLoginStatus(loginId, onStatusChange);
+      // Wait for status (server push, falling back to polling)
+      const result = await this.waitForLoginStatus(loginId, onStatusChange);
       
-      // Store token if login successful
+      // Store tokens if login successful
       if (result.success && result.sessionToken) {
         this.setToken(result.sessionToken);
+        this.setRefreshToken(result.refreshToken);
       }
       
       return result;
@@ -143,6 +267,122 @@ class TeleLoginClient {
     }
   }
 
+  /**
+   * Wait for the login outcome
+   * Uses the Server-Sent Events stream when available, then the long-poll
+   * endpoint, and falls back to plain polling if neither works
+   * @param {string} loginId 
+   * @param {Function} onStatusChange 
+   * @returns {Promise<object>} Login result with status and session_token
+   */
+  async waitForLoginStatus(loginId, onStatusChange = null, timeout = 60000) {
+    try {
+      if (typeof EventSource !== 'undefined') {
+        return await this.streamLoginStatus(loginId, onStatusChange, timeout);
+      }
+      return await this.longPollLoginStatus(loginId, onStatusChange, timeout);
+    } catch (error) {
+      if (error.message === 'Login timeout') {
+        throw error;
+      }
+      console.warn('Push status unavailable, falling back to polling:', error);
+      return this.pollLoginStatus(loginId, onStatusChange, timeout);
+    }
+  }
+
+  /**
+   * Convert a final status payload into a login result
+   * @param {object} data Status payload from the API
+   * @returns {object|null} Login result, or null while still pending
+   */
+  _loginResult(data) {
+    if (data.status === 'approved') {
+      return {
+        success: true,
+        status: 'approved',
+        sessionToken: data.session_token || null,
+        // Only on the first status read after approval
+        refreshToken: data.refresh_token || null
+      };
+    }
+    if (['denied', 'expired'].includes(data.status)) {
+      return {
+        success: false,
+        status: data.status
+      };
+    }
+    return null;
+  }
+
+  /**
+   * Follow login status over Server-Sent Events
+   * @param {string} loginId 
+   * @param {Function} onStatusChange 
+   * @returns {Promise<object>} Login result with status and session_token
+   */
+  streamLoginStatus(loginId, onStatusChange = null, timeout = 60000) {
+    return new Promise((resolve, reject) => {
+      const source = new EventSource(`${this.apiUrl}/status/${loginId}/events`);
+      const timer = setTimeout(() => {
+        source.close();
+        reject(new Error('Login timeout'));
+      }, timeout);
+
+      source.addEventListener('status', (event) => {
+        const data = JSON.parse(event.data);
+
+        if (onStatusChange) {
+          onStatusChange(data.status);
+        }
+
+        const result = this._loginResult(data);
+        if (result) {
+          clearTimeout(timer);
+          source.close();
+          resolve(result);
+        }
+      });
+
+      source.onerror = () => {
+        clearTimeout(timer);
+        source.close();
+        reject(new Error('Status stream failed'));
+      };
+    });
+  }
+
+  /**
+   * Long-poll login status
+   * @param {string} loginId 
+   * @param {Function} onStatusChange 
+   * @returns {Promise<object>} Login result with status and session_token
+   */
+  async longPollLoginStatus(loginId, onStatusChange = null, timeout = 60000) {
+    const deadline = Date.now() + timeout;
+
+    while (Date.now() < deadline) {
+      const wait = Math.max(1, Math.min(25, Math.ceil((deadline - Date.now()) / 1000)));
+      const response = await fetch(`${this.apiUrl}/status/${loginId}/wait?timeout=${wait}`);
+
+      if (!response.ok) {
+        throw new Error('Status check failed');
+      }
+
+      const data = await response.json();
+
+      if (onStatusChange) {
+        onStatusChange(data.status);
+      }
+
+      const result = this._loginResult(data);
+      if (result) {
+        return result;
+      }
+    }
+
+    throw new Error('Login timeout');
+  }
+
   /**
    * Poll login status
    * @param {string} loginId 
@@ -170,26 +410,11 @@ class TeleLoginClient {
             onStatusChange(data.status);
           }
 
-          if (data.status === 'approved') {
+          const result = this._loginResult(data);
+          if (result) {
             clearInterval(interval);
-            
-            // Fetch the session token from the login request
-            // Note: In the current implementation, the token is returned when confirming
-            // Since we're polling status, we need to get it from the confirmed login
-            // For now, we'll need to modify the API to return the token in status
-            // Or store it when login is approved
-            
-            resolve({
-              success: true,
-              status: 'approved',
-              sessionToken: data.session_token || null
-            });
-          } else if (['denied', 'expired'].includes(data.status)) {
-            clearInterval(interval);
-            resolve({
-              success: false,
-              status: data.status
-            });
+            resolve(result);
+            return;
           }
 
           // Check timeout
@@ -241,6 +466,14 @@ if (client.isAuthenticated()) {
   console.log('Already logged in with token:', client.getToken());
 }
 
-// Logout
-client.logout();
+// Get a new session token when the old one expires (authenticatedRequest
+// also does this on its own after a 401)
+async function refresh() {
+  if (!await client.refresh()) {
+    console.log('Session ended, log in again');
+  }
+}
+
+// Logout (pass true to end every session of the user)
+await client.logout();
 */
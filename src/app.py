@@ -3,21 +3,71 @@ Backend API entrypoint
 FastAPI application main file
 """
 from fastapi import FastAPI
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from src.web.routes import router
+from src.web.routes import (
+    router,
+    db,
+    user_cache,
+    token_service,
+    auth_service,
+    introspection_service,
+    session_service,
+    rate_limiter
+)
+from src.utils.keys import get_keyring
+from src.utils.logger import setup_logging
+from src.utils.metrics import REGISTRY, CONTENT_TYPE
 from src.config import settings
-from src.database.sqlite import SQLiteDatabase
 
-# Initialize database
-db = SQLiteDatabase()
+setup_logging()
+
+# Set from the database on every scrape, so all workers report the same value
+PENDING_LOGINS = REGISTRY.gauge("telelogin_pending_logins", "Pending, unexpired login requests in the database")
+
+def register_metrics():
+    """Expose service statistics as scrape-time gauges and counters"""
+    REGISTRY.gauge("telelogin_login_waiters", "Login requests with a long-poll or SSE waiter").set_function(
+        lambda: auth_service.status_notifier.waiting
+    )
+    REGISTRY.register_stats(
+        "telelogin_notify_dispatcher", auth_service.dispatcher.stats, "Login notification dispatcher",
+        counters=("enqueued", "delivered", "failed", "dropped", "rejected", "retries")
+    )
+    REGISTRY.register_stats("telelogin_api_http_pool", auth_service.http_pool_stats, "API -> bot HTTP pool")
+    REGISTRY.register_stats(
+        "telelogin_user_cache", user_cache.stats, "User lookup cache",
+        counters=("hits", "misses", "evictions", "invalidations")
+    )
+    REGISTRY.register_stats(
+        "telelogin_introspection", introspection_service.stats, "Token introspection",
+        counters=("hits", "misses")
+    )
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Initialize database tables
+    # Startup: Initialize database tables and open the connection pool
     await db.init_db()
+    # Load signing keys now so a bad key directory fails the startup
+    get_keyring()
+    register_metrics()
+    await auth_service.start()
+    await introspection_service.refresh_revocations()
+    token_service.sweeper.start()
+    session_service.sweeper.start()
+    auth_service.sweeper.start()
+    introspection_service.refresher.start()
+    rate_limiter.sweeper.start()
     yield
-    # Shutdown: cleanup if needed
+    # Shutdown: stop background sweepers, then close HTTP and database connections
+    await rate_limiter.sweeper.stop()
+    await introspection_service.refresher.stop()
+    await auth_service.sweeper.stop()
+    await session_service.sweeper.stop()
+    await token_service.sweeper.stop()
+    await auth_service.close()
+    await db.close()
 
 app = FastAPI(
     title="TeleLogin",
@@ -42,6 +92,13 @@ app.include_router(router)
 async def root():
     return {"message": "TeleLogin API", "status": "running"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    PENDING_LOGINS.set(await auth_service.count_pending_logins())
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # log_config=None sends uvicorn's own loggers through the shared pipeline
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None)
@@ -2,65 +2,99 @@
 Manages registration and login confirmation via Telegram
 """
 import asyncio
-import sys
+import hashlib
+import hmac
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Set
 import logging
-import httpx
 from aiohttp import web
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes, MessageHandler, filters
 from src.config import settings
 from src.services.auth_service import AuthService
 from src.services.token_service import TokenService
-from src.database.sqlite import SQLiteDatabase
+from src.database.base import DatabaseInterface
+from src.database.sharded import create_database
 from src.services.user_service import UserService
-
-# Configure logging with immediate flush
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stderr)
-    ]
+from src.services.telegram_scheduler import (
+    TelegramSendScheduler, PRIORITY_LOGIN_PROMPT, PRIORITY_REPLY, PRIORITY_EDIT, PRIORITY_CLEANUP
 )
+from src.services.transports import ApiTransport, HttpApiTransport
+from src.utils.logger import setup_logging
+from src.utils.periodic import PeriodicTask
+from src.utils.metrics import REGISTRY, CONTENT_TYPE
+
 logger = logging.getLogger(__name__)
 
+BOT_COMMANDS = REGISTRY.counter("telelogin_bot_commands", "Bot commands and button taps handled", ["command"])
+BOT_NOTIFICATIONS = REGISTRY.counter("telelogin_bot_login_notifications", "Login notifications received from the API")
+PROMPTS_RETIRED = REGISTRY.counter(
+    "telelogin_bot_prompts_retired",
+    "Stale login prompts whose buttons were removed, by request status",
+    ["status"]
+)
+STALE_CALLBACKS = REGISTRY.counter(
+    "telelogin_bot_stale_callbacks",
+    "Button taps on finished login requests answered without calling the API"
+)
+
+# Text that replaces a retired prompt (and answers taps on its buttons)
+CLOSED_PROMPT_TEXT = {
+    "approved": "✅ This login request was confirmed.",
+    "denied": "🚫 This login request was denied.",
+    "expired": "⌛ This login request has expired.",
+    "superseded": "🔁 This login request was sent again; please use the newer message."
+}
+CLOSED_PROMPT_DEFAULT = "This login request is no longer active."
+
 class TeleLoginBot:
-    def __init__(self):
-        self.app = Application.builder().token(settings.BOT_TOKEN).build()
-        self.db = SQLiteDatabase()
+    def __init__(self, api: Optional[ApiTransport] = None, db: Optional[DatabaseInterface] = None):
+        builder = Application.builder().token(settings.BOT_TOKEN)
+        if settings.TELEGRAM_API_BASE_URL:
+            builder = builder.base_url(settings.TELEGRAM_API_BASE_URL)
+        self.app = builder.build()
+        self.db = db or create_database()
         self.auth_service = AuthService(self.db)
         self.user_service = UserService(self.db)
         self.token_service = TokenService()
-        # Use 'api' hostname for Docker network communication
-        api_port = getattr(settings, 'API_PORT', 8000)
-        self.api_base_url = f"http://api:{api_port}"
+        # Link/confirm/deny go to the API over HTTP unless an in-process
+        # transport is passed (see src/combined.py)
+        self.api = api or HttpApiTransport()
+        # Every outgoing Telegram call is paced through the scheduler
+        self.scheduler = TelegramSendScheduler()
+        
+        # Sent prompts are recorded so stale Confirm/Deny buttons can be retired
+        self.track_prompts = settings.PROMPT_RETIRE_INTERVAL_SECONDS > 0
+        self.prompt_retirer = PeriodicTask(
+            "login-prompt-retirer",
+            settings.PROMPT_RETIRE_INTERVAL_SECONDS,
+            self.retire_stale_prompts
+        )
+        # login_id -> final status, most recent last; taps on these never leave the process
+        self._final_logins: "OrderedDict[str, str]" = OrderedDict()
+        self._background: Set[asyncio.Task] = set()
         
         # HTTP server for receiving notifications
         self.web_app = web.Application()
         self.web_app.router.add_post('/notify-login', self.handle_login_notification)
+        self.web_app.router.add_get('/metrics', self.handle_metrics)
+        self._runner: Optional[web.AppRunner] = None
+        
+        # Webhook mode: Telegram pushes updates to the same aiohttp server
+        self.webhook_secret = settings.WEBHOOK_SECRET or hashlib.sha256(settings.BOT_TOKEN.encode()).hexdigest()
+        if settings.BOT_MODE == "webhook":
+            self.web_app.router.add_post(settings.WEBHOOK_PATH, self.handle_webhook_update)
         
         # Debug: print configuration
         logger.info(f"Bot username configured as: {settings.BOT_USERNAME}")
-        logger.info(f"API base URL: {self.api_base_url}")
+        logger.info(f"API transport: {type(self.api).__name__}")
         logger.info(f"Database URL: {settings.DB_URL}")
-        sys.stderr.flush()
         
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command with registration token"""
-        # Debug logging
-        logger.info("="*50)
-        logger.info("/start command received")
-        logger.info(f"Update user: {update.effective_user.id if update.effective_user else 'None'}")
-        logger.info(f"Message text: {update.message.text if update.message else 'No message'}")
-        logger.info(f"context.args = {context.args}")
-        logger.info(f"Number of args = {len(context.args) if context.args else 0}")
-        
-        # Additional debug - check if args are empty or contain empty strings
-        if context.args:
-            for i, arg in enumerate(context.args):
-                logger.info(f"arg[{i}] = '{arg}' (length={len(arg)})")
-        logger.info("="*50)
-        sys.stderr.flush()
+        BOT_COMMANDS.labels("start").inc()
+        logger.debug(f"/start from telegram_id={update.effective_user.id if update.effective_user else None}, args={len(context.args or [])}")
         
         if context.args and len(context.args) > 0 and context.args[0].strip():
             # Registration flow
@@ -68,56 +102,37 @@ class TeleLoginBot:
             telegram_id = update.effective_user.id
             username = update.effective_user.username or update.effective_user.first_name
             
-            logger.info(f"Processing registration for telegram_id={telegram_id}, username={username}")
-            logger.info(f"Token received (first 50 chars): {token[:50]}...")
-            logger.info(f"Token length={len(token)}")
-            logger.info(f"Calling API at: {self.api_base_url}/auth/link-telegram")
-            sys.stderr.flush()
+            logger.info(f"Processing registration for telegram_id={telegram_id}")
             
             try:
                 # Call API to link telegram account
-                logger.info("Making API call to link telegram account")
-                sys.stderr.flush()
+                linked, error_detail = await self.api.link_telegram(token, telegram_id)
                 
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        f"{self.api_base_url}/auth/link-telegram",
-                        json={
-                            "token": token,
-                            "telegram_id": telegram_id
-                        },
-                        timeout=10.0
+                if linked:
+                    self._reply(
+                        update,
+                        f"✅ Registration successful, {username}!\n\n"
+                        "Your Telegram account is now linked to TeleLogin.\n"
+                        "You can now use Telegram to confirm your logins."
+                    )
+                else:
+                    logger.error(f"API error={error_detail}")
+                    self._reply(
+                        update,
+                        f"❌ Registration failed: {error_detail}"
                     )
-                    
-                    logger.info(f"API response status={response.status_code}")
-                    sys.stderr.flush()
-                    
-                    if response.status_code == 200:
-                        await update.message.reply_text(
-                            f"✅ Registration successful, {username}!\n\n"
-                            "Your Telegram account is now linked to TeleLogin.\n"
-                            "You can now use Telegram to confirm your logins."
-                        )
-                    else:
-                        data = response.json()
-                        error_detail = data.get('detail', 'Unknown error')
-                        logger.error(f"API error={error_detail}")
-                        sys.stderr.flush()
-                        await update.message.reply_text(
-                            f"❌ Registration failed: {error_detail}"
-                        )
             except Exception as e:
                 logger.error(f"Exception during registration: {str(e)}", exc_info=True)
-                sys.stderr.flush()
-                await update.message.reply_text(
+                self._reply(
+                    update,
                     f"❌ Error during registration: {str(e)}\n"
                     "Please try again or contact support."
                 )
         else:
             # Welcome message
-            logger.info("No args received, sending welcome message")
-            sys.stderr.flush()
-            await update.message.reply_text(
+            logger.debug("No args received, sending welcome message")
+            self._reply(
+                update,
                 "👋 Welcome to TeleLogin!\n\n"
                 "This bot is used to confirm login requests.\n\n"
                 "📝 To register:\n"
@@ -133,11 +148,12 @@ class TeleLoginBot:
     
     async def link_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /link command with registration token as alternative to deep link"""
-        logger.info("/link command received")
-        sys.stderr.flush()
+        BOT_COMMANDS.labels("link").inc()
+        logger.debug("/link command received")
         
         if not context.args or len(context.args) == 0:
-            await update.message.reply_text(
+            self._reply(
+                update,
                 "❌ Please provide your registration token:\n"
                 "/link YOUR_TOKEN_HERE"
             )
@@ -148,46 +164,29 @@ class TeleLoginBot:
         telegram_id = update.effective_user.id
         username = update.effective_user.username or update.effective_user.first_name
         
-        logger.info(f"Processing /link registration for telegram_id={telegram_id}, username={username}")
-        logger.info(f"Token length={len(token)}")
-        sys.stderr.flush()
+        logger.info(f"Processing /link registration for telegram_id={telegram_id}")
         
         try:
             # Call API to link telegram account
-            logger.info("Making API call to link telegram account")
-            sys.stderr.flush()
+            linked, error_detail = await self.api.link_telegram(token, telegram_id)
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.api_base_url}/auth/link-telegram",
-                    json={
-                        "token": token,
-                        "telegram_id": telegram_id
-                    },
-                    timeout=10.0
+            if linked:
+                self._reply(
+                    update,
+                    f"✅ Registration successful, {username}!\n\n"
+                    "Your Telegram account is now linked to TeleLogin.\n"
+                    "You can now use Telegram to confirm your logins."
+                )
+            else:
+                logger.error(f"API error={error_detail}")
+                self._reply(
+                    update,
+                    f"❌ Registration failed: {error_detail}"
                 )
-                
-                logger.info(f"API response status={response.status_code}")
-                sys.stderr.flush()
-                
-                if response.status_code == 200:
-                    await update.message.reply_text(
-                        f"✅ Registration successful, {username}!\n\n"
-                        "Your Telegram account is now linked to TeleLogin.\n"
-                        "You can now use Telegram to confirm your logins."
-                    )
-                else:
-                    data = response.json()
-                    error_detail = data.get('detail', 'Unknown error')
-                    logger.error(f"API error={error_detail}")
-                    sys.stderr.flush()
-                    await update.message.reply_text(
-                        f"❌ Registration failed: {error_detail}"
-                    )
         except Exception as e:
             logger.error(f"Exception during /link registration: {str(e)}", exc_info=True)
-            sys.stderr.flush()
-            await update.message.reply_text(
+            self._reply(
+                update,
                 f"❌ Error during registration: {str(e)}\n"
                 "Please try again or contact support."
             )
@@ -195,59 +194,135 @@ class TeleLoginBot:
     async def button_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle button callbacks for login confirmation"""
         query = update.callback_query
-        await query.answer()
         
         # Parse callback data: "login_confirm:LOGIN_ID" or "login_deny:LOGIN_ID"
         action, login_id = query.data.split(":", 1)
+        BOT_COMMANDS.labels(action).inc()
         telegram_id = update.effective_user.id
         
+        # Known-finished requests (e.g. a double tap) are answered locally
+        status = self._final_logins.get(login_id)
+        if status is not None:
+            STALE_CALLBACKS.inc()
+            await query.answer(CLOSED_PROMPT_TEXT.get(status, CLOSED_PROMPT_DEFAULT))
+            return
+        await query.answer()
+        
         if action == "login_confirm":
             try:
                 # Call API to confirm login
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        f"{self.api_base_url}/auth/confirm-login",
-                        json={
-                            "login_id": login_id,
-                            "telegram_id": telegram_id
-                        },
-                        timeout=10.0
+                if await self.api.confirm_login(login_id, telegram_id):
+                    self._remember_final(login_id, "approved")
+                    self._edit(
+                        query,
+                        "✅ Login confirmed successfully!\n"
+                        "You can now access your account."
+                    )
+                else:
+                    self._remember_final(login_id, "closed")
+                    self._edit(
+                        query,
+                        "❌ Login confirmation failed.\n"
+                        "The request may have expired or is invalid."
                     )
-                    
-                    if response.status_code == 200:
-                        await query.edit_message_text(
-                            "✅ Login confirmed successfully!\n"
-                            "You can now access your account."
-                        )
-                    else:
-                        await query.edit_message_text(
-                            "❌ Login confirmation failed.\n"
-                            "The request may have expired or is invalid."
-                        )
             except Exception as e:
-                await query.edit_message_text(
+                self._edit(
+                    query,
                     f"❌ Error: {str(e)}"
                 )
+                return
         
         elif action == "login_deny":
             try:
-                # Update login status to denied
-                login_request = await self.db.get_login_request(login_id)
-                if login_request:
-                    await self.db.update_login_status(login_id, "denied")
-                    await query.edit_message_text(
+                # Call API to deny login so waiting clients are notified immediately
+                if await self.api.deny_login(login_id, telegram_id):
+                    self._remember_final(login_id, "denied")
+                    self._edit(
+                        query,
                         "🚫 Login request denied.\n"
                         "If this wasn't you, your account is secure."
                     )
                 else:
-                    await query.edit_message_text("❌ Login request not found.")
+                    self._remember_final(login_id, "closed")
+                    self._edit(
+                        query,
+                        "❌ Login request not found.\n"
+                        "It may have expired or already been answered."
+                    )
             except Exception as e:
-                await query.edit_message_text(f"❌ Error: {str(e)}")
+                self._edit(query, f"❌ Error: {str(e)}")
+                return
+        
+        # This message has been edited; keep the retirer from editing it again
+        if self.track_prompts and query.message is not None:
+            self._spawn(self.db.delete_login_prompt(login_id, query.message.chat.id, query.message.message_id))
+    
+    def _remember_final(self, login_id: str, status: str):
+        """Record a finished login request, evicting the oldest beyond FINAL_LOGIN_CACHE_SIZE"""
+        if settings.FINAL_LOGIN_CACHE_SIZE <= 0:
+            return
+        self._final_logins[login_id] = status
+        self._final_logins.move_to_end(login_id)
+        while len(self._final_logins) > settings.FINAL_LOGIN_CACHE_SIZE:
+            self._final_logins.popitem(last=False)
+    
+    def _spawn(self, coro) -> asyncio.Task:
+        """Run a bookkeeping coroutine in the background, logging failures"""
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background_done)
+        return task
+    
+    def _background_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Login prompt bookkeeping failed: {task.exception()}")
+    
+    async def retire_stale_prompts(self) -> int:
+        """
+        Replace the buttons of prompts whose request has finished, expired or
+        been re-sent, one batch of edits at a time so they trickle through
+        the scheduler behind user-facing traffic
+        """
+        retired = 0
+        while True:
+            prompts = await self.db.claim_stale_login_prompts(datetime.utcnow(), settings.PROMPT_RETIRE_BATCH_SIZE)
+            if not prompts:
+                break
+            
+            edits = []
+            for prompt in prompts:
+                status = prompt["status"]
+                if status != "superseded":
+                    self._remember_final(prompt["login_id"], status)
+                edits.append(self.scheduler.submit(
+                    prompt["chat_id"],
+                    lambda prompt=prompt: self.app.bot.edit_message_text(
+                        chat_id=prompt["chat_id"],
+                        message_id=prompt["message_id"],
+                        text=CLOSED_PROMPT_TEXT.get(prompt["status"], CLOSED_PROMPT_DEFAULT)
+                    ),
+                    priority=PRIORITY_CLEANUP
+                ))
+                PROMPTS_RETIRED.labels(status).inc()
+            
+            # Failed edits (message deleted, chat blocked) are not retried
+            results = await asyncio.gather(*edits, return_exceptions=True)
+            failed = sum(1 for result in results if isinstance(result, Exception))
+            if failed:
+                logger.debug(f"{failed} of {len(prompts)} prompt edits failed")
+            retired += len(prompts)
+            if len(prompts) < settings.PROMPT_RETIRE_BATCH_SIZE:
+                break
+        
+        if retired:
+            logger.info(f"Retired {retired} stale login prompts")
+        return retired
     
     async def send_login_notification(self, telegram_id: int, login_id: str, username: str):
         """Send login confirmation request to user"""
+        BOT_NOTIFICATIONS.inc()
         logger.info(f"Sending login notification to telegram_id={telegram_id}, login_id={login_id}")
-        sys.stderr.flush()
         
         keyboard = [
             [
@@ -257,18 +332,75 @@ class TeleLoginBot:
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        try:
-            await self.app.bot.send_message(
+        # Login prompts jump ahead of queued replies and edits
+        future = self.scheduler.submit(
+            telegram_id,
+            lambda: self.app.bot.send_message(
                 chat_id=telegram_id,
                 text=f"🔐 Login Request\n\n"
                      f"Username: {username}\n\n"
                      f"Do you want to confirm this login?",
                 reply_markup=reply_markup
-            )
-            logger.info("Login notification sent successfully")
-        except Exception as e:
-            logger.error(f"Failed to send notification: {e}", exc_info=True)
-        sys.stderr.flush()
+            ),
+            priority=PRIORITY_LOGIN_PROMPT
+        )
+        future.add_done_callback(self._log_send_result)
+        if self.track_prompts:
+            future.add_done_callback(lambda sent: self._track_prompt(login_id, sent))
+        return future
+    
+    def _track_prompt(self, login_id: str, future: asyncio.Future):
+        """Store the chat/message id of a delivered prompt for the retirer"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        message = future.result()
+        self._spawn(self.db.save_login_prompt(login_id, message.chat_id, message.message_id))
+    
+    def _log_send_result(self, future: asyncio.Future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            logger.error(f"Failed to send Telegram message: {future.exception()}")
+    
+    def _reply(self, update: Update, text: str, **kwargs) -> asyncio.Future:
+        """Queue a reply to the message in update"""
+        future = self.scheduler.submit(
+            update.effective_chat.id,
+            lambda: update.message.reply_text(text, **kwargs),
+            priority=PRIORITY_REPLY
+        )
+        future.add_done_callback(self._log_send_result)
+        return future
+    
+    def _edit(self, query, text: str, **kwargs) -> asyncio.Future:
+        """Queue an edit of the message a callback query came from"""
+        future = self.scheduler.submit(
+            query.message.chat.id,
+            lambda: query.edit_message_text(text, **kwargs),
+            priority=PRIORITY_EDIT
+        )
+        future.add_done_callback(self._log_send_result)
+        return future
+    
+    def http_pool_stats(self):
+        """Connection pool statistics for the bot -> API client"""
+        return self.api.pool_stats()
+    
+    def send_stats(self):
+        """Telegram send queue statistics"""
+        return self.scheduler.stats()
+    
+    def register_metrics(self):
+        """Expose send queue and HTTP pool statistics on /metrics"""
+        REGISTRY.register_stats(
+            "telelogin_telegram_scheduler", self.send_stats, "Telegram send scheduler",
+            counters=("sent", "failed", "rate_limited")
+        )
+        REGISTRY.register_stats("telelogin_bot_http_pool", self.http_pool_stats, "Bot -> API HTTP pool")
+    
+    async def handle_metrics(self, request):
+        """Prometheus scrape endpoint"""
+        return web.Response(body=REGISTRY.render().encode(), headers={"Content-Type": CONTENT_TYPE})
     
     async def handle_login_notification(self, request):
         """Handle HTTP POST requests to send login notifications"""
@@ -278,12 +410,13 @@ class TeleLoginBot:
             login_id = data.get('login_id')
             username = data.get('username')
             
-            logger.info(f"Received login notification request: telegram_id={telegram_id}, login_id={login_id}")
+            logger.debug(f"Received login notification request: telegram_id={telegram_id}, login_id={login_id}")
             
             if not all([telegram_id, login_id, username]):
                 return web.json_response({'error': 'Missing required fields'}, status=400)
             
-            # Send notification via Telegram
+            # Queue the prompt and answer right away; the scheduler paces
+            # and retries the Telegram call, so the API never re-sends it
             await self.send_login_notification(telegram_id, login_id, username)
             
             return web.json_response({'success': True})
@@ -291,6 +424,46 @@ class TeleLoginBot:
             logger.error(f"Error handling login notification: {e}", exc_info=True)
             return web.json_response({'error': str(e)}, status=500)
     
+    async def handle_webhook_update(self, request):
+        """Feed an update pushed by Telegram into the application's update queue"""
+        received = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not hmac.compare_digest(received, self.webhook_secret):
+            logger.warning("Rejected webhook call with a missing or wrong secret token")
+            return web.Response(status=403)
+        
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        
+        update = Update.de_json(data, self.app.bot)
+        if update is None:
+            return web.Response(status=400)
+        
+        # Answer at once; handlers run from the queue like polled updates
+        await self.app.update_queue.put(update)
+        return web.Response()
+    
+    async def _start_webhook(self) -> bool:
+        """Register the webhook with Telegram; False if it could not be set"""
+        if not settings.WEBHOOK_URL:
+            logger.error("BOT_MODE is webhook but WEBHOOK_URL is not set")
+            return False
+        
+        url = settings.WEBHOOK_URL.rstrip("/") + settings.WEBHOOK_PATH
+        try:
+            await self.app.bot.set_webhook(
+                url=url,
+                secret_token=self.webhook_secret,
+                allowed_updates=Update.ALL_TYPES
+            )
+        except Exception as e:
+            logger.error(f"Failed to set webhook {url}: {e}")
+            return False
+        
+        logger.info(f"Bot is now receiving updates via webhook at {url}")
+        return True
+    
     async def confirm_login(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle login confirmation callback"""
         # TODO: Implement login confirmation logic
@@ -299,39 +472,68 @@ class TeleLoginBot:
     async def start(self):
         """Initialize and start the bot"""
         logger.info("Initializing bot...")
-        sys.stderr.flush()
         
         # Initialize database
         await self.db.init_db()
         logger.info("Database initialized")
-        sys.stderr.flush()
+        
+        # Open shared HTTP client for API calls
+        await self.api.start()
+        self.scheduler.start()
+        if self.track_prompts:
+            self.prompt_retirer.start()
+        self.register_metrics()
         
         # Add handlers
         self.app.add_handler(CommandHandler("start", self.start_command))
         self.app.add_handler(CommandHandler("link", self.link_command))
         self.app.add_handler(CallbackQueryHandler(self.button_callback))
         logger.info("Handlers registered")
-        sys.stderr.flush()
         
-        # Start polling
         await self.app.initialize()
         await self.app.start()
-        await self.app.updater.start_polling()
         
-        logger.info("Bot is now running and polling for updates...")
-        sys.stderr.flush()
-        
-        # Start HTTP server for notifications
-        runner = web.AppRunner(self.web_app)
-        await runner.setup()
-        site = web.TCPSite(runner, '0.0.0.0', 8001)
+        # Start HTTP server for notifications (and webhook updates)
+        self._runner = web.AppRunner(self.web_app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '0.0.0.0', settings.BOT_HTTP_PORT)
         await site.start()
-        logger.info("HTTP notification server started on port 8001")
-        sys.stderr.flush()
+        logger.info(f"HTTP notification server started on port {settings.BOT_HTTP_PORT}")
         
-        # Run until stopped
-        await asyncio.Event().wait()
+        # Receive updates via webhook if configured, otherwise poll
+        # (start_polling removes any webhook left registered)
+        if settings.BOT_MODE != "webhook" or not await self._start_webhook():
+            await self.app.updater.start_polling()
+            logger.info("Bot is now running and polling for updates...")
+    
+    async def run(self):
+        """Start the bot and run until cancelled"""
+        try:
+            await self.start()
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
+    
+    async def stop(self):
+        """Stop polling and release bot resources"""
+        logger.info("Stopping bot...")
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        if self.app.updater and self.app.updater.running:
+            await self.app.updater.stop()
+        if self.app.running:
+            await self.app.stop()
+        await self.prompt_retirer.stop()
+        await self.scheduler.stop()
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        await self.app.shutdown()
+        await self.api.close()
+        await self.db.close()
+        logger.info("Bot stopped")
 
 if __name__ == "__main__":
+    setup_logging()
     bot = TeleLoginBot()
-    asyncio.run(bot.start())
+    asyncio.run(bot.run())
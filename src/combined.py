@@ -0,0 +1,51 @@
+"""
+Combined entrypoint
+Runs the FastAPI app and the Telegram bot in one process and event loop;
+login notifications and the bot's link/confirm/deny calls skip HTTP
+"""
+import asyncio
+import logging
+import uvicorn
+from src.app import app
+from src.bot import TeleLoginBot
+from src.services.transports import InProcessApiTransport, InProcessNotificationTransport
+from src.web.routes import db, auth_service, user_service, token_service
+
+logger = logging.getLogger(__name__)
+
+def create_combined(host: str = "0.0.0.0", port: int = 8000):
+    """Wire the bot and the API together and return (uvicorn server, bot)"""
+    bot = TeleLoginBot(
+        api=InProcessApiTransport(auth_service, user_service, token_service),
+        db=db
+    )
+    auth_service.notification_transport = InProcessNotificationTransport(bot.send_login_notification)
+
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_config=None))
+    return server, bot
+
+async def main(host: str = "0.0.0.0", port: int = 8000):
+    server, bot = create_combined(host, port)
+    # Start the API first so its lifespan initialises the shared database
+    api = asyncio.create_task(server.serve())
+    while not server.started and not api.done():
+        await asyncio.sleep(0.05)
+    if api.done():
+        # Startup failed (e.g. port in use); surface uvicorn's exit
+        await api
+        return
+
+    try:
+        await bot.start()
+        await api
+    finally:
+        await bot.stop()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the API and the bot in one process")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    asyncio.run(main(args.host, args.port))
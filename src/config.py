@@ -3,24 +3,116 @@ Configuration management
 Loads environment variables and application settings
 """
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Literal, Optional
 
 class Settings(BaseSettings):
     # Bot configuration
     BOT_TOKEN: str
     BOT_USERNAME: str = "YourBot"  # Telegram bot username (without @)
+    BOT_MODE: str = "polling"  # polling or webhook (falls back to polling if the webhook cannot be set)
+    WEBHOOK_URL: Optional[str] = None  # Public HTTPS base URL that reaches the bot's port 8001
+    WEBHOOK_PATH: str = "/telegram/webhook"
+    WEBHOOK_SECRET: Optional[str] = None  # Defaults to a value derived from BOT_TOKEN
+    BOT_HTTP_PORT: int = 8001  # Bot's notification/webhook/metrics server
+    TELEGRAM_API_BASE_URL: Optional[str] = None  # Bot API base (default https://api.telegram.org/bot); benchmarks point it at a fake
     
     # Database configuration (SQLite only)
     DB_URL: str = "sqlite:///db.sqlite3"
+    DB_POOL_SIZE: int = 4  # Read-only connections kept open per process
+    DB_SHARDS: int = 1  # Split login requests over this many files (opt-in; reshard with src.tools.reshard)
+    DB_BUSY_TIMEOUT_MS: int = 5000  # Wait this long for the write lock before failing
+    DB_CACHE_SIZE_KB: int = 16384  # Page cache per connection
+    DB_MMAP_SIZE: int = 268435456  # Memory-mapped I/O window (256 MiB)
+    DB_SYNCHRONOUS: Literal["NORMAL", "FULL"] = "NORMAL"  # FULL fsyncs every commit
+    DB_GROUP_COMMIT: bool = False  # Share one transaction between concurrent login-request writes
+    DB_GROUP_COMMIT_WINDOW_MS: float = 2.0  # How long a batch collects writes
+    DB_GROUP_COMMIT_MAX_BATCH: int = 64  # Writes per batch before it commits early
+    DB_MIGRATION_BATCH_SIZE: int = 5000  # Rows per transaction when a migration backfills data
+    USER_CACHE_SIZE: int = 10000  # Cached user lookups (0 disables the cache)
+    USER_CACHE_TTL_SECONDS: int = 300
     
     # Security
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Asymmetric access tokens (EdDSA/ES256, needs the cryptography package)
+    JWT_KEYS_DIR: Optional[str] = None  # Directory of <kid>.pem keys; unset = HS256 with SECRET_KEY
+    JWT_ACTIVE_KID: Optional[str] = None  # Key that signs new tokens (default: last published kid in sort order)
+    JWT_KEY_PUBLISH_SECONDS: Optional[int] = None  # New keys are verify-only this long (default: JWKS_MAX_AGE_SECONDS + JWT_KEYS_RELOAD_SECONDS)
+    JWT_KEYS_RELOAD_SECONDS: int = 60  # Re-scan JWT_KEYS_DIR this often (0 reads it once at startup)
+    JWKS_MAX_AGE_SECONDS: int = 300  # Cache-Control for /.well-known/jwks.json
+    
+    # Registration tokens
+    TOKEN_STORE: str = "sqlite"  # sqlite (shared between workers) or memory
+    REGISTRATION_TOKEN_EXPIRE_MINUTES: int = 30
+    TOKEN_SWEEP_INTERVAL_SECONDS: int = 60
+    REGISTER_BATCH_MAX: int = 5000  # Usernames per /register/batch call
+    
+    # Sessions (refresh tokens; stored like registration tokens, per TOKEN_STORE)
+    SESSIONS_ENABLED: bool = True  # Approved logins also get a refresh token
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30  # Sessions unused this long expire; every refresh restarts it
+    SESSION_SWEEP_INTERVAL_SECONDS: int = 3600
+    
+    # Rate limiting (sliding window; a limit of 0 disables it)
+    RATE_LIMIT_STORE: str = "memory"  # memory (per process) or sqlite (shared between workers)
+    RATE_LIMIT_MAX_KEYS: int = 100000  # Keys tracked in memory before the least recent are evicted
+    RATE_LIMIT_WINDOW_SECONDS: int = 60
+    LOGIN_LIMIT_PER_USERNAME: int = 5  # start-login calls per window
+    LOGIN_LIMIT_PER_TELEGRAM_ID: int = 5  # Telegram prompts per chat per window
+    LOGIN_LIMIT_PER_IP: int = 30
+    REGISTER_LIMIT_PER_IP: int = 10  # /register calls per window
+    REGISTER_BATCH_LIMIT_PER_IP: int = 5000  # Usernames per window via /register/batch (at least REGISTER_BATCH_MAX)
+    
+    # Session token introspection
+    INTROSPECT_CACHE_SIZE: int = 100000  # Decoded tokens cached until their exp (0 disables)
+    INTROSPECT_BATCH_MAX: int = 1000  # Tokens per /auth/introspect/batch call
+    REVOCATION_REFRESH_SECONDS: int = 5  # How quickly other workers' revocations are seen
+    
+    # Login requests
+    LOGIN_REQUEST_EXPIRE_SECONDS: int = 120  # Pending requests expire after this
+    LOGIN_REQUEST_RETENTION_DAYS: int = 30  # Rows older than this are deleted
+    LOGIN_SWEEP_INTERVAL_SECONDS: int = 30
+    LOGIN_SWEEP_BATCH_SIZE: int = 500  # Rows per write transaction while sweeping
+    LOGIN_COALESCE_WINDOW_SECONDS: int = 30  # start-login retries with the same idempotency key reuse a pending request this recent (0 disables)
+    LOGIN_RENOTIFY_COOLDOWN_SECONDS: int = 0  # Re-send the prompt of a reused request after this (0 never)
+    STATUS_LONG_POLL_MAX_SECONDS: int = 30  # Upper bound for /status/{login_id}/wait
+    STATUS_STREAM_KEEPALIVE_SECONDS: int = 15  # SSE keep-alive (and cross-worker re-read) interval
+    
+    # Service URLs (Docker network hostnames by default)
+    API_BASE_URL: str = "http://api:8000"
+    BOT_NOTIFY_URL: str = "http://bot:8001/notify-login"
+    
+    # Shared HTTP clients (bot <-> API)
+    HTTP_POOL_MAX_CONNECTIONS: int = 100
+    HTTP_POOL_MAX_KEEPALIVE: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP2: bool = False  # Requires the optional h2 package
+    
+    # Login notification dispatch (API -> bot)
+    NOTIFY_QUEUE_SIZE: int = 1000
+    NOTIFY_WORKERS: int = 4
+    NOTIFY_MAX_ATTEMPTS: int = 4
+    NOTIFY_BACKOFF_BASE_SECONDS: float = 0.5
+    NOTIFY_BACKOFF_MAX_SECONDS: float = 8.0
+    NOTIFY_QUEUE_OVERFLOW: str = "reject"  # reject (503), drop_newest or drop_oldest
+    
+    # Outgoing Telegram calls (bot)
+    TELEGRAM_GLOBAL_RATE: float = 30.0  # Messages per second across all chats
+    TELEGRAM_PER_CHAT_RATE: float = 1.0  # Messages per second to a single chat
+    TELEGRAM_PER_CHAT_BURST: int = 3
+    TELEGRAM_SEND_MAX_RETRIES: int = 3  # Re-sends after a RetryAfter (429) response
+    PROMPT_RETIRE_INTERVAL_SECONDS: int = 15  # Remove buttons from finished/expired prompts (0 disables, prompts go untracked)
+    PROMPT_RETIRE_BATCH_SIZE: int = 50  # Prompt edits queued per batch
+    FINAL_LOGIN_CACHE_SIZE: int = 10000  # Finished login IDs whose button taps are rejected without an API call
     
     # Application
     DEBUG: bool = False
     
+    # Logging
+    LOG_LEVEL: Optional[str] = None  # DEBUG, INFO, WARNING...; defaults to DEBUG if DEBUG else INFO
+    LOG_FORMAT: str = "text"  # text or json
+    LOG_DEBUG_SAMPLE_RATE: float = 1.0  # Fraction of DEBUG records kept per call site
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,5 +1,48 @@
 """Database module"""
 from src.database.base import DatabaseInterface
 from src.database.sqlite import SQLiteDatabase
+from src.database.cached import CachedDatabase
+from src.database.sharded import ShardedSQLiteDatabase, create_database
+from src.database.token_store import TokenStore, InMemoryTokenStore, SQLiteTokenStore, create_token_store
+from src.database.rate_limit_store import (
+    RateLimitStore,
+    InMemoryRateLimitStore,
+    SQLiteRateLimitStore,
+    create_rate_limit_store
+)
+from src.database.revocation_store import (
+    RevocationStore,
+    InMemoryRevocationStore,
+    SQLiteRevocationStore,
+    create_revocation_store
+)
+from src.database.session_store import (
+    SessionStore,
+    InMemorySessionStore,
+    SQLiteSessionStore,
+    create_session_store
+)
 
-__all__ = ["DatabaseInterface", "SQLiteDatabase"]
+__all__ = [
+    "DatabaseInterface",
+    "SQLiteDatabase",
+    "CachedDatabase",
+    "ShardedSQLiteDatabase",
+    "create_database",
+    "TokenStore",
+    "InMemoryTokenStore",
+    "SQLiteTokenStore",
+    "create_token_store",
+    "RevocationStore",
+    "InMemoryRevocationStore",
+    "SQLiteRevocationStore",
+    "create_revocation_store",
+    "SessionStore",
+    "InMemorySessionStore",
+    "SQLiteSessionStore",
+    "create_session_store",
+    "RateLimitStore",
+    "InMemoryRateLimitStore",
+    "SQLiteRateLimitStore",
+    "create_rate_limit_store"
+]
@@ -3,9 +3,16 @@ Abstract database interface
 Defines CRUD operations for users and login requests
 """
 from abc import ABC, abstractmethod
-from typing import Optional, List
+from datetime import datetime
+from typing import AsyncIterator, Dict, Optional, List, Tuple
 from src.models.user import User
 
+# Columns exchanged by export_rows/import_rows, in file order
+EXPORT_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "users": ("id", "username", "telegram_id", "created_at", "linked_at"),
+    "login_requests": ("id", "user_id", "status", "session_token", "created_at", "expires_at")
+}
+
 class DatabaseInterface(ABC):
     """Abstract base class for database operations"""
     
@@ -14,6 +21,19 @@ class DatabaseInterface(ABC):
         """Create a new user"""
         pass
     
+    @abstractmethod
+    async def create_user_if_absent(self, username: str) -> Optional[User]:
+        """Atomically create a user, returning None if the username is taken"""
+        pass
+    
+    @abstractmethod
+    async def create_users_if_absent(self, usernames: List[str]) -> List[Optional[User]]:
+        """
+        Create several users in one transaction
+        Returns one entry per username, in order: the new User, or None if taken
+        """
+        pass
+    
     @abstractmethod
     async def get_user_by_username(self, username: str) -> Optional[User]:
         """Get user by username"""
@@ -30,8 +50,18 @@ class DatabaseInterface(ABC):
         pass
     
     @abstractmethod
-    async def create_login_request(self, user_id: int) -> str:
-        """Create a login request and return login_id"""
+    async def link_telegram_id_if_unclaimed(self, user_id: int, telegram_id: int) -> bool:
+        """Atomically link Telegram ID to user unless another user holds it"""
+        pass
+    
+    @abstractmethod
+    async def create_login_request(
+        self,
+        user_id: int,
+        expires_at: Optional[datetime] = None,
+        client_key: Optional[str] = None
+    ) -> str:
+        """Create a login request (tagged with the caller's hashed idempotency key) and return login_id"""
         pass
     
     @abstractmethod
@@ -39,7 +69,102 @@ class DatabaseInterface(ABC):
         """Get login request by ID"""
         pass
     
+    @abstractmethod
+    async def get_recent_pending_login_request(
+        self,
+        user_id: int,
+        client_key: str,
+        created_after: datetime,
+        now: datetime
+    ) -> Optional[dict]:
+        """
+        Newest pending, unexpired request of user_id with this client_key
+        created at or after created_after
+        """
+        pass
+
     @abstractmethod
     async def update_login_status(self, login_id: str, status: str) -> bool:
         """Update login request status"""
         pass
+    
+    @abstractmethod
+    async def confirm_login_request(
+        self,
+        login_id: str,
+        user_id: Optional[int],
+        session_token: Optional[str],
+        now: datetime,
+        refresh_token: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Atomically approve (owner matches) or deny a pending, unexpired request
+        Returns the new status, or None if it was not pending
+        """
+        pass
+    
+    @abstractmethod
+    async def deny_login_request(self, login_id: str, user_id: int, now: datetime) -> bool:
+        """Atomically deny a pending, unexpired request owned by user_id"""
+        pass
+    
+    @abstractmethod
+    async def expire_login_requests(self, now: datetime, limit: int) -> List[str]:
+        """Mark overdue pending login requests as expired and return their IDs"""
+        pass
+    
+    @abstractmethod
+    async def take_login_refresh_token(self, login_id: str) -> Optional[str]:
+        """Atomically read and clear an approved request's refresh token (None if already taken)"""
+        pass
+    
+    @abstractmethod
+    async def count_pending_login_requests(self, now: datetime) -> int:
+        """Number of pending login requests that have not expired yet"""
+        pass
+    
+    @abstractmethod
+    async def clear_login_refresh_tokens(self, expired_before: datetime, limit: int) -> int:
+        """Drop the refresh tokens held by requests whose deadline is before the cutoff"""
+        pass
+    
+    @abstractmethod
+    async def purge_login_requests(self, created_before: datetime, limit: int) -> int:
+        """Delete login requests older than the cutoff and return the count"""
+        pass
+    
+    @abstractmethod
+    async def save_login_prompt(self, login_id: str, chat_id: int, message_id: int):
+        """Remember the Telegram message that shows a login request's Confirm/Deny buttons"""
+        pass
+    
+    @abstractmethod
+    async def delete_login_prompt(self, login_id: str, chat_id: int, message_id: int):
+        """Forget a prompt message (its buttons were used or already replaced)"""
+        pass
+    
+    @abstractmethod
+    async def claim_stale_login_prompts(self, now: datetime, limit: int) -> List[dict]:
+        """
+        Remove up to limit prompts whose request is no longer pending (or has
+        a newer prompt in the same chat) and return them
+        Each dict has login_id, chat_id, message_id and the request's status:
+        approved, denied, expired or superseded
+        """
+        pass
+    
+    @abstractmethod
+    def export_rows(self, table: str, chunk_size: int) -> AsyncIterator[List[dict]]:
+        """
+        Yield every row of an EXPORT_COLUMNS table in chunks of at most chunk_size
+        Rows come in a stable key order and memory use does not grow with the table
+        """
+        pass
+    
+    @abstractmethod
+    async def import_rows(self, table: str, rows: List[dict]) -> int:
+        """
+        Insert rows into an EXPORT_COLUMNS table in one transaction
+        Rows whose key or username already exists are skipped; returns how many were inserted
+        """
+        pass
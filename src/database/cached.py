@@ -0,0 +1,236 @@
+"""
+Read-through user cache
+Wraps any DatabaseInterface with a bounded LRU + TTL cache for user lookups
+"""
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import AsyncIterator, Optional, List, Dict, Set, Tuple
+from src.database.base import DatabaseInterface
+from src.models.user import User
+from src.config import settings
+
+class CachedDatabase(DatabaseInterface):
+    """
+    Caches linked users by username and by telegram_id
+    Writes that change a user invalidate its entries; everything else is
+    passed straight through to the wrapped database
+    """
+
+    def __init__(self, db: DatabaseInterface, max_size: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.db = db
+        self.max_size = max_size if max_size is not None else settings.USER_CACHE_SIZE
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.USER_CACHE_TTL_SECONDS
+        # (key type, key) -> (monotonic expiry, user)
+        self._entries: "OrderedDict[Tuple[str, object], Tuple[float, User]]" = OrderedDict()
+        self._keys_by_user_id: Dict[int, Set[Tuple[str, object]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped on every invalidation so a lookup racing a write cannot
+        # re-insert the row it read before the write
+        self._generation = 0
+
+    def __getattr__(self, name):
+        # Backend-specific extras (init_db, close, reader, writer, ...)
+        return getattr(self.db, name)
+
+    def stats(self) -> Dict[str, int]:
+        """Cache counters"""
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+    def _get(self, key: Tuple[str, object]) -> Optional[User]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, user = entry
+        if time.monotonic() >= expires_at:
+            self._remove(key)
+            self.evictions += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return user
+
+    def _put(self, user: User):
+        # Unlinked users are not cached: the link usually lands on another
+        # worker, whose invalidation this process never sees
+        if self.max_size <= 0 or user.telegram_id is None:
+            return
+
+        expires_at = time.monotonic() + self.ttl_seconds
+        keys = {("username", user.username), ("telegram_id", user.telegram_id)}
+
+        for key in keys:
+            self._entries[key] = (expires_at, user)
+            self._entries.move_to_end(key)
+        self._keys_by_user_id.setdefault(user.id, set()).update(keys)
+
+        while len(self._entries) > self.max_size:
+            key, (_, evicted) = self._entries.popitem(last=False)
+            self._forget_key(key, evicted.id)
+            self.evictions += 1
+
+    def _remove(self, key: Tuple[str, object]):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._forget_key(key, entry[1].id)
+
+    def _forget_key(self, key: Tuple[str, object], user_id: int):
+        keys = self._keys_by_user_id.get(user_id)
+        if keys is None:
+            return
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_user_id[user_id]
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached entry for a user"""
+        self._generation += 1
+        keys = self._keys_by_user_id.pop(user_id, set())
+        for key in keys:
+            self._entries.pop(key, None)
+        if keys:
+            self.invalidations += 1
+
+    def clear(self):
+        """Drop the whole cache"""
+        self._generation += 1
+        self._entries.clear()
+        self._keys_by_user_id.clear()
+
+    async def create_user(self, username: str) -> User:
+        user = await self.db.create_user(username)
+        self.invalidate_user(user.id)
+        return user
+
+    async def create_user_if_absent(self, username: str) -> Optional[User]:
+        user = await self.db.create_user_if_absent(username)
+        if user is not None:
+            self.invalidate_user(user.id)
+        return user
+
+    async def create_users_if_absent(self, usernames: List[str]) -> List[Optional[User]]:
+        users = await self.db.create_users_if_absent(usernames)
+        for user in users:
+            if user is not None:
+                self.invalidate_user(user.id)
+        return users
+
+    async def get_user_by_username(self, username: str) -> Optional[User]:
+        user = self._get(("username", username))
+        if user is not None:
+            return user
+
+        generation = self._generation
+        user = await self.db.get_user_by_username(username)
+        if user is not None and generation == self._generation:
+            self._put(user)
+        return user
+
+    async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[User]:
+        user = self._get(("telegram_id", telegram_id))
+        if user is not None:
+            return user
+
+        generation = self._generation
+        user = await self.db.get_user_by_telegram_id(telegram_id)
+        if user is not None and generation == self._generation:
+            self._put(user)
+        return user
+
+    async def link_telegram_id(self, user_id: int, telegram_id: int) -> bool:
+        try:
+            return await self.db.link_telegram_id(user_id, telegram_id)
+        finally:
+            self.invalidate_user(user_id)
+            stale = self._entries.get(("telegram_id", telegram_id))
+            if stale is not None:
+                self.invalidate_user(stale[1].id)
+
+    async def link_telegram_id_if_unclaimed(self, user_id: int, telegram_id: int) -> bool:
+        try:
+            return await self.db.link_telegram_id_if_unclaimed(user_id, telegram_id)
+        finally:
+            self.invalidate_user(user_id)
+
+    async def create_login_request(
+        self,
+        user_id: int,
+        expires_at: Optional[datetime] = None,
+        client_key: Optional[str] = None
+    ) -> str:
+        return await self.db.create_login_request(user_id, expires_at, client_key)
+
+    async def get_login_request(self, login_id: str) -> Optional[dict]:
+        return await self.db.get_login_request(login_id)
+
+    async def get_recent_pending_login_request(
+        self,
+        user_id: int,
+        client_key: str,
+        created_after: datetime,
+        now: datetime
+    ) -> Optional[dict]:
+        return await self.db.get_recent_pending_login_request(user_id, client_key, created_after, now)
+
+    async def update_login_status(self, login_id: str, status: str, session_token: str = None) -> bool:
+        return await self.db.update_login_status(login_id, status, session_token)
+
+    async def confirm_login_request(
+        self,
+        login_id: str,
+        user_id: Optional[int],
+        session_token: Optional[str],
+        now: datetime,
+        refresh_token: Optional[str] = None
+    ) -> Optional[str]:
+        return await self.db.confirm_login_request(login_id, user_id, session_token, now, refresh_token)
+
+    async def deny_login_request(self, login_id: str, user_id: int, now: datetime) -> bool:
+        return await self.db.deny_login_request(login_id, user_id, now)
+
+    async def expire_login_requests(self, now: datetime, limit: int) -> List[str]:
+        return await self.db.expire_login_requests(now, limit)
+
+    async def take_login_refresh_token(self, login_id: str) -> Optional[str]:
+        return await self.db.take_login_refresh_token(login_id)
+
+    async def count_pending_login_requests(self, now: datetime) -> int:
+        return await self.db.count_pending_login_requests(now)
+
+    async def clear_login_refresh_tokens(self, expired_before: datetime, limit: int) -> int:
+        return await self.db.clear_login_refresh_tokens(expired_before, limit)
+
+    async def purge_login_requests(self, created_before: datetime, limit: int) -> int:
+        return await self.db.purge_login_requests(created_before, limit)
+
+    async def save_login_prompt(self, login_id: str, chat_id: int, message_id: int):
+        await self.db.save_login_prompt(login_id, chat_id, message_id)
+
+    async def delete_login_prompt(self, login_id: str, chat_id: int, message_id: int):
+        await self.db.delete_login_prompt(login_id, chat_id, message_id)
+
+    async def claim_stale_login_prompts(self, now: datetime, limit: int) -> List[dict]:
+        return await self.db.claim_stale_login_prompts(now, limit)
+
+    def export_rows(self, table: str, chunk_size: int) -> AsyncIterator[List[dict]]:
+        return self.db.export_rows(table, chunk_size)
+
+    async def import_rows(self, table: str, rows: List[dict]) -> int:
+        try:
+            return await self.db.import_rows(table, rows)
+        finally:
+            if table == "users":
+                self.clear()
@@ -0,0 +1,260 @@
+"""
+Schema migrations
+Numbered, forward-only schema changes tracked in PRAGMA user_version
+"""
+import logging
+import sqlite3
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional
+import aiosqlite
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    # DDL; runs in one transaction together with the user_version bump
+    apply: Callable[[aiosqlite.Connection], Awaitable[None]]
+    # Optional data fix-up: updates at most `limit` rows per call and returns
+    # how many it touched; runs in its own short transactions
+    backfill: Optional[Callable[[aiosqlite.Connection, int], Awaitable[int]]] = None
+
+MIGRATIONS: List[Migration] = []
+
+def migration(version: int, description: str, backfill=None):
+    """Register the decorated function as migration `version`"""
+    def decorator(apply):
+        if MIGRATIONS and version != MIGRATIONS[-1].version + 1:
+            raise RuntimeError(f"Migration {version} is out of sequence")
+        MIGRATIONS.append(Migration(version, description, apply, backfill))
+        return apply
+    return decorator
+
+def latest_version() -> int:
+    return MIGRATIONS[-1].version
+
+# Every migration must also cope with databases created before versioning
+# (user_version 0), which may already contain part of the schema
+
+@migration(1, "users and login requests")
+async def _create_core_tables(db: aiosqlite.Connection):
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            telegram_id INTEGER,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            linked_at DATETIME
+        )
+    """)
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS login_requests (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            status TEXT DEFAULT 'pending',
+            session_token TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_login_requests_user_id ON login_requests(user_id)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_login_requests_created_at ON login_requests(created_at)")
+
+async def _backfill_login_expiry(db: aiosqlite.Connection, limit: int) -> int:
+    # Requests from before expiry existed expire at creation time
+    cursor = await db.execute(
+        """
+        UPDATE login_requests SET expires_at = created_at
+        WHERE rowid IN (SELECT rowid FROM login_requests WHERE expires_at IS NULL LIMIT ?)
+        """,
+        (limit,)
+    )
+    updated = cursor.rowcount
+    await cursor.close()
+    return updated
+
+@migration(2, "login request expiry", backfill=_backfill_login_expiry)
+async def _add_login_expiry(db: aiosqlite.Connection):
+    columns = await db.execute_fetchall("PRAGMA table_info(login_requests)")
+    if "expires_at" not in {column["name"] for column in columns}:
+        await db.execute("ALTER TABLE login_requests ADD COLUMN expires_at DATETIME")
+    # Only pending rows are swept, so keep that index small
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_login_requests_pending_expires_at "
+        "ON login_requests(expires_at) WHERE status = 'pending'"
+    )
+
+@migration(3, "registration tokens")
+async def _create_registration_tokens(db: aiosqlite.Connection):
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS registration_tokens (
+            token TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            expires_at DATETIME NOT NULL,
+            used INTEGER NOT NULL DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_registration_tokens_expires_at ON registration_tokens(expires_at)")
+
+@migration(4, "unique telegram_id")
+async def _unique_telegram_id(db: aiosqlite.Connection):
+    # A Telegram account may link to at most one user
+    await db.execute("SAVEPOINT unique_telegram_id")
+    try:
+        await db.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_telegram_id_unique ON users(telegram_id)")
+        await db.execute("DROP INDEX IF EXISTS idx_users_telegram_id")
+    except sqlite3.IntegrityError:
+        await db.execute("ROLLBACK TO unique_telegram_id")
+        logger.warning("Duplicate users.telegram_id values found; keeping non-unique index")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_users_telegram_id ON users(telegram_id)")
+    await db.execute("RELEASE unique_telegram_id")
+
+@migration(5, "revoked tokens")
+async def _create_revoked_tokens(db: aiosqlite.Connection):
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            jti TEXT PRIMARY KEY,
+            expires_at DATETIME NOT NULL,
+            revoked_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at ON revoked_tokens(expires_at)")
+
+@migration(6, "rate limit counters")
+async def _create_rate_limits(db: aiosqlite.Connection):
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            key TEXT PRIMARY KEY,
+            window_index INTEGER NOT NULL,
+            current INTEGER NOT NULL,
+            previous INTEGER NOT NULL
+        )
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_rate_limits_window_index ON rate_limits(window_index)")
+
+@migration(7, "per-user pending login lookup")
+async def _index_user_pending_logins(db: aiosqlite.Connection):
+    # Serves start-login's "recent pending request for this user" probe; it
+    # also covers every user_id lookup, so the single-column index goes
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_login_requests_user_status_created_at "
+        "ON login_requests(user_id, status, created_at)"
+    )
+    await db.execute("DROP INDEX IF EXISTS idx_login_requests_user_id")
+
+@migration(8, "refresh token sessions")
+async def _create_sessions(db: aiosqlite.Connection):
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            refresh_hash TEXT NOT NULL,
+            previous_hash TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            refreshed_at DATETIME,
+            expires_at DATETIME NOT NULL,
+            revoked_at DATETIME,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+    await db.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_sessions_refresh_hash ON sessions(refresh_hash)")
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sessions_previous_hash "
+        "ON sessions(previous_hash) WHERE previous_hash IS NOT NULL"
+    )
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at)")
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sessions_revoked_at "
+        "ON sessions(revoked_at) WHERE revoked_at IS NOT NULL"
+    )
+    # The approving confirm hands the client its first refresh token
+    # through the login request, like the session token; it is cleared
+    # once the client has had time to collect it
+    columns = await db.execute_fetchall("PRAGMA table_info(login_requests)")
+    if "refresh_token" not in {column["name"] for column in columns}:
+        await db.execute("ALTER TABLE login_requests ADD COLUMN refresh_token TEXT")
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_login_requests_refresh_token_expires_at "
+        "ON login_requests(expires_at) WHERE refresh_token IS NOT NULL"
+    )
+
+@migration(9, "login prompt messages")
+async def _create_login_prompts(db: aiosqlite.Connection):
+    # Telegram messages still showing Confirm/Deny, kept next to their login
+    # requests (in the same shard) so stale ones are found with a join
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS login_prompts (
+            chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            login_id TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (chat_id, message_id)
+        )
+    """)
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_login_prompts_login_id "
+        "ON login_prompts(login_id, chat_id, message_id)"
+    )
+
+@migration(10, "login request idempotency keys")
+async def _add_login_client_key(db: aiosqlite.Connection):
+    # SHA-256 of the key the client sent with start-login; only a retry
+    # carrying the same key may be handed an existing pending request
+    columns = await db.execute_fetchall("PRAGMA table_info(login_requests)")
+    if "client_key" not in {column["name"] for column in columns}:
+        await db.execute("ALTER TABLE login_requests ADD COLUMN client_key TEXT")
+
+async def _user_version(db: aiosqlite.Connection) -> int:
+    rows = await db.execute_fetchall("PRAGMA user_version")
+    return rows[0][0]
+
+async def _apply(database, step: Migration, batch_size: int) -> bool:
+    """Apply one migration; returns False if another process already did"""
+    async with database.writer() as db:
+        # IMMEDIATE takes the write lock, so a second starter waits here
+        # (up to DB_BUSY_TIMEOUT_MS) and then sees the new version
+        await db.execute("BEGIN IMMEDIATE")
+        if await _user_version(db) >= step.version:
+            return False
+        await step.apply(db)
+        if step.backfill is None:
+            await db.execute(f"PRAGMA user_version = {step.version}")
+            return True
+
+    # Backfill in short transactions so other writers can interleave; the
+    # version is bumped only once it completes, so an interrupted run resumes
+    while True:
+        async with database.writer() as db:
+            updated = await step.backfill(db, batch_size)
+        if updated < batch_size:
+            break
+
+    async with database.writer() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        if await _user_version(db) < step.version:
+            await db.execute(f"PRAGMA user_version = {step.version}")
+    return True
+
+async def migrate(database, batch_size: Optional[int] = None) -> int:
+    """
+    Bring a SQLiteDatabase's file up to the latest schema version
+    An up-to-date database costs a single PRAGMA read
+    """
+    async with database.reader() as db:
+        current = await _user_version(db)
+    if current >= latest_version():
+        return current
+
+    if batch_size is None:
+        batch_size = settings.DB_MIGRATION_BATCH_SIZE
+    for step in MIGRATIONS:
+        if step.version > current and await _apply(database, step, batch_size):
+            logger.info(f"{database.db_path}: applied migration {step.version} ({step.description})")
+    return latest_version()
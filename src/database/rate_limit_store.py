@@ -0,0 +1,151 @@
+"""
+Rate limit storage
+Sliding-window counters behind RateLimiter: in-memory for a single
+process, SQLite so every API worker enforces the same limits
+"""
+import math
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Tuple
+from src.database.sqlite import SQLiteDatabase
+from src.config import settings
+
+# (window index, hits in that window, hits in the previous window)
+WindowState = Tuple[int, int, int]
+
+def sliding_window_hit(
+    state: Optional[WindowState],
+    limit: int,
+    window: float,
+    now: float,
+    cost: int = 1
+) -> Tuple[Optional[WindowState], float]:
+    """
+    Sliding window counter: the previous fixed window's hits are weighted
+    by how much of it still overlaps the sliding window
+    A hit counts `cost` times (cost must not exceed limit)
+    Returns (new state, 0) if the hit is allowed, or (None, seconds until
+    it would be) if not
+    """
+    index = math.floor(now / window)
+    current, previous = 0, 0
+    if state is not None:
+        last_index, last_current, last_previous = state
+        if last_index == index:
+            current, previous = last_current, last_previous
+        elif last_index == index - 1:
+            previous = last_current
+
+    elapsed = now - index * window
+    if previous * (window - elapsed) / window + current + cost <= limit:
+        return (index, current + cost, previous), 0.0
+
+    if current + cost > limit:
+        # Full already; wait into the next window until this one's weight decays
+        wait = (window - elapsed) + window * (1 - (limit - cost) / current)
+    else:
+        wait = window * (1 - (limit - current - cost) / previous) - elapsed
+    return None, max(wait, 0.001)
+
+class RateLimitStore(ABC):
+    """Abstract base class for rate limit counters"""
+
+    @abstractmethod
+    async def hit(self, key: str, limit: int, window: float, now: float, cost: int = 1) -> float:
+        """
+        Count cost hits for key if they fit within limit per window
+        Returns 0 if allowed, otherwise seconds until they would be allowed
+        """
+        pass
+
+    @abstractmethod
+    async def purge(self, window: float, now: float) -> int:
+        """Drop counters too old to affect any decision and return how many"""
+        pass
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """Process-local counters, bounded by evicting the least recently counted keys"""
+
+    def __init__(self, max_keys: Optional[int] = None):
+        self.max_keys = max_keys if max_keys is not None else settings.RATE_LIMIT_MAX_KEYS
+        # Ordered by last allowed hit, oldest first
+        self._entries: "OrderedDict[str, WindowState]" = OrderedDict()
+        self.evictions = 0
+
+    async def hit(self, key: str, limit: int, window: float, now: float, cost: int = 1) -> float:
+        # No await between read and write, so this is atomic on the event loop
+        state, retry_after = sliding_window_hit(self._entries.get(key), limit, window, now, cost)
+        if state is not None:
+            self._entries[key] = state
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return retry_after
+
+    async def purge(self, window: float, now: float) -> int:
+        # Entries older than the previous window no longer count for anything
+        stale_before = math.floor(now / window) - 1
+        purged = 0
+        while self._entries:
+            key, (index, _, _) = next(iter(self._entries.items()))
+            if index >= stale_before:
+                break
+            del self._entries[key]
+            purged += 1
+        return purged
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLiteRateLimitStore(RateLimitStore):
+    """Counters in the rate_limits table, shared by every worker on the database"""
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+
+    async def hit(self, key: str, limit: int, window: float, now: float, cost: int = 1) -> float:
+        async with self.db.writer() as conn:
+            # Read-modify-write under the database write lock so workers don't race
+            await conn.execute("BEGIN IMMEDIATE")
+            rows = await conn.execute_fetchall(
+                "SELECT window_index, current, previous FROM rate_limits WHERE key = ?",
+                (key,)
+            )
+            state = tuple(rows[0]) if rows else None
+            state, retry_after = sliding_window_hit(state, limit, window, now, cost)
+            if state is not None:
+                await conn.execute(
+                    """
+                    INSERT INTO rate_limits (key, window_index, current, previous) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        window_index = excluded.window_index,
+                        current = excluded.current,
+                        previous = excluded.previous
+                    """,
+                    (key, *state)
+                )
+        return retry_after
+
+    async def purge(self, window: float, now: float) -> int:
+        async with self.db.writer() as conn:
+            cursor = await conn.execute(
+                "DELETE FROM rate_limits WHERE window_index < ?",
+                (math.floor(now / window) - 1,)
+            )
+            deleted = cursor.rowcount
+            await cursor.close()
+        return deleted
+
+def create_rate_limit_store(db: SQLiteDatabase, backend: str = None) -> RateLimitStore:
+    """
+    Build the rate limit store selected by settings.RATE_LIMIT_STORE
+    """
+    if backend is None:
+        backend = settings.RATE_LIMIT_STORE
+
+    if backend == "sqlite":
+        return SQLiteRateLimitStore(db)
+    if backend == "memory":
+        return InMemoryRateLimitStore()
+    raise ValueError(f"Unknown rate limit store backend: {backend}")
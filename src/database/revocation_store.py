@@ -0,0 +1,93 @@
+"""
+Revoked session token storage
+Persists the revocation list behind IntrospectionService so every API
+worker (and a restarted one) sees the same revocations
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict
+from src.database.sqlite import SQLiteDatabase
+from src.config import settings
+
+class RevocationStore(ABC):
+    """Abstract base class for revoked token storage"""
+
+    @abstractmethod
+    async def add(self, jti: str, expires_at: datetime):
+        """Record a revoked token until its own expiry (UTC)"""
+        pass
+
+    @abstractmethod
+    async def load_active(self, now: datetime) -> Dict[str, datetime]:
+        """Return jti -> expiry for every revocation that has not expired yet"""
+        pass
+
+    @abstractmethod
+    async def purge_expired(self, now: datetime) -> int:
+        """Delete revocations of tokens that have expired anyway"""
+        pass
+
+class InMemoryRevocationStore(RevocationStore):
+    """Process-local revocation list (single worker only)"""
+
+    def __init__(self):
+        self.revoked: Dict[str, datetime] = {}
+
+    async def add(self, jti: str, expires_at: datetime):
+        self.revoked[jti] = expires_at
+
+    async def load_active(self, now: datetime) -> Dict[str, datetime]:
+        return {jti: expires_at for jti, expires_at in self.revoked.items() if expires_at > now}
+
+    async def purge_expired(self, now: datetime) -> int:
+        expired = [jti for jti, expires_at in self.revoked.items() if expires_at <= now]
+        for jti in expired:
+            del self.revoked[jti]
+        return len(expired)
+
+class SQLiteRevocationStore(RevocationStore):
+    """Revocation list backed by the revoked_tokens table"""
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+
+    async def add(self, jti: str, expires_at: datetime):
+        async with self.db.writer() as conn:
+            await conn.execute(
+                "INSERT OR IGNORE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)",
+                (jti, expires_at)
+            )
+
+    async def load_active(self, now: datetime) -> Dict[str, datetime]:
+        async with self.db.reader() as conn:
+            rows = await conn.execute_fetchall(
+                "SELECT jti, expires_at FROM revoked_tokens WHERE expires_at > ?",
+                (now,)
+            )
+        return {
+            row["jti"]: datetime.fromisoformat(row["expires_at"]) if isinstance(row["expires_at"], str) else row["expires_at"]
+            for row in rows
+        }
+
+    async def purge_expired(self, now: datetime) -> int:
+        async with self.db.writer() as conn:
+            cursor = await conn.execute(
+                "DELETE FROM revoked_tokens WHERE expires_at <= ?",
+                (now,)
+            )
+            deleted = cursor.rowcount
+            await cursor.close()
+        return deleted
+
+def create_revocation_store(db: SQLiteDatabase, backend: str = None) -> RevocationStore:
+    """
+    Build the revocation store; follows settings.TOKEN_STORE
+    """
+    if backend is None:
+        backend = settings.TOKEN_STORE
+
+    if backend == "sqlite":
+        return SQLiteRevocationStore(db)
+    if backend == "memory":
+        return InMemoryRevocationStore()
+    raise ValueError(f"Unknown revocation store backend: {backend}")
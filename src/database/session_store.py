@@ -0,0 +1,230 @@
+"""
+Session storage
+Refresh token sessions behind SessionService: in-memory for a single
+process, SQLite so every API worker can refresh and revoke them
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from src.database.sqlite import SQLiteDatabase
+from src.models.token import Session
+from src.config import settings
+
+class SessionStore(ABC):
+    """Abstract base class for refresh token sessions"""
+
+    @abstractmethod
+    async def create(self, session: Session):
+        """Store a new session"""
+        pass
+
+    @abstractmethod
+    async def rotate(self, refresh_hash: str, new_hash: str, expires_at: datetime, now: datetime) -> Optional[Session]:
+        """
+        Atomically replace an active session's current refresh token hash
+        Returns the updated session, or None if no active session has it
+        """
+        pass
+
+    @abstractmethod
+    async def revoke_replaced(self, refresh_hash: str, now: datetime) -> Optional[Session]:
+        """
+        Revoke the active session whose previous (already rotated) refresh
+        token hash this is, and return it; None if there is none
+        """
+        pass
+
+    @abstractmethod
+    async def revoke(self, refresh_hash: str, now: datetime) -> Optional[Session]:
+        """Revoke the active session with this current refresh token hash and return it"""
+        pass
+
+    @abstractmethod
+    async def revoke_user(self, user_id: int, now: datetime) -> List[str]:
+        """Revoke every active session of a user and return their ids"""
+        pass
+
+    @abstractmethod
+    async def delete(self, session_id: str):
+        """Remove a session outright"""
+        pass
+
+    @abstractmethod
+    async def purge(self, now: datetime) -> int:
+        """Delete expired and revoked sessions and return how many"""
+        pass
+
+class InMemorySessionStore(SessionStore):
+    """Process-local session store (single worker only)"""
+
+    def __init__(self):
+        self.sessions: Dict[str, Session] = {}
+        # Current and previous refresh token hash -> session id
+        self._by_hash: Dict[str, str] = {}
+        self._by_previous: Dict[str, str] = {}
+        self._by_user: Dict[int, Set[str]] = {}
+
+    def _find(self, index: Dict[str, str], refresh_hash: str, now: datetime) -> Optional[Session]:
+        session = self.sessions.get(index.get(refresh_hash))
+        if session is None or not session.is_active(now):
+            return None
+        return session
+
+    async def create(self, session: Session):
+        self.sessions[session.id] = session
+        self._by_hash[session.refresh_hash] = session.id
+        self._by_user.setdefault(session.user_id, set()).add(session.id)
+
+    async def rotate(self, refresh_hash: str, new_hash: str, expires_at: datetime, now: datetime) -> Optional[Session]:
+        # No await between check and update, so this is atomic on the event loop
+        session = self._find(self._by_hash, refresh_hash, now)
+        if session is None:
+            return None
+        del self._by_hash[refresh_hash]
+        if session.previous_hash is not None:
+            self._by_previous.pop(session.previous_hash, None)
+        session.previous_hash, session.refresh_hash, session.expires_at = refresh_hash, new_hash, expires_at
+        self._by_hash[new_hash] = session.id
+        self._by_previous[refresh_hash] = session.id
+        return session
+
+    async def revoke_replaced(self, refresh_hash: str, now: datetime) -> Optional[Session]:
+        session = self._find(self._by_previous, refresh_hash, now)
+        if session is not None:
+            session.revoked_at = now
+        return session
+
+    async def revoke(self, refresh_hash: str, now: datetime) -> Optional[Session]:
+        session = self._find(self._by_hash, refresh_hash, now)
+        if session is not None:
+            session.revoked_at = now
+        return session
+
+    async def revoke_user(self, user_id: int, now: datetime) -> List[str]:
+        revoked = []
+        for session_id in self._by_user.get(user_id, ()):
+            session = self.sessions[session_id]
+            if session.is_active(now):
+                session.revoked_at = now
+                revoked.append(session_id)
+        return revoked
+
+    async def delete(self, session_id: str):
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return
+        self._by_hash.pop(session.refresh_hash, None)
+        if session.previous_hash is not None:
+            self._by_previous.pop(session.previous_hash, None)
+        user_sessions = self._by_user.get(session.user_id)
+        if user_sessions is not None:
+            user_sessions.discard(session_id)
+            if not user_sessions:
+                del self._by_user[session.user_id]
+
+    async def purge(self, now: datetime) -> int:
+        stale = [session.id for session in self.sessions.values() if not session.is_active(now)]
+        for session_id in stale:
+            await self.delete(session_id)
+        return len(stale)
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in the sessions table, shared by every worker on the database"""
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+
+    async def create(self, session: Session):
+        async with self.db.writer() as conn:
+            await conn.execute(
+                """
+                INSERT INTO sessions (id, user_id, username, refresh_hash, expires_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (session.id, session.user_id, session.username, session.refresh_hash, session.expires_at)
+            )
+
+    async def _update_one(self, sql: str, params: tuple) -> Optional[Session]:
+        async with self.db.writer() as conn:
+            rows = await conn.execute_fetchall(sql, params)
+        if rows:
+            return Session.from_row(dict(rows[0]))
+        return None
+
+    async def rotate(self, refresh_hash: str, new_hash: str, expires_at: datetime, now: datetime) -> Optional[Session]:
+        # Single statement on the unique refresh_hash index: two workers
+        # presenting the same token cannot both rotate it
+        return await self._update_one(
+            """
+            UPDATE sessions
+            SET refresh_hash = ?, previous_hash = refresh_hash, expires_at = ?, refreshed_at = ?
+            WHERE refresh_hash = ? AND revoked_at IS NULL AND expires_at > ?
+            RETURNING *
+            """,
+            (new_hash, expires_at, now, refresh_hash, now)
+        )
+
+    async def revoke_replaced(self, refresh_hash: str, now: datetime) -> Optional[Session]:
+        return await self._update_one(
+            """
+            UPDATE sessions SET revoked_at = ?
+            WHERE previous_hash = ? AND revoked_at IS NULL AND expires_at > ?
+            RETURNING *
+            """,
+            (now, refresh_hash, now)
+        )
+
+    async def revoke(self, refresh_hash: str, now: datetime) -> Optional[Session]:
+        return await self._update_one(
+            """
+            UPDATE sessions SET revoked_at = ?
+            WHERE refresh_hash = ? AND revoked_at IS NULL AND expires_at > ?
+            RETURNING *
+            """,
+            (now, refresh_hash, now)
+        )
+
+    async def revoke_user(self, user_id: int, now: datetime) -> List[str]:
+        async with self.db.writer() as conn:
+            rows = await conn.execute_fetchall(
+                """
+                UPDATE sessions SET revoked_at = ?
+                WHERE user_id = ? AND revoked_at IS NULL AND expires_at > ?
+                RETURNING id
+                """,
+                (now, user_id, now)
+            )
+        return [row["id"] for row in rows]
+
+    async def delete(self, session_id: str):
+        async with self.db.writer() as conn:
+            await conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    async def purge(self, now: datetime) -> int:
+        deleted = 0
+        async with self.db.writer() as conn:
+            # Two statements so each uses its own index instead of a table scan
+            for sql, params in (
+                ("DELETE FROM sessions WHERE expires_at <= ?", (now,)),
+                ("DELETE FROM sessions WHERE revoked_at IS NOT NULL", ())
+            ):
+                cursor = await conn.execute(sql, params)
+                deleted += cursor.rowcount
+                await cursor.close()
+        return deleted
+
+def create_session_store(db: SQLiteDatabase, backend: str = None) -> SessionStore:
+    """
+    Build the session store; follows settings.TOKEN_STORE
+    """
+    if backend is None:
+        backend = settings.TOKEN_STORE
+
+    if backend == "sqlite":
+        return SQLiteSessionStore(db)
+    if backend == "memory":
+        return InMemorySessionStore()
+    raise ValueError(f"Unknown session store backend: {backend}")
@@ -0,0 +1,275 @@
+"""
+Sharded SQLite database
+Spreads login requests over several SQLite files so their writes do not
+all queue behind one database-wide write lock
+"""
+import os
+import uuid
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from src.database.base import DatabaseInterface
+from src.database.sqlite import SQLiteDatabase
+from src.models.user import User
+from src.config import settings
+
+# login_id = "<shard>_<uuid4>"; uuid4 never contains "_"
+LOGIN_ID_SEPARATOR = "_"
+
+def shard_for(user_id: int, shards: int) -> int:
+    """Stable shard index for a user (same in every process and release)"""
+    return zlib.crc32(str(user_id).encode()) % shards
+
+def shard_path(db_path: str, index: int, shards: int) -> str:
+    """db.sqlite3 -> db.4-0.sqlite3 (shard 0 of 4); the count keeps layouts apart while resharding"""
+    root, ext = os.path.splitext(db_path)
+    return f"{root}.{shards}-{index}{ext}"
+
+def _strip_shard(login_id: str) -> str:
+    return login_id.split(LOGIN_ID_SEPARATOR, 1)[-1]
+
+class ShardedSQLiteDatabase(DatabaseInterface):
+    """
+    A directory database plus N login-request shards
+    The directory (db_path itself) holds users, so username and telegram_id
+    lookups and their uniqueness constraints stay in one place, along with
+    registration tokens, revocations and sessions. Login requests, the write-heavy
+    table, live in the shard picked by a hash of user_id, and their IDs
+    carry that shard so later lookups go straight to it.
+    """
+
+    def __init__(self, db_path: str = "db.sqlite3", shards: Optional[int] = None, pool_size: Optional[int] = None):
+        self.shard_count = shards if shards is not None else settings.DB_SHARDS
+        if self.shard_count < 1:
+            raise ValueError("shards must be at least 1")
+        self.directory = SQLiteDatabase(db_path, pool_size)
+        self.shards = [
+            SQLiteDatabase(shard_path(db_path, index, self.shard_count), pool_size)
+            for index in range(self.shard_count)
+        ]
+
+    # Connection management; reader/writer expose the directory so the
+    # token, revocation and session stores keep working unchanged
+
+    async def init_db(self):
+        await self.directory.init_db()
+        for shard in self.shards:
+            await shard.init_db()
+
+    async def connect(self):
+        await self.directory.connect()
+        for shard in self.shards:
+            await shard.connect()
+
+    async def close(self):
+        for shard in self.shards:
+            await shard.close()
+        await self.directory.close()
+
+    def reader(self):
+        return self.directory.reader()
+
+    def writer(self):
+        return self.directory.writer()
+
+    # Routing
+
+    def shard_index(self, user_id: int) -> int:
+        return shard_for(user_id, self.shard_count)
+
+    def _route(self, login_id: str) -> Optional[SQLiteDatabase]:
+        """Shard encoded in login_id, or None for IDs from another layout"""
+        prefix, separator, _ = login_id.partition(LOGIN_ID_SEPARATOR)
+        if separator and prefix.isdigit() and int(prefix) < self.shard_count:
+            return self.shards[int(prefix)]
+        return None
+
+    def _candidates(self, login_id: str) -> List[SQLiteDatabase]:
+        shard = self._route(login_id)
+        # Unprefixed IDs (imported, or created before sharding) need a scan
+        return [shard] if shard is not None else self.shards
+
+    # Users: directory
+
+    async def create_user(self, username: str) -> User:
+        return await self.directory.create_user(username)
+
+    async def create_user_if_absent(self, username: str) -> Optional[User]:
+        return await self.directory.create_user_if_absent(username)
+
+    async def create_users_if_absent(self, usernames: List[str]) -> List[Optional[User]]:
+        return await self.directory.create_users_if_absent(usernames)
+
+    async def get_user_by_username(self, username: str) -> Optional[User]:
+        return await self.directory.get_user_by_username(username)
+
+    async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[User]:
+        return await self.directory.get_user_by_telegram_id(telegram_id)
+
+    async def link_telegram_id(self, user_id: int, telegram_id: int) -> bool:
+        return await self.directory.link_telegram_id(user_id, telegram_id)
+
+    async def link_telegram_id_if_unclaimed(self, user_id: int, telegram_id: int) -> bool:
+        return await self.directory.link_telegram_id_if_unclaimed(user_id, telegram_id)
+
+    # Login requests: shards
+
+    async def create_login_request(
+        self,
+        user_id: int,
+        expires_at: Optional[datetime] = None,
+        client_key: Optional[str] = None
+    ) -> str:
+        index = self.shard_index(user_id)
+        login_id = f"{index}{LOGIN_ID_SEPARATOR}{uuid.uuid4()}"
+        return await self.shards[index].create_login_request(user_id, expires_at, client_key, login_id=login_id)
+
+    async def get_login_request(self, login_id: str) -> Optional[dict]:
+        for shard in self._candidates(login_id):
+            row = await shard.get_login_request(login_id)
+            if row is not None:
+                return row
+        return None
+
+    async def get_recent_pending_login_request(
+        self,
+        user_id: int,
+        client_key: str,
+        created_after: datetime,
+        now: datetime
+    ) -> Optional[dict]:
+        # A user's requests all live in (or were imported into) their shard
+        return await self.shards[self.shard_index(user_id)].get_recent_pending_login_request(
+            user_id, client_key, created_after, now
+        )
+
+    async def update_login_status(self, login_id: str, status: str, session_token: str = None) -> bool:
+        for shard in self._candidates(login_id):
+            await shard.update_login_status(login_id, status, session_token)
+        return True
+
+    async def confirm_login_request(
+        self,
+        login_id: str,
+        user_id: Optional[int],
+        session_token: Optional[str],
+        now: datetime,
+        refresh_token: Optional[str] = None
+    ) -> Optional[str]:
+        for shard in self._candidates(login_id):
+            status = await shard.confirm_login_request(login_id, user_id, session_token, now, refresh_token)
+            if status is not None:
+                return status
+        return None
+
+    async def deny_login_request(self, login_id: str, user_id: int, now: datetime) -> bool:
+        for shard in self._candidates(login_id):
+            if await shard.deny_login_request(login_id, user_id, now):
+                return True
+        return False
+
+    async def expire_login_requests(self, now: datetime, limit: int) -> List[str]:
+        expired = []
+        for shard in self.shards:
+            if len(expired) >= limit:
+                break
+            expired.extend(await shard.expire_login_requests(now, limit - len(expired)))
+        return expired
+
+    async def take_login_refresh_token(self, login_id: str) -> Optional[str]:
+        for shard in self._candidates(login_id):
+            refresh_token = await shard.take_login_refresh_token(login_id)
+            if refresh_token is not None:
+                return refresh_token
+        return None
+
+    async def count_pending_login_requests(self, now: datetime) -> int:
+        pending = 0
+        for shard in self.shards:
+            pending += await shard.count_pending_login_requests(now)
+        return pending
+
+    async def clear_login_refresh_tokens(self, expired_before: datetime, limit: int) -> int:
+        cleared = 0
+        for shard in self.shards:
+            if cleared >= limit:
+                break
+            cleared += await shard.clear_login_refresh_tokens(expired_before, limit - cleared)
+        return cleared
+
+    async def purge_login_requests(self, created_before: datetime, limit: int) -> int:
+        deleted = 0
+        for shard in self.shards:
+            if deleted >= limit:
+                break
+            deleted += await shard.purge_login_requests(created_before, limit - deleted)
+        return deleted
+
+    # Prompt messages: stored in their login request's shard so stale ones
+    # are found with a local join
+
+    async def save_login_prompt(self, login_id: str, chat_id: int, message_id: int):
+        shard = self._route(login_id)
+        if shard is None:
+            shard = self.shards[0]
+            for candidate in self.shards:
+                if await candidate.get_login_request(login_id) is not None:
+                    shard = candidate
+                    break
+        await shard.save_login_prompt(login_id, chat_id, message_id)
+
+    async def delete_login_prompt(self, login_id: str, chat_id: int, message_id: int):
+        for shard in self._candidates(login_id):
+            await shard.delete_login_prompt(login_id, chat_id, message_id)
+
+    async def claim_stale_login_prompts(self, now: datetime, limit: int) -> List[dict]:
+        claimed = []
+        for shard in self.shards:
+            if len(claimed) >= limit:
+                break
+            claimed.extend(await shard.claim_stale_login_prompts(now, limit - len(claimed)))
+        return claimed
+
+    # Bulk export/import
+
+    async def export_rows(self, table: str, chunk_size: int) -> AsyncIterator[List[dict]]:
+        sources = [self.directory] if table == "users" else self.shards
+        for source in sources:
+            async for rows in source.export_rows(table, chunk_size):
+                yield rows
+
+    async def import_rows(self, table: str, rows: List[dict]) -> int:
+        """Login requests are routed by user_id and get this layout's shard prefix"""
+        if table == "users":
+            return await self.directory.import_rows(table, rows)
+
+        by_shard: Dict[int, List[dict]] = defaultdict(list)
+        for row in rows:
+            index = self.shard_index(int(row["user_id"]))
+            by_shard[index].append({**row, "id": f"{index}{LOGIN_ID_SEPARATOR}{_strip_shard(row['id'])}"})
+
+        inserted = 0
+        for index, shard_rows in by_shard.items():
+            inserted += await self.shards[index].import_rows(table, shard_rows)
+        return inserted
+
+    def paths(self) -> Tuple[str, List[str]]:
+        """(directory path, shard paths)"""
+        return self.directory.db_path, [shard.db_path for shard in self.shards]
+
+def create_database(
+    db_path: str = "db.sqlite3",
+    shards: Optional[int] = None,
+    pool_size: Optional[int] = None
+) -> DatabaseInterface:
+    """
+    Build the database selected by settings.DB_SHARDS
+    One shard (the default) is the plain single-file SQLiteDatabase
+    """
+    if shards is None:
+        shards = settings.DB_SHARDS
+
+    if shards <= 1:
+        return SQLiteDatabase(db_path, pool_size)
+    return ShardedSQLiteDatabase(db_path, shards, pool_size)
@@ -1,128 +1,336 @@
 """
 SQLite database implementation
 """
+import asyncio
+import logging
+import sqlite3
 import aiosqlite
+import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Optional, List
-from src.database.base import DatabaseInterface
+from typing import AsyncIterator, Optional, List
+from src.database.base import DatabaseInterface, EXPORT_COLUMNS
+from src.database.migrations import migrate
+from src.database.write_batcher import WriteBatcher, WriteOp
 from src.models.user import User
+from src.utils.metrics import REGISTRY, timed
 from src.config import settings
 
+logger = logging.getLogger(__name__)
+
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "telelogin_db_query_seconds",
+    "SQLiteDatabase call latency by method",
+    ["method"]
+)
+DB_WRITE_LOCK_WAIT_SECONDS = REGISTRY.histogram(
+    "telelogin_db_write_lock_wait_seconds",
+    "Time spent waiting for the single writer connection"
+)
+
+# Prepared statements kept per connection by the sqlite3 module
+STATEMENT_CACHE_SIZE = 128
+
 class SQLiteDatabase(DatabaseInterface):
-    """SQLite implementation of database interface"""
-    
-    def __init__(self, db_path: str = "db.sqlite3"):
+    """
+    SQLite implementation of database interface
+    Owns a long-lived pool: one serialized writer connection plus
+    pool_size read-only connections, all running in WAL mode
+    """
+
+    def __init__(self, db_path: str = "db.sqlite3", pool_size: Optional[int] = None, group_commit: Optional[bool] = None):
         self.db_path = db_path
-    
+        self.pool_size = pool_size if pool_size is not None else settings.DB_POOL_SIZE
+        if group_commit is None:
+            group_commit = settings.DB_GROUP_COMMIT
+        # Login request writes share transactions when group commit is on
+        self._batcher = WriteBatcher(self) if group_commit else None
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._readers: List[aiosqlite.Connection] = []
+        self._idle_readers: Optional[asyncio.Queue] = None
+        self._write_lock = asyncio.Lock()
+        self._open_lock = asyncio.Lock()
+
+    async def _open_connection(self, read_only: bool = False) -> aiosqlite.Connection:
+        """Open a single tuned connection"""
+        conn = await aiosqlite.connect(
+            self.db_path,
+            timeout=settings.DB_BUSY_TIMEOUT_MS / 1000,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        conn.row_factory = aiosqlite.Row
+        # Pragmas go through execute_fetchall so no statement is left active
+        # Under WAL, synchronous=NORMAL is still crash-safe and skips most fsyncs;
+        # FULL fsyncs every commit (durable across power loss)
+        await conn.execute_fetchall(f"PRAGMA synchronous = {settings.DB_SYNCHRONOUS}")
+        # Negative cache_size is expressed in KiB rather than pages
+        await conn.execute_fetchall(f"PRAGMA cache_size = -{int(settings.DB_CACHE_SIZE_KB)}")
+        await conn.execute_fetchall(f"PRAGMA mmap_size = {int(settings.DB_MMAP_SIZE)}")
+        await conn.execute_fetchall("PRAGMA temp_store = MEMORY")
+        if read_only:
+            await conn.execute_fetchall("PRAGMA query_only = ON")
+        return conn
+
+    async def connect(self):
+        """Open the connection pool (idempotent)"""
+        async with self._open_lock:
+            if self._writer is not None:
+                return
+
+            writer = await self._open_connection()
+            # journal_mode is persistent, set it before the readers attach
+            await writer.execute_fetchall("PRAGMA journal_mode = WAL")
+
+            idle_readers = asyncio.Queue()
+            readers = []
+            for _ in range(max(1, self.pool_size)):
+                reader = await self._open_connection(read_only=True)
+                readers.append(reader)
+                idle_readers.put_nowait(reader)
+
+            self._readers = readers
+            self._idle_readers = idle_readers
+            self._writer = writer
+
+    async def close(self):
+        """Close every pooled connection"""
+        if self._batcher is not None:
+            await self._batcher.drain()
+        async with self._open_lock:
+            if self._writer is None:
+                return
+
+            async with self._write_lock:
+                for reader in self._readers:
+                    await reader.close()
+                await self._writer.close()
+
+            self._readers = []
+            self._idle_readers = None
+            self._writer = None
+
+    @asynccontextmanager
+    async def reader(self):
+        """Borrow a read-only connection from the pool"""
+        if self._writer is None:
+            await self.connect()
+
+        conn = await self._idle_readers.get()
+        try:
+            yield conn
+        finally:
+            self._idle_readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def writer(self):
+        """Hold the writer connection for a single transaction"""
+        if self._writer is None:
+            await self.connect()
+
+        waited_from = time.perf_counter()
+        async with self._write_lock:
+            DB_WRITE_LOCK_WAIT_SECONDS.observe(time.perf_counter() - waited_from)
+            try:
+                yield self._writer
+                await self._writer.commit()
+            except BaseException:
+                await self._writer.rollback()
+                raise
+
+    async def _write(self, op: WriteOp):
+        """Run op(conn) in its own transaction, or in the next group commit"""
+        if self._batcher is not None:
+            return await self._batcher.submit(op)
+        async with self.writer() as db:
+            return await op(db)
+
     async def init_db(self):
-        """Initialize database tables"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    telegram_id INTEGER,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    linked_at DATETIME
-                )
-            """)
-            
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS login_requests (
-                    id TEXT PRIMARY KEY,
-                    user_id INTEGER NOT NULL,
-                    status TEXT DEFAULT 'pending',
-                    session_token TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (id)
-                )
-            """)
-            
-            await db.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)")
-            await db.execute("CREATE INDEX IF NOT EXISTS idx_users_telegram_id ON users(telegram_id)")
-            await db.execute("CREATE INDEX IF NOT EXISTS idx_login_requests_user_id ON login_requests(user_id)")
-            
-            await db.commit()
-    
+        """Open the pool and apply any pending schema migrations"""
+        await migrate(self)
+
+    @timed(DB_QUERY_SECONDS)
     async def create_user(self, username: str) -> User:
         """Create a new user"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.writer() as db:
             cursor = await db.execute(
                 "INSERT INTO users (username) VALUES (?)",
                 (username,)
             )
-            await db.commit()
             user_id = cursor.lastrowid
-            
-            return User(id=user_id, username=username)
-    
+            await cursor.close()
+
+        return User(id=user_id, username=username)
+
+    @timed(DB_QUERY_SECONDS)
+    async def create_user_if_absent(self, username: str) -> Optional[User]:
+        """Create a new user, or return None if the username is taken"""
+        async with self.writer() as db:
+            rows = await db.execute_fetchall(
+                "INSERT INTO users (username) VALUES (?) ON CONFLICT(username) DO NOTHING RETURNING id",
+                (username,)
+            )
+
+        if rows:
+            return User(id=rows[0]["id"], username=username)
+        return None
+
+    @timed(DB_QUERY_SECONDS)
+    async def create_users_if_absent(self, usernames: List[str]) -> List[Optional[User]]:
+        """Create users with one executemany; taken usernames come back as None"""
+        if not usernames:
+            return []
+
+        async with self.writer() as db:
+            # Take the write lock up front so no other process can insert
+            # between reading the id sequence and the inserts
+            await db.execute("BEGIN IMMEDIATE")
+            rows = await db.execute_fetchall("SELECT seq FROM sqlite_sequence WHERE name = 'users'")
+            last_id = rows[0]["seq"] if rows else 0
+
+            await db.executemany(
+                "INSERT INTO users (username) VALUES (?) ON CONFLICT(username) DO NOTHING",
+                [(username,) for username in usernames]
+            )
+            # AUTOINCREMENT ids only grow, so the new rows are exactly those past last_id
+            rows = await db.execute_fetchall(
+                "SELECT id, username FROM users WHERE id > ?",
+                (last_id,)
+            )
+
+        created = {row["username"]: row["id"] for row in rows}
+        results = []
+        for username in usernames:
+            # pop: a name repeated in the batch is created once, the repeat is a conflict
+            user_id = created.pop(username, None)
+            results.append(User(id=user_id, username=username) if user_id is not None else None)
+        return results
+
+    @timed(DB_QUERY_SECONDS)
     async def get_user_by_username(self, username: str) -> Optional[User]:
         """Get user by username"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
+        async with self.reader() as db:
+            async with db.execute(
                 "SELECT * FROM users WHERE username = ?",
                 (username,)
-            )
-            row = await cursor.fetchone()
-            
-            if row:
-                return User(**dict(row))
-            return None
-    
+            ) as cursor:
+                row = await cursor.fetchone()
+
+        if row:
+            return User(**dict(row))
+        return None
+
+    @timed(DB_QUERY_SECONDS)
     async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[User]:
         """Get user by Telegram ID"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
+        async with self.reader() as db:
+            async with db.execute(
                 "SELECT * FROM users WHERE telegram_id = ?",
                 (telegram_id,)
-            )
-            row = await cursor.fetchone()
-            
-            if row:
-                return User(**dict(row))
-            return None
-    
+            ) as cursor:
+                row = await cursor.fetchone()
+
+        if row:
+            return User(**dict(row))
+        return None
+
+    @timed(DB_QUERY_SECONDS)
     async def link_telegram_id(self, user_id: int, telegram_id: int) -> bool:
         """Link Telegram ID to user"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.writer() as db:
             await db.execute(
                 "UPDATE users SET telegram_id = ?, linked_at = ? WHERE id = ?",
                 (telegram_id, datetime.now(), user_id)
             )
-            await db.commit()
-            return True
-    
-    async def create_login_request(self, user_id: int) -> str:
-        """Create a login request and return login_id"""
-        login_id = str(uuid.uuid4())
-        async with aiosqlite.connect(self.db_path) as db:
+        return True
+
+    @timed(DB_QUERY_SECONDS)
+    async def link_telegram_id_if_unclaimed(self, user_id: int, telegram_id: int) -> bool:
+        """Link Telegram ID to user unless another user already holds it"""
+        try:
+            async with self.writer() as db:
+                rows = await db.execute_fetchall(
+                    """
+                    UPDATE users SET telegram_id = ?, linked_at = ?
+                    WHERE id = ? AND NOT EXISTS (
+                        SELECT 1 FROM users WHERE telegram_id = ? AND id != ?
+                    )
+                    RETURNING id
+                    """,
+                    (telegram_id, datetime.now(), user_id, telegram_id, user_id)
+                )
+        except sqlite3.IntegrityError:
+            # Lost a race with another process linking the same account
+            return False
+        return bool(rows)
+
+    @timed(DB_QUERY_SECONDS)
+    async def create_login_request(
+        self,
+        user_id: int,
+        expires_at: Optional[datetime] = None,
+        client_key: Optional[str] = None,
+        login_id: Optional[str] = None
+    ) -> str:
+        """Create a login request and return login_id (a new UUID unless given)"""
+        if login_id is None:
+            login_id = str(uuid.uuid4())
+
+        async def insert(db):
             await db.execute(
-                "INSERT INTO login_requests (id, user_id) VALUES (?, ?)",
-                (login_id, user_id)
+                "INSERT INTO login_requests (id, user_id, expires_at, client_key) VALUES (?, ?, ?, ?)",
+                (login_id, user_id, expires_at, client_key)
             )
-            await db.commit()
-            return login_id
-    
+
+        await self._write(insert)
+        return login_id
+
+    @timed(DB_QUERY_SECONDS)
     async def get_login_request(self, login_id: str) -> Optional[dict]:
         """Get login request by ID"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute(
+        async with self.reader() as db:
+            async with db.execute(
                 "SELECT * FROM login_requests WHERE id = ?",
                 (login_id,)
-            )
-            row = await cursor.fetchone()
-            
-            if row:
-                return dict(row)
-            return None
-    
+            ) as cursor:
+                row = await cursor.fetchone()
+
+        if row:
+            return dict(row)
+        return None
+
+    @timed(DB_QUERY_SECONDS)
+    async def get_recent_pending_login_request(
+        self,
+        user_id: int,
+        client_key: str,
+        created_after: datetime,
+        now: datetime
+    ) -> Optional[dict]:
+        """Newest pending, unexpired request of user_id with client_key created at or after created_after"""
+        async with self.reader() as db:
+            # One seek on idx_login_requests_user_status_created_at; the
+            # user's few recent pending rows are then filtered by key
+            async with db.execute(
+                """
+                SELECT * FROM login_requests
+                WHERE user_id = ? AND status = 'pending' AND created_at >= ?
+                    AND client_key = ? AND (expires_at IS NULL OR expires_at > ?)
+                ORDER BY created_at DESC
+                LIMIT 1
+                """,
+                (user_id, created_after, client_key, now)
+            ) as cursor:
+                row = await cursor.fetchone()
+
+        if row:
+            return dict(row)
+        return None
+
+    @timed(DB_QUERY_SECONDS)
     async def update_login_status(self, login_id: str, status: str, session_token: str = None) -> bool:
         """Update login request status and optionally session token"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async def update(db):
             if session_token:
                 await db.execute(
                     "UPDATE login_requests SET status = ?, session_token = ? WHERE id = ?",
@@ -133,5 +341,230 @@ class SQLiteDatabase(DatabaseInterface):
                     "UPDATE login_requests SET status = ? WHERE id = ?",
                     (status, login_id)
                 )
-            await db.commit()
-            return True
+
+        await self._write(update)
+        return True
+
+    @timed(DB_QUERY_SECONDS)
+    async def confirm_login_request(
+        self,
+        login_id: str,
+        user_id: Optional[int],
+        session_token: Optional[str],
+        now: datetime,
+        refresh_token: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Resolve a pending, unexpired login request in one statement
+        Approves it with session_token (and refresh_token) if user_id owns it,
+        denies it otherwise
+        Returns the new status, or None if the request was not pending
+        """
+        async def confirm(db):
+            return await db.execute_fetchall(
+                """
+                UPDATE login_requests
+                SET status = CASE WHEN user_id = ? THEN 'approved' ELSE 'denied' END,
+                    session_token = CASE WHEN user_id = ? THEN ? ELSE NULL END,
+                    refresh_token = CASE WHEN user_id = ? THEN ? ELSE NULL END
+                WHERE id = ? AND status = 'pending' AND (expires_at IS NULL OR expires_at > ?)
+                RETURNING status
+                """,
+                (user_id, user_id, session_token, user_id, refresh_token, login_id, now)
+            )
+
+        rows = await self._write(confirm)
+        if rows:
+            return rows[0]["status"]
+        return None
+
+    @timed(DB_QUERY_SECONDS)
+    async def deny_login_request(self, login_id: str, user_id: int, now: datetime) -> bool:
+        """Deny a pending, unexpired login request owned by user_id"""
+        async def deny(db):
+            return await db.execute_fetchall(
+                """
+                UPDATE login_requests SET status = 'denied'
+                WHERE id = ? AND user_id = ? AND status = 'pending'
+                    AND (expires_at IS NULL OR expires_at > ?)
+                RETURNING id
+                """,
+                (login_id, user_id, now)
+            )
+
+        return bool(await self._write(deny))
+
+    @timed(DB_QUERY_SECONDS)
+    async def expire_login_requests(self, now: datetime, limit: int) -> List[str]:
+        """Flip up to limit overdue pending requests to expired and return their IDs"""
+        async with self.writer() as db:
+            rows = await db.execute_fetchall(
+                """
+                UPDATE login_requests SET status = 'expired'
+                WHERE id IN (
+                    SELECT id FROM login_requests
+                    WHERE status = 'pending' AND expires_at <= ?
+                    LIMIT ?
+                )
+                RETURNING id
+                """,
+                (now, limit)
+            )
+        return [row["id"] for row in rows]
+
+    @timed(DB_QUERY_SECONDS)
+    async def take_login_refresh_token(self, login_id: str) -> Optional[str]:
+        """Return the request's refresh token and clear it in the same transaction"""
+        async with self.writer() as db:
+            # IMMEDIATE holds the write lock across both statements, so two
+            # workers reading the same status cannot both get the token
+            await db.execute("BEGIN IMMEDIATE")
+            rows = await db.execute_fetchall(
+                "SELECT refresh_token FROM login_requests WHERE id = ? AND refresh_token IS NOT NULL",
+                (login_id,)
+            )
+            if not rows:
+                return None
+            await db.execute("UPDATE login_requests SET refresh_token = NULL WHERE id = ?", (login_id,))
+        return rows[0]["refresh_token"]
+
+    @timed(DB_QUERY_SECONDS)
+    async def count_pending_login_requests(self, now: datetime) -> int:
+        """Count pending, unexpired requests"""
+        async with self.reader() as db:
+            # Stays inside the partial idx_login_requests_pending_expires_at
+            rows = await db.execute_fetchall(
+                "SELECT COUNT(*) FROM login_requests WHERE status = 'pending' AND expires_at > ?",
+                (now,)
+            )
+        return rows[0][0]
+
+    @timed(DB_QUERY_SECONDS)
+    async def clear_login_refresh_tokens(self, expired_before: datetime, limit: int) -> int:
+        """Null up to limit refresh tokens of requests whose deadline is before the cutoff"""
+        async with self.writer() as db:
+            cursor = await db.execute(
+                """
+                UPDATE login_requests SET refresh_token = NULL
+                WHERE rowid IN (
+                    SELECT rowid FROM login_requests
+                    WHERE refresh_token IS NOT NULL AND expires_at < ?
+                    LIMIT ?
+                )
+                """,
+                (expired_before, limit)
+            )
+            cleared = cursor.rowcount
+            await cursor.close()
+        return cleared
+
+    @timed(DB_QUERY_SECONDS)
+    async def purge_login_requests(self, created_before: datetime, limit: int) -> int:
+        """Delete up to limit requests created before the cutoff and return the count"""
+        async with self.writer() as db:
+            cursor = await db.execute(
+                """
+                DELETE FROM login_requests
+                WHERE rowid IN (
+                    SELECT rowid FROM login_requests
+                    WHERE created_at < ?
+                    LIMIT ?
+                )
+                """,
+                (created_before, limit)
+            )
+            deleted = cursor.rowcount
+            await cursor.close()
+        return deleted
+
+    @timed(DB_QUERY_SECONDS)
+    async def save_login_prompt(self, login_id: str, chat_id: int, message_id: int):
+        """Record the message carrying a login request's buttons"""
+        async def insert(db):
+            await db.execute(
+                "INSERT OR REPLACE INTO login_prompts (chat_id, message_id, login_id) VALUES (?, ?, ?)",
+                (chat_id, message_id, login_id)
+            )
+
+        await self._write(insert)
+
+    @timed(DB_QUERY_SECONDS)
+    async def delete_login_prompt(self, login_id: str, chat_id: int, message_id: int):
+        """Forget a prompt message"""
+        async def delete(db):
+            await db.execute(
+                "DELETE FROM login_prompts WHERE chat_id = ? AND message_id = ? AND login_id = ?",
+                (chat_id, message_id, login_id)
+            )
+
+        await self._write(delete)
+
+    @timed(DB_QUERY_SECONDS)
+    async def claim_stale_login_prompts(self, now: datetime, limit: int) -> List[dict]:
+        """
+        Delete up to limit prompts that no longer need their buttons and return them
+        with the status to show: the request's final status, expired (also for
+        purged requests) or superseded by a newer prompt for the same request
+        """
+        async with self.writer() as db:
+            # Select and delete under one write lock so two bots never both claim a prompt
+            await db.execute("BEGIN IMMEDIATE")
+            rows = await db.execute_fetchall(
+                """
+                SELECT p.login_id, p.chat_id, p.message_id,
+                    CASE
+                        WHEN r.id IS NULL THEN 'expired'
+                        WHEN r.status != 'pending' THEN r.status
+                        WHEN r.expires_at <= ? THEN 'expired'
+                        ELSE 'superseded'
+                    END AS status
+                FROM login_prompts p
+                LEFT JOIN login_requests r ON r.id = p.login_id
+                WHERE r.id IS NULL OR r.status != 'pending' OR r.expires_at <= ?
+                    OR EXISTS (
+                        SELECT 1 FROM login_prompts newer
+                        WHERE newer.login_id = p.login_id AND newer.chat_id = p.chat_id
+                            AND newer.message_id > p.message_id
+                    )
+                LIMIT ?
+                """,
+                (now, now, limit)
+            )
+            if rows:
+                await db.executemany(
+                    "DELETE FROM login_prompts WHERE chat_id = ? AND message_id = ?",
+                    [(row["chat_id"], row["message_id"]) for row in rows]
+                )
+        return [dict(row) for row in rows]
+
+    async def export_rows(self, table: str, chunk_size: int) -> AsyncIterator[List[dict]]:
+        """Keyset-paginate by rowid so no read transaction spans the whole export"""
+        columns = ", ".join(EXPORT_COLUMNS[table])
+        last_rowid = 0
+        while True:
+            async with self.reader() as db:
+                rows = await db.execute_fetchall(
+                    f"SELECT rowid AS _rowid, {columns} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last_rowid, chunk_size)
+                )
+            if not rows:
+                return
+
+            last_rowid = rows[-1]["_rowid"]
+            yield [{column: row[column] for column in EXPORT_COLUMNS[table]} for row in rows]
+
+    @timed(DB_QUERY_SECONDS)
+    async def import_rows(self, table: str, rows: List[dict]) -> int:
+        """Insert a chunk with one executemany, skipping rows that conflict"""
+        if not rows:
+            return 0
+
+        columns = EXPORT_COLUMNS[table]
+        placeholders = ", ".join("?" for _ in columns)
+        async with self.writer() as db:
+            before = db.total_changes
+            await db.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) ON CONFLICT DO NOTHING",
+                [tuple(row.get(column) for column in columns) for row in rows]
+            )
+            return db.total_changes - before
@@ -0,0 +1,129 @@
+"""
+Registration token storage
+Pluggable backends behind TokenService: in-memory for single-process
+setups, SQLite for sharing tokens between API workers
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Optional, Dict, List, Tuple
+from src.database.sqlite import SQLiteDatabase
+from src.models.token import RegistrationToken
+from src.config import settings
+
+class TokenStore(ABC):
+    """Abstract base class for registration token storage"""
+
+    @abstractmethod
+    async def save(self, token: str, user_id: int, expires_at: datetime):
+        """Store a new unused token"""
+        pass
+
+    @abstractmethod
+    async def save_many(self, tokens: List[Tuple[str, int, datetime]]):
+        """Store several (token, user_id, expires_at) tuples at once"""
+        pass
+
+    @abstractmethod
+    async def consume(self, token: str) -> Optional[int]:
+        """
+        Atomically mark a valid, unused token as used
+        Returns the token's user_id, or None if missing, used or expired
+        """
+        pass
+
+    @abstractmethod
+    async def purge_expired(self) -> int:
+        """Delete expired tokens and return how many were removed"""
+        pass
+
+class InMemoryTokenStore(TokenStore):
+    """Process-local token store (single worker only)"""
+
+    def __init__(self):
+        self.tokens: Dict[str, RegistrationToken] = {}
+
+    async def save(self, token: str, user_id: int, expires_at: datetime):
+        self.tokens[token] = RegistrationToken(
+            token=token,
+            user_id=user_id,
+            created_at=datetime.now(),
+            expires_at=expires_at
+        )
+
+    async def save_many(self, tokens: List[Tuple[str, int, datetime]]):
+        for token, user_id, expires_at in tokens:
+            await self.save(token, user_id, expires_at)
+
+    async def consume(self, token: str) -> Optional[int]:
+        # No await between check and update, so this is atomic on the event loop
+        registration_token = self.tokens.get(token)
+        if not registration_token or not registration_token.is_valid():
+            return None
+
+        registration_token.used = True
+        return registration_token.user_id
+
+    async def purge_expired(self) -> int:
+        expired = [token for token, data in self.tokens.items() if data.is_expired()]
+        for token in expired:
+            del self.tokens[token]
+        return len(expired)
+
+class SQLiteTokenStore(TokenStore):
+    """Token store backed by the registration_tokens table"""
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+
+    async def save(self, token: str, user_id: int, expires_at: datetime):
+        async with self.db.writer() as conn:
+            await conn.execute(
+                "INSERT INTO registration_tokens (token, user_id, expires_at) VALUES (?, ?, ?)",
+                (token, user_id, expires_at)
+            )
+
+    async def save_many(self, tokens: List[Tuple[str, int, datetime]]):
+        async with self.db.writer() as conn:
+            await conn.executemany(
+                "INSERT INTO registration_tokens (token, user_id, expires_at) VALUES (?, ?, ?)",
+                tokens
+            )
+
+    async def consume(self, token: str) -> Optional[int]:
+        async with self.db.writer() as conn:
+            async with conn.execute(
+                """
+                UPDATE registration_tokens SET used = 1
+                WHERE token = ? AND used = 0 AND expires_at > ?
+                RETURNING user_id
+                """,
+                (token, datetime.now())
+            ) as cursor:
+                row = await cursor.fetchone()
+
+        if row:
+            return row["user_id"]
+        return None
+
+    async def purge_expired(self) -> int:
+        async with self.db.writer() as conn:
+            cursor = await conn.execute(
+                "DELETE FROM registration_tokens WHERE expires_at <= ?",
+                (datetime.now(),)
+            )
+            deleted = cursor.rowcount
+            await cursor.close()
+        return deleted
+
+def create_token_store(db: SQLiteDatabase, backend: str = None) -> TokenStore:
+    """
+    Build the token store selected by settings.TOKEN_STORE
+    """
+    if backend is None:
+        backend = settings.TOKEN_STORE
+
+    if backend == "sqlite":
+        return SQLiteTokenStore(db)
+    if backend == "memory":
+        return InMemoryTokenStore()
+    raise ValueError(f"Unknown token store backend: {backend}")
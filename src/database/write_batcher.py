@@ -0,0 +1,130 @@
+"""
+Group commit
+Coalesces small concurrent writes into one SQLite transaction so a burst
+pays for one commit instead of one per statement
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+import aiosqlite
+from src.utils.metrics import REGISTRY
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+GROUP_COMMIT_BATCH_SIZE = REGISTRY.histogram(
+    "telelogin_db_group_commit_batch_size",
+    "Writes committed per group-commit transaction",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+GROUP_COMMIT_SECONDS = REGISTRY.histogram(
+    "telelogin_db_group_commit_seconds",
+    "Time to run and commit one group-commit transaction"
+)
+
+WriteOp = Callable[[aiosqlite.Connection], Awaitable[Any]]
+
+class WriteBatcher:
+    """
+    Collects write operations for up to window_ms (or max_batch ops) and
+    runs them in a single transaction on the database's writer connection
+    If an op fails the batch is replayed with every op in its own SAVEPOINT,
+    so the failure is reported to its caller alone; callers resume only
+    after COMMIT, and ops must not have side effects outside the database
+    """
+
+    def __init__(self, db, window_ms: Optional[float] = None, max_batch: Optional[int] = None):
+        self.db = db
+        self.window = (window_ms if window_ms is not None else settings.DB_GROUP_COMMIT_WINDOW_MS) / 1000
+        self.max_batch = max(1, max_batch if max_batch is not None else settings.DB_GROUP_COMMIT_MAX_BATCH)
+        self._pending: List[Tuple[WriteOp, asyncio.Future]] = []
+        self._full = asyncio.Event()
+        self._waiting = False
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, op: WriteOp) -> Any:
+        """Run op(conn) in the next group transaction and return its result once committed"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((op, future))
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        if not self._waiting:
+            self._schedule()
+        return await future
+
+    def _schedule(self):
+        self._waiting = True
+        task = asyncio.create_task(self._flush_after_window())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush_after_window(self):
+        if len(self._pending) < self.max_batch:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.window)
+            except asyncio.TimeoutError:
+                pass
+
+        batch = self._pending[:self.max_batch]
+        self._pending = self._pending[self.max_batch:]
+        self._full.clear()
+        self._waiting = False
+        # Start collecting the next batch while this one waits for the writer
+        if self._pending:
+            if len(self._pending) >= self.max_batch:
+                self._full.set()
+            self._schedule()
+
+        await self._commit(batch)
+
+    async def _commit(self, batch: List[Tuple[WriteOp, asyncio.Future]]):
+        batch = [(op, future) for op, future in batch if not future.cancelled()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        try:
+            async with self.db.writer() as conn:
+                await conn.execute("BEGIN IMMEDIATE")
+                try:
+                    # Fast path: no per-op savepoints while everything succeeds
+                    results = [(True, await op(conn)) for op, _ in batch]
+                except Exception:
+                    # Replay with each op isolated so only the failing ones error
+                    await conn.rollback()
+                    await conn.execute("BEGIN IMMEDIATE")
+                    results = [await self._run_isolated(conn, op) for op, _ in batch]
+        except Exception as e:
+            logger.error(f"Group commit of {len(batch)} writes failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        GROUP_COMMIT_BATCH_SIZE.observe(len(batch))
+        GROUP_COMMIT_SECONDS.observe(time.perf_counter() - started)
+        for (_, future), (ok, value) in zip(batch, results):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    @staticmethod
+    async def _run_isolated(conn: aiosqlite.Connection, op: WriteOp) -> Tuple[bool, Any]:
+        await conn.execute("SAVEPOINT batched_write")
+        try:
+            result = (True, await op(conn))
+        except Exception as e:
+            await conn.execute("ROLLBACK TO batched_write")
+            result = (False, e)
+        await conn.execute("RELEASE batched_write")
+        return result
+
+    async def drain(self):
+        """Flush everything submitted so far"""
+        while self._tasks:
+            self._full.set()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
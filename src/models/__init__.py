@@ -1,5 +1,5 @@
 """Models module"""
 from src.models.user import User
-from src.models.token import RegistrationToken, LoginRequest
+from src.models.token import RegistrationToken, LoginRequest, Session
 
-__all__ = ["User", "RegistrationToken", "LoginRequest"]
+__all__ = ["User", "RegistrationToken", "LoginRequest", "Session"]
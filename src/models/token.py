@@ -29,7 +29,58 @@ class LoginRequest:
     user_id: int
     status: str  # pending, approved, denied, expired
     created_at: datetime
+    expires_at: Optional[datetime] = None  # UTC, like created_at
     
     def is_pending(self) -> bool:
         """Check if login is pending"""
         return self.status == "pending"
+    
+    def is_expired(self) -> bool:
+        """Check if login has expired (even if the sweeper has not flipped it yet)"""
+        if self.status == "expired":
+            return True
+        return self.is_pending() and self.expires_at is not None and datetime.utcnow() >= self.expires_at
+    
+    @classmethod
+    def from_row(cls, row: dict) -> "LoginRequest":
+        """Build from a login_requests row as returned by the database layer"""
+        return cls(
+            id=row["id"],
+            user_id=row["user_id"],
+            status=row["status"],
+            created_at=_parse_datetime(row.get("created_at")),
+            expires_at=_parse_datetime(row.get("expires_at"))
+        )
+
+@dataclass
+class Session:
+    """Refresh token session; only hashes of its refresh tokens are kept"""
+    id: str
+    user_id: int
+    username: str
+    refresh_hash: str
+    expires_at: datetime  # UTC; pushed forward by every refresh
+    previous_hash: Optional[str] = None  # The refresh token this one replaced
+    revoked_at: Optional[datetime] = None
+    
+    def is_active(self, now: datetime) -> bool:
+        """Check if the session can still be refreshed"""
+        return self.revoked_at is None and now < self.expires_at
+    
+    @classmethod
+    def from_row(cls, row: dict) -> "Session":
+        """Build from a sessions row as returned by the database layer"""
+        return cls(
+            id=row["id"],
+            user_id=row["user_id"],
+            username=row["username"],
+            refresh_hash=row["refresh_hash"],
+            expires_at=_parse_datetime(row["expires_at"]),
+            previous_hash=row.get("previous_hash"),
+            revoked_at=_parse_datetime(row.get("revoked_at"))
+        )
+
+def _parse_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
@@ -2,5 +2,16 @@
 from src.services.auth_service import AuthService
 from src.services.user_service import UserService
 from src.services.token_service import TokenService
+from src.services.introspection_service import IntrospectionService
+from src.services.session_service import SessionService
+from src.services.rate_limiter import RateLimiter, RateLimitExceeded
 
-__all__ = ["AuthService", "UserService", "TokenService"]
+__all__ = [
+    "AuthService",
+    "UserService",
+    "TokenService",
+    "IntrospectionService",
+    "SessionService",
+    "RateLimiter",
+    "RateLimitExceeded"
+]
@@ -2,29 +2,111 @@
 Authentication service
 Handles login logic and bot notifications
 """
-from typing import Optional, Dict
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Tuple
 from src.database.base import DatabaseInterface
+from src.models.token import LoginRequest
+from src.models.user import User
 from src.services.token_service import TokenService
+from src.services.session_service import SessionService
+from src.services.login_waiters import LoginStatusNotifier
+from src.services.introspection_service import token_hash
+from src.services.notification_dispatcher import NotificationDispatcher, DispatchQueueFullError
+from src.services.transports import NotificationTransport, HttpNotificationTransport
 from src.utils.crypto import create_access_token
+from src.utils.periodic import PeriodicTask
+from src.utils.metrics import REGISTRY
 import logging
-import httpx
 from src.config import settings
 
 logger = logging.getLogger(__name__)
 
+LOGINS_STARTED = REGISTRY.counter("telelogin_logins_started", "Login requests created")
+LOGINS_COALESCED = REGISTRY.counter("telelogin_logins_coalesced", "start-login calls answered with an already pending request")
+LOGIN_PROMPTS_RESENT = REGISTRY.counter("telelogin_login_prompts_resent", "Telegram prompts re-sent for a reused pending request")
+LOGINS_REJECTED = REGISTRY.counter("telelogin_logins_rejected", "start-login calls refused because the notification queue was full")
+LOGIN_RESULTS = REGISTRY.counter("telelogin_login_results", "Login requests leaving pending, by final status", ["status"])
+START_LOGIN_SECONDS = REGISTRY.histogram("telelogin_start_login_seconds", "start_login latency")
+LOGIN_DECISION_SECONDS = REGISTRY.histogram(
+    "telelogin_login_decision_seconds",
+    "Time from start-login (notification queued) to the user's confirm or deny",
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+)
+
+# Bound on pending logins tracked for decision latency (confirmations
+# handled by other workers are only dropped from here when they expire)
+MAX_TRACKED_PENDING = 100000
+
 class AuthService:
     """Authentication service for login flow"""
     
-    def __init__(self, db: DatabaseInterface):
+    def __init__(
+        self,
+        db: DatabaseInterface,
+        notification_transport: Optional[NotificationTransport] = None,
+        session_service: Optional[SessionService] = None
+    ):
         self.db = db
         self.token_service = TokenService()
-        self.bot_notification_url = None  # Will be set if needed
+        # Approved logins open a refresh token session when one is given
+        self.session_service = session_service
+        # HTTP to the bot by default; the combined entry point swaps in a direct call
+        self.notification_transport = notification_transport or HttpNotificationTransport()
+        self.status_notifier = LoginStatusNotifier()
+        # login_id -> perf_counter at start-login, for decision latency
+        self._pending_since: "OrderedDict[str, float]" = OrderedDict()
+        # login_id -> perf_counter when its Telegram prompt was last queued;
+        # forgotten again if the dispatcher drops the prompt or gives up on it
+        self._prompted_at: "OrderedDict[str, float]" = OrderedDict()
+        # (user_id, hashed idempotency key) -> in-flight lookup-or-create,
+        # shared by concurrent retries of one client
+        self._starting: Dict[Tuple[int, str], asyncio.Future] = {}
+        self.dispatcher = NotificationDispatcher(self._deliver_notification, on_undelivered=self._prompt_lost)
+        self.sweeper = PeriodicTask(
+            "login-request-sweeper",
+            settings.LOGIN_SWEEP_INTERVAL_SECONDS,
+            self.sweep_login_requests
+        )
+    
+    async def start(self):
+        """Open the notification transport and start the notification workers"""
+        await self.notification_transport.start()
+        self.dispatcher.start()
+    
+    async def close(self):
+        """Drain and stop the notification workers, then close the transport"""
+        await self.dispatcher.stop()
+        await self.notification_transport.close()
+    
+    def http_pool_stats(self) -> Dict[str, int]:
+        """Connection pool statistics for the bot notification client"""
+        return self.notification_transport.pool_stats()
+    
+    async def count_pending_logins(self) -> int:
+        """Pending, unexpired login requests of every worker (one indexed count)"""
+        return await self.db.count_pending_login_requests(datetime.utcnow())
+    
+    def _finish(self, login_id: str, status: str):
+        """Record a login request leaving pending"""
+        LOGIN_RESULTS.labels(status).inc()
+        self._prompted_at.pop(login_id, None)
+        started = self._pending_since.pop(login_id, None)
+        if started is not None and status != "expired":
+            LOGIN_DECISION_SECONDS.observe(time.perf_counter() - started)
     
-    async def start_login(self, username: str) -> Optional[Dict[str, str]]:
+    async def start_login(self, username: str, idempotency_key: Optional[str] = None) -> Optional[Dict[str, str]]:
         """
         Start login process for a user
+        Retries carrying the same idempotency_key may get the same request back
         Returns login_id and status
         """
+        with START_LOGIN_SECONDS.time():
+            return await self._start_login(username, idempotency_key)
+    
+    async def _start_login(self, username: str, idempotency_key: Optional[str]) -> Optional[Dict[str, str]]:
         user = await self.db.get_user_by_username(username)
         
         if not user:
@@ -35,88 +117,196 @@ class AuthService:
             logger.warning(f"User {username} has not linked Telegram account")
             return None
         
+        # The login_id is the only thing a waiting client needs to collect
+        # the session, so a request is only ever shared with the client that
+        # started it: the one holding its idempotency key
+        client_key = token_hash(idempotency_key) if idempotency_key else None
+        if client_key is None or settings.LOGIN_COALESCE_WINDOW_SECONDS <= 0:
+            return await self._create_login(user, username, client_key)
+        
+        # Double clicks and retries of one client share a single
+        # lookup-or-create; shielded so a caller going away does not cancel
+        # it for the others
+        key = (user.id, client_key)
+        starting = self._starting.get(key)
+        if starting is None:
+            starting = asyncio.ensure_future(self._reuse_or_create_login(user, username, client_key))
+            self._starting[key] = starting
+            starting.add_done_callback(lambda _: self._starting.pop(key, None))
+        return await asyncio.shield(starting)
+    
+    async def _reuse_or_create_login(self, user: User, username: str, client_key: str) -> Dict[str, str]:
+        """Return this client's recent pending request if there is one, else start a new one"""
+        now = datetime.utcnow()
+        existing = await self.db.get_recent_pending_login_request(
+            user.id,
+            client_key,
+            now - timedelta(seconds=settings.LOGIN_COALESCE_WINDOW_SECONDS),
+            now
+        )
+        if existing is None:
+            return await self._create_login(user, username, client_key)
+        
+        login_id = existing["id"]
+        LOGINS_COALESCED.inc()
+        prompted = self._prompted_at.get(login_id)
+        cooldown = settings.LOGIN_RENOTIFY_COOLDOWN_SECONDS
+        if prompted is None:
+            # No prompt on record here: it was dropped or never delivered, or
+            # another worker (or this one before a restart) sent it. Queue one
+            # rather than hand back a request the user may never hear about;
+            # if the queue is full the client gets a 503 and retries
+            LOGIN_PROMPTS_RESENT.inc()
+            try:
+                self._prompt(user.telegram_id, login_id, username)
+            except DispatchQueueFullError:
+                LOGINS_REJECTED.inc()
+                raise
+        elif cooldown > 0 and time.perf_counter() - prompted >= cooldown and self.dispatcher.accepting():
+            LOGIN_PROMPTS_RESENT.inc()
+            self._prompt(user.telegram_id, login_id, username)
+        
+        return {
+            "login_id": login_id,
+            "status": "pending"
+        }
+    
+    async def _create_login(self, user: User, username: str, client_key: Optional[str] = None) -> Dict[str, str]:
+        # Apply backpressure before writing anything
+        if not self.dispatcher.accepting():
+            LOGINS_REJECTED.inc()
+            raise DispatchQueueFullError("Notification queue is full")
+        
         # Create login request
-        login_id = await self.db.create_login_request(user.id)
+        expires_at = datetime.utcnow() + timedelta(seconds=settings.LOGIN_REQUEST_EXPIRE_SECONDS)
+        login_id = await self.db.create_login_request(user.id, expires_at, client_key)
         
-        # Send Telegram notification to user
         try:
-            await self.send_login_notification(user.telegram_id, login_id, username)
-        except Exception as e:
-            logger.error(f"Failed to send login notification: {e}")
+            self._prompt(user.telegram_id, login_id, username)
+        except DispatchQueueFullError:
+            # The queue filled up during the insert; retire the row so no
+            # pending request is left without a prompt
+            LOGINS_REJECTED.inc()
+            await self.db.update_login_status(login_id, "expired")
+            raise
+        
+        LOGINS_STARTED.inc()
+        self._pending_since[login_id] = time.perf_counter()
+        if len(self._pending_since) > MAX_TRACKED_PENDING:
+            self._pending_since.popitem(last=False)
         
         return {
             "login_id": login_id,
             "status": "pending"
         }
     
-    async def send_login_notification(self, telegram_id: int, login_id: str, username: str):
+    def _prompt(self, telegram_id: int, login_id: str, username: str):
         """
-        Send login notification via bot HTTP endpoint
+        Queue the Telegram notification; workers deliver it with retries
+        Raises DispatchQueueFullError if the queue rejects it
         """
-        bot_url = f"http://bot:8001/notify-login"
+        queued = self.dispatcher.submit({
+            "telegram_id": telegram_id,
+            "login_id": login_id,
+            "username": username
+        })
+        if not queued:
+            return
         
-        try:
-            async with httpx.AsyncClient(timeout=15.0) as client:
-                response = await client.post(
-                    bot_url,
-                    json={
-                        "telegram_id": telegram_id,
-                        "login_id": login_id,
-                        "username": username
-                    }
-                )
-                
-                if response.status_code == 200:
-                    logger.info(f"Login notification sent successfully to telegram_id={telegram_id}")
-                else:
-                    logger.error(f"Failed to send notification: {response.status_code} - {response.text}")
-        except httpx.ReadTimeout:
-            logger.error(f"Timeout sending notification to telegram_id={telegram_id}. Bot may not be ready.")
-        except httpx.ConnectError:
-            logger.error(f"Cannot connect to bot service. Make sure bot is running.")
-        except Exception as e:
-            logger.error(f"Error sending login notification: {e}", exc_info=True)
+        self._prompted_at[login_id] = time.perf_counter()
+        self._prompted_at.move_to_end(login_id)
+        if len(self._prompted_at) > MAX_TRACKED_PENDING:
+            self._prompted_at.popitem(last=False)
+    
+    def _prompt_lost(self, payload: Dict):
+        """Dispatcher hook: the prompt never reached the bot, so a retry must re-queue it"""
+        self._prompted_at.pop(payload["login_id"], None)
+    
+    async def _deliver_notification(self, payload: Dict):
+        await self.send_login_notification(
+            payload["telegram_id"],
+            payload["login_id"],
+            payload["username"]
+        )
+    
+    async def send_login_notification(self, telegram_id: int, login_id: str, username: str):
+        """
+        Send login notification to the bot through the notification transport
+        Raises on failure so the dispatcher can retry; 4xx answers are permanent
+        """
+        await self.notification_transport.send_login_notification(telegram_id, login_id, username)
     
     async def confirm_login(self, login_id: str, telegram_id: int) -> Optional[Dict[str, str]]:
         """
         Confirm login request
         Returns authentication token
         """
-        login_request = await self.db.get_login_request(login_id)
+        # Resolve the Telegram user (usually a cache hit); ownership, pending
+        # state and expiry are all checked by the single conditional update
+        user = await self.db.get_user_by_telegram_id(telegram_id)
         
-        if not login_request:
-            logger.warning(f"Invalid login request: {login_id}")
-            return None
+        # Generate session token up front; the session itself is only built in
+        # memory here and stored once the update below approves the request
+        access_token = None
+        session = refresh_token = None
+        if user and self.session_service is not None and settings.SESSIONS_ENABLED:
+            session, refresh_token = self.session_service.new_session(user.id, user.username)
+            access_token = self.session_service.access_token(session)
+        elif user:
+            access_token = create_access_token(
+                data={"sub": user.username, "user_id": user.id}
+            )
         
-        if login_request["status"] != "pending":
-            logger.warning(f"Login request {login_id} is not pending")
-            return None
+        status = await self.db.confirm_login_request(
+            login_id,
+            user.id if user else None,
+            access_token,
+            datetime.utcnow(),
+            refresh_token
+        )
         
-        # Verify telegram_id matches user
-        user = await self.db.get_user_by_telegram_id(telegram_id)
+        if status is None:
+            logger.warning(f"Invalid, expired or already answered login request: {login_id}")
+            return None
         
-        if not user or user.id != login_request["user_id"]:
+        if status != "approved":
             logger.warning(f"Telegram ID mismatch for login {login_id}")
-            await self.db.update_login_status(login_id, "denied")
+            self._finish(login_id, "denied")
+            self.status_notifier.notify(login_id, {"status": "denied"})
             return None
         
-        # Generate session token
-        access_token = create_access_token(
-            data={"sub": user.username, "user_id": user.id}
-        )
+        if session is not None:
+            await self.session_service.start_session(session)
         
-        # Update status to approved with token
-        await self.db.update_login_status(login_id, "approved", access_token)
+        self._finish(login_id, "approved")
+        # The refresh token stays out of the broadcast; a waiter takes it
+        # from the row, so it is handed out exactly once
+        self.status_notifier.notify(login_id, {"status": "approved", "session_token": access_token})
         
         return {
             "status": "authenticated",
             "session_token": access_token
         }
     
+    async def deny_login(self, login_id: str, telegram_id: int) -> bool:
+        """
+        Deny a pending login request on behalf of its Telegram user
+        """
+        user = await self.db.get_user_by_telegram_id(telegram_id)
+        
+        if not user or not await self.db.deny_login_request(login_id, user.id, datetime.utcnow()):
+            logger.warning(f"Cannot deny login request {login_id}: not found, not pending or not owned")
+            return False
+        
+        self._finish(login_id, "denied")
+        self.status_notifier.notify(login_id, {"status": "denied"})
+        return True
+    
     async def get_login_status(self, login_id: str) -> Optional[Dict[str, str]]:
         """
         Get status of login request
-        Returns status and session_token if approved
+        Returns status, plus session_token if approved; the first read of an
+        approved request also gets its refresh_token, which is then cleared
         """
         login_request = await self.db.get_login_request(login_id)
         
@@ -125,8 +315,87 @@ class AuthService:
         
         result = {"status": login_request["status"]}
         
+        # Report overdue requests as expired before the sweeper flips them
+        if LoginRequest.from_row(login_request).is_expired():
+            result["status"] = "expired"
+        
         # Include session token if login was approved
         if login_request["status"] == "approved" and login_request.get("session_token"):
             result["session_token"] = login_request["session_token"]
+            if login_request.get("refresh_token"):
+                refresh_token = await self.db.take_login_refresh_token(login_id)
+                if refresh_token is not None:
+                    result["refresh_token"] = refresh_token
         
         return result
+    
+    async def wait_for_login_status(self, login_id: str, timeout: float) -> Optional[Dict[str, str]]:
+        """
+        Wait up to timeout seconds for a login request to leave "pending"
+        Costs one database read; the change itself is pushed by confirm/deny/sweep.
+        Returns the final status, the still-pending status on timeout, or None
+        if the request does not exist
+        """
+        # Subscribe first so a change landing during the read is not lost
+        waiter = self.status_notifier.subscribe(login_id)
+        try:
+            result = await self.get_login_status(login_id)
+            if result is None or result["status"] != "pending":
+                return result
+            
+            try:
+                result = await asyncio.wait_for(waiter, timeout)
+            except asyncio.TimeoutError:
+                # Nothing changed in this process (another worker may have
+                # handled it; the caller's next wait re-reads the row)
+                return result
+            if result["status"] == "approved":
+                # Re-read so this waiter takes the refresh token if it is first
+                return await self.get_login_status(login_id) or result
+            return result
+        finally:
+            self.status_notifier.unsubscribe(login_id, waiter)
+    
+    async def sweep_login_requests(self) -> Dict[str, int]:
+        """
+        Expire overdue pending requests and purge rows past the retention window
+        Works in bounded batches so the write lock is released between them
+        """
+        now = datetime.utcnow()
+        batch_size = settings.LOGIN_SWEEP_BATCH_SIZE
+        
+        expired = 0
+        while True:
+            login_ids = await self.db.expire_login_requests(now, batch_size)
+            expired += len(login_ids)
+            for login_id in login_ids:
+                self._finish(login_id, "expired")
+                self.status_notifier.notify(login_id, {"status": "expired"})
+            if len(login_ids) < batch_size:
+                break
+            await asyncio.sleep(0)
+        
+        # Approved rows hold the first refresh token only until the client has
+        # collected it: one more login window past the request's deadline
+        stale = now - timedelta(seconds=settings.LOGIN_REQUEST_EXPIRE_SECONDS)
+        cleared = 0
+        while True:
+            count = await self.db.clear_login_refresh_tokens(stale, batch_size)
+            cleared += count
+            if count < batch_size:
+                break
+            await asyncio.sleep(0)
+        
+        cutoff = now - timedelta(days=settings.LOGIN_REQUEST_RETENTION_DAYS)
+        purged = 0
+        while True:
+            deleted = await self.db.purge_login_requests(cutoff, batch_size)
+            purged += deleted
+            if deleted < batch_size:
+                break
+            await asyncio.sleep(0)
+        
+        if expired or cleared or purged:
+            logger.info(f"Login sweep: {expired} expired, {cleared} refresh tokens cleared, {purged} purged")
+        
+        return {"expired": expired, "cleared": cleared, "purged": purged}
@@ -0,0 +1,153 @@
+"""
+Token introspection service
+Validates session tokens for downstream services with a verification
+cache and a shared revocation list
+"""
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from src.database.revocation_store import RevocationStore, InMemoryRevocationStore
+from src.utils.crypto import verify_token
+from src.utils.periodic import PeriodicTask
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+INACTIVE = {"active": False}
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+class IntrospectionService:
+    """
+    Answers "is this session token valid, and for whom?"
+    Decoded claims are cached by token hash until the token's exp; the
+    revocation list is held in memory and re-read from the store periodically
+    so revocations made by other workers show up within one refresh interval
+    """
+
+    def __init__(self, store: Optional[RevocationStore] = None, cache_size: Optional[int] = None):
+        self.store = store if store is not None else InMemoryRevocationStore()
+        self.cache_size = cache_size if cache_size is not None else settings.INTROSPECT_CACHE_SIZE
+        # token hash -> (exp as epoch seconds, claims)
+        self._cache: "OrderedDict[str, tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # revocation key -> token expiry (epoch seconds)
+        self._revoked: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.refresher = PeriodicTask(
+            "revocation-list-refresher",
+            settings.REVOCATION_REFRESH_SECONDS,
+            self.refresh_revocations
+        )
+
+    @staticmethod
+    def _revocation_key(claims: Dict[str, Any], hashed: str) -> str:
+        # Tokens issued before jti was added are revoked by hash
+        return claims.get("jti") or f"sha256:{hashed}"
+
+    @staticmethod
+    def _session_key(session_id: str) -> str:
+        return f"sid:{session_id}"
+
+    def _is_revoked(self, claims: Dict[str, Any], hashed: str) -> bool:
+        if self._revocation_key(claims, hashed) in self._revoked:
+            return True
+        # Ending a session also ends every session token issued for it
+        sid = claims.get("sid")
+        return sid is not None and self._session_key(sid) in self._revoked
+
+    def _decode(self, token: str, hashed: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        entry = self._cache.get(hashed)
+        if entry is not None:
+            exp, claims = entry
+            if now < exp:
+                self._cache.move_to_end(hashed)
+                self.hits += 1
+                return claims
+            del self._cache[hashed]
+
+        self.misses += 1
+        claims = verify_token(token)
+        if claims is None or "exp" not in claims:
+            return None
+
+        if self.cache_size > 0:
+            self._cache[hashed] = (float(claims["exp"]), claims)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return claims
+
+    def introspect(self, token: str) -> Dict[str, Any]:
+        """
+        RFC 7662 style answer: {"active": False} or {"active": True, **claims}
+        """
+        hashed = token_hash(token)
+        claims = self._decode(token, hashed)
+        if claims is None or self._is_revoked(claims, hashed):
+            return INACTIVE
+        return {"active": True, **claims}
+
+    def introspect_many(self, tokens: List[str]) -> List[Dict[str, Any]]:
+        """Introspect several tokens; results are in request order"""
+        return [self.introspect(token) for token in tokens]
+
+    async def revoke(self, token: str) -> bool:
+        """
+        Revoke a valid session token until its expiry
+        Returns False if the token is invalid or already expired
+        """
+        hashed = token_hash(token)
+        claims = self._decode(token, hashed)
+        if claims is None:
+            return False
+
+        key = self._revocation_key(claims, hashed)
+        exp = float(claims["exp"])
+        await self.store.add(key, datetime.utcfromtimestamp(exp))
+        self._revoked[key] = exp
+        self._cache.pop(hashed, None)
+        logger.info(f"Revoked token {key} for {claims.get('sub')}")
+        return True
+
+    async def revoke_sessions(self, session_ids: List[str]):
+        """
+        Revoke every session token carrying one of these sid claims
+        Kept for ACCESS_TOKEN_EXPIRE_MINUTES, by when all of them have expired
+        """
+        if not session_ids:
+            return
+        expires_at = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        exp = (expires_at - datetime(1970, 1, 1)).total_seconds()
+        for session_id in session_ids:
+            key = self._session_key(session_id)
+            await self.store.add(key, expires_at)
+            self._revoked[key] = exp
+        logger.info(f"Revoked session tokens of {len(session_ids)} sessions")
+
+    async def refresh_revocations(self) -> int:
+        """Merge the store's revocation list into memory and prune expired entries"""
+        now = datetime.utcnow()
+        await self.store.purge_expired(now)
+        active = await self.store.load_active(now)
+        # Merge rather than replace: a revoke() that ran while load_active
+        # was awaited is already in memory but may be missing from active
+        for key, expires_at in active.items():
+            self._revoked[key] = (expires_at - datetime(1970, 1, 1)).total_seconds()
+        cutoff = (now - datetime(1970, 1, 1)).total_seconds()
+        for key in [key for key, exp in self._revoked.items() if exp <= cutoff]:
+            del self._revoked[key]
+        return len(self._revoked)
+
+    def stats(self) -> Dict[str, int]:
+        """Cache and revocation list counters"""
+        return {
+            "cache_size": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "revoked": len(self._revoked)
+        }
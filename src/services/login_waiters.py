@@ -0,0 +1,41 @@
+"""
+Login status waiter registry
+Lets long-poll and SSE handlers sleep until a login request leaves "pending"
+"""
+import asyncio
+from typing import Dict, Set
+
+class LoginStatusNotifier:
+    """In-process registry of futures waiting on login status changes"""
+
+    def __init__(self):
+        self._waiters: Dict[str, Set[asyncio.Future]] = {}
+
+    def subscribe(self, login_id: str) -> asyncio.Future:
+        """
+        Register interest in a login request
+        Subscribe before reading the current status so no change is missed
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(login_id, set()).add(future)
+        return future
+
+    def unsubscribe(self, login_id: str, future: asyncio.Future):
+        """Drop a waiter (after it fired, timed out or its client went away)"""
+        waiters = self._waiters.get(login_id)
+        if waiters is None:
+            return
+        waiters.discard(future)
+        if not waiters:
+            del self._waiters[login_id]
+
+    def notify(self, login_id: str, result: Dict[str, str]):
+        """Wake every waiter for login_id with the new status payload"""
+        for future in self._waiters.pop(login_id, ()):
+            if not future.done():
+                future.set_result(result)
+
+    @property
+    def waiting(self) -> int:
+        """Number of login requests with at least one waiter"""
+        return len(self._waiters)
@@ -0,0 +1,191 @@
+"""
+Notification dispatcher
+Bounded in-process queue with a worker pool that delivers login
+notifications to the bot with retries and jittered backoff
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("reject", "drop_newest", "drop_oldest")
+
+class DispatchQueueFullError(Exception):
+    """Raised when the queue is full and the overflow policy is 'reject'"""
+    pass
+
+class PermanentDeliveryError(Exception):
+    """Raised by a deliver function for failures that retrying cannot fix"""
+    pass
+
+class NotificationDispatcher:
+    """Deliver payloads through `deliver` from a bounded queue"""
+
+    def __init__(
+        self,
+        deliver: Callable[[Dict[str, Any]], Awaitable[None]],
+        max_size: Optional[int] = None,
+        workers: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        overflow_policy: Optional[str] = None,
+        on_undelivered: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        self.deliver = deliver
+        # Called with every payload that is dropped or runs out of attempts
+        self.on_undelivered = on_undelivered
+        self.max_size = max_size if max_size is not None else settings.NOTIFY_QUEUE_SIZE
+        self.workers = workers if workers is not None else settings.NOTIFY_WORKERS
+        self.max_attempts = max_attempts if max_attempts is not None else settings.NOTIFY_MAX_ATTEMPTS
+        self.backoff_base = backoff_base if backoff_base is not None else settings.NOTIFY_BACKOFF_BASE_SECONDS
+        self.backoff_max = backoff_max if backoff_max is not None else settings.NOTIFY_BACKOFF_MAX_SECONDS
+        self.overflow_policy = overflow_policy if overflow_policy is not None else settings.NOTIFY_QUEUE_OVERFLOW
+        if self.overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {self.overflow_policy}")
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+        self.enqueued = 0
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.retries = 0
+        self._latency_total = 0.0
+        self.latency_max = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        """Start the worker pool on the running event loop"""
+        if self.running:
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"notification-worker-{i}")
+            for i in range(max(1, self.workers))
+        ]
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """Give queued notifications a moment to drain, then stop the workers"""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping dispatcher with {self.depth} notifications still queued")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def accepting(self) -> bool:
+        """False when a new submission would be rejected"""
+        return not (self.overflow_policy == "reject" and self.depth >= self.max_size)
+
+    def submit(self, payload: Dict[str, Any]) -> bool:
+        """
+        Queue a payload for delivery without waiting for it
+        Returns False if it was dropped; raises DispatchQueueFullError
+        under the 'reject' policy when the queue is full
+        """
+        if not self.running:
+            self.start()
+
+        job = {"payload": payload, "enqueued_at": time.monotonic()}
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            if self.overflow_policy == "reject":
+                self.rejected += 1
+                raise DispatchQueueFullError("Notification queue is full")
+            if self.overflow_policy == "drop_newest":
+                self.dropped += 1
+                logger.warning("Notification queue full, dropping new notification")
+                self._undelivered(payload)
+                return False
+            # drop_oldest: make room by discarding the head of the queue
+            oldest = self._queue.get_nowait()
+            self._queue.task_done()
+            self._queue.put_nowait(job)
+            self.dropped += 1
+            logger.warning("Notification queue full, dropped oldest notification")
+            self._undelivered(oldest["payload"])
+
+        self.enqueued += 1
+        return True
+
+    def _undelivered(self, payload: Dict[str, Any]):
+        if self.on_undelivered is None:
+            return
+        try:
+            self.on_undelivered(payload)
+        except Exception as e:
+            logger.error(f"on_undelivered callback failed: {e}", exc_info=True)
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number `attempt`"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1))))
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._deliver_with_retries(job)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver_with_retries(self, job: Dict[str, Any]):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self.deliver(job["payload"])
+            except asyncio.CancelledError:
+                raise
+            except PermanentDeliveryError as e:
+                logger.error(f"Notification rejected, not retrying: {e}")
+                break
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    logger.error(f"Notification failed after {attempt} attempts: {e}")
+                    break
+                self.retries += 1
+                delay = self.backoff(attempt)
+                logger.warning(f"Notification attempt {attempt} failed ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+            else:
+                latency = time.monotonic() - job["enqueued_at"]
+                self.delivered += 1
+                self._latency_total += latency
+                self.latency_max = max(self.latency_max, latency)
+                return
+
+        self.failed += 1
+        self._undelivered(job["payload"])
+
+    def stats(self) -> Dict[str, float]:
+        """Queue depth, counters and enqueue-to-delivery latency"""
+        return {
+            "depth": self.depth,
+            "max_size": self.max_size,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "retries": self.retries,
+            "latency_avg_seconds": self._latency_total / self.delivered if self.delivered else 0.0,
+            "latency_max_seconds": self.latency_max
+        }
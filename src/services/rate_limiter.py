@@ -0,0 +1,58 @@
+"""
+Rate limiter
+Sliding-window limits on expensive endpoints: every start-login sends a
+Telegram message and every registration adds a user
+"""
+import logging
+import math
+import time
+from typing import Optional
+from src.database.rate_limit_store import RateLimitStore, InMemoryRateLimitStore
+from src.utils.periodic import PeriodicTask
+from src.utils.metrics import REGISTRY
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = REGISTRY.counter("telelogin_rate_limited", "Requests rejected by a rate limit", ["scope"])
+
+class RateLimitExceeded(Exception):
+    """Raised when a key is over its limit; retry_after is in whole seconds"""
+
+    def __init__(self, scope: str, retry_after: float):
+        self.scope = scope
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"Rate limit exceeded for {scope}, retry after {self.retry_after}s")
+
+class RateLimiter:
+    """
+    Named sliding-window limits sharing one store and window length
+    Only allowed hits are counted, so a client that backs off for
+    Retry-After seconds gets through
+    """
+
+    def __init__(self, store: Optional[RateLimitStore] = None, window_seconds: Optional[float] = None):
+        self.store = store if store is not None else InMemoryRateLimitStore()
+        self.window = window_seconds if window_seconds is not None else settings.RATE_LIMIT_WINDOW_SECONDS
+        self.sweeper = PeriodicTask("rate-limit-sweeper", self.window, self.purge)
+
+    async def check(self, scope: str, key, limit: int, cost: int = 1):
+        """
+        Count cost hits for (scope, key); raise RateLimitExceeded if over limit (0 disables)
+        A cost above the limit can never pass; callers reject such requests up front
+        """
+        if limit <= 0 or key is None:
+            return
+        if cost > limit:
+            RATE_LIMITED.labels(scope).inc()
+            raise RateLimitExceeded(scope, self.window)
+
+        retry_after = await self.store.hit(f"{scope}:{key}", limit, self.window, time.time(), cost)
+        if retry_after:
+            RATE_LIMITED.labels(scope).inc()
+            logger.info(f"Rate limited {scope} {key}")
+            raise RateLimitExceeded(scope, retry_after)
+
+    async def purge(self) -> int:
+        """Forget counters that no longer affect any decision"""
+        return await self.store.purge(self.window, time.time())
@@ -0,0 +1,143 @@
+"""
+Session service
+Issues and rotates refresh tokens so returning users get a new session
+token without another Telegram confirmation
+"""
+import logging
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from src.database.session_store import SessionStore, InMemorySessionStore
+from src.models.token import Session
+from src.services.introspection_service import IntrospectionService, token_hash
+from src.utils.crypto import create_access_token
+from src.utils.periodic import PeriodicTask
+from src.utils.metrics import REGISTRY
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_STARTED = REGISTRY.counter("telelogin_sessions_started", "Refresh token sessions created by an approved login")
+SESSION_REFRESHES = REGISTRY.counter(
+    "telelogin_session_refreshes",
+    "Refresh token exchanges by result (rotated, invalid, reused)",
+    ["result"]
+)
+SESSIONS_REVOKED = REGISTRY.counter("telelogin_sessions_revoked", "Sessions revoked, by reason", ["reason"])
+
+class SessionService:
+    """
+    Refresh token sessions
+    A refresh token is single use: every refresh returns a new one and
+    only its SHA-256 is stored. Presenting the token that was just replaced
+    means two parties hold the session, so it is revoked outright.
+    """
+
+    def __init__(self, store: Optional[SessionStore] = None, introspection: Optional[IntrospectionService] = None):
+        # Default to process-local storage; pass a SQLiteSessionStore to share sessions between workers
+        self.store = store if store is not None else InMemorySessionStore()
+        # Told about every revoked session so its session tokens stop introspecting as active
+        self.introspection = introspection
+        self.sweeper = PeriodicTask(
+            "session-sweeper",
+            settings.SESSION_SWEEP_INTERVAL_SECONDS,
+            self.purge_sessions
+        )
+
+    @staticmethod
+    def _expiry(now: datetime) -> datetime:
+        return now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+
+    @staticmethod
+    def access_token(session: Session) -> str:
+        """Session token for a session; sid lets downstream services tie it back"""
+        return create_access_token(
+            data={"sub": session.username, "user_id": session.user_id, "sid": session.id}
+        )
+
+    def new_session(self, user_id: int, username: str) -> Tuple[Session, str]:
+        """
+        Build a session and its first refresh token without storing it
+        Pass it to start_session once the login is actually approved
+        """
+        refresh_token = secrets.token_urlsafe(32)
+        session = Session(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            username=username,
+            refresh_hash=token_hash(refresh_token),
+            expires_at=self._expiry(datetime.utcnow())
+        )
+        return session, refresh_token
+
+    async def start_session(self, session: Session):
+        """Store a session built by new_session for a freshly approved login"""
+        await self.store.create(session)
+        SESSIONS_STARTED.inc()
+
+    async def _revoke_access(self, session_ids: List[str]):
+        if self.introspection is not None:
+            await self.introspection.revoke_sessions(session_ids)
+
+    async def refresh(self, refresh_token: str) -> Optional[Dict[str, str]]:
+        """
+        Exchange a refresh token for a new session token and refresh token
+        Returns None if the token is unknown, expired or revoked
+        """
+        now = datetime.utcnow()
+        new_token = secrets.token_urlsafe(32)
+        hashed = token_hash(refresh_token)
+
+        session = await self.store.rotate(hashed, token_hash(new_token), self._expiry(now), now)
+        if session is not None:
+            SESSION_REFRESHES.labels("rotated").inc()
+            return {
+                "session_token": self.access_token(session),
+                "refresh_token": new_token
+            }
+
+        reused = await self.store.revoke_replaced(hashed, now)
+        if reused is not None:
+            SESSION_REFRESHES.labels("reused").inc()
+            SESSIONS_REVOKED.labels("reuse").inc()
+            await self._revoke_access([reused.id])
+            logger.warning(f"Replaced refresh token presented again; revoked session {reused.id} of {reused.username}")
+            return None
+
+        SESSION_REFRESHES.labels("invalid").inc()
+        return None
+
+    async def logout(self, refresh_token: str, all_sessions: bool = False) -> int:
+        """
+        Revoke the session holding refresh_token, or with all_sessions every
+        session of its user; returns how many sessions were revoked
+        """
+        now = datetime.utcnow()
+        session = await self.store.revoke(token_hash(refresh_token), now)
+        if session is None:
+            return 0
+
+        SESSIONS_REVOKED.labels("logout").inc()
+        await self._revoke_access([session.id])
+        if not all_sessions:
+            return 1
+        return 1 + await self.revoke_user_sessions(session.user_id)
+
+    async def revoke_user_sessions(self, user_id: int) -> int:
+        """Revoke every active session of a user (e.g. a compromised account)"""
+        revoked = await self.store.revoke_user(user_id, datetime.utcnow())
+        SESSIONS_REVOKED.labels("user").inc(len(revoked))
+        if revoked:
+            await self._revoke_access(revoked)
+            logger.info(f"Revoked {len(revoked)} sessions of user {user_id}")
+        return len(revoked)
+
+    async def purge_sessions(self) -> int:
+        """
+        Remove expired and revoked sessions from the store
+        """
+        purged = await self.store.purge(datetime.utcnow())
+        if purged:
+            logger.info(f"Purged {purged} expired or revoked sessions")
+        return purged
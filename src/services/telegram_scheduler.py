@@ -0,0 +1,284 @@
+"""
+Telegram send scheduler
+Paces outgoing Bot API calls under Telegram's flood limits: a global
+token bucket, one bucket per chat, priorities and RetryAfter requeueing
+"""
+import asyncio
+import bisect
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from telegram.error import RetryAfter
+from src.utils.metrics import REGISTRY
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_SENDS = REGISTRY.counter(
+    "telelogin_telegram_sends",
+    "Telegram Bot API calls by priority and result (ok, error, rate_limited)",
+    ["priority", "result"]
+)
+TELEGRAM_SEND_SECONDS = REGISTRY.histogram("telelogin_telegram_send_seconds", "Telegram Bot API call latency")
+TELEGRAM_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "telelogin_telegram_queue_wait_seconds",
+    "Time a Telegram call waited in the send scheduler",
+    ["priority"]
+)
+
+# Lower value is sent first
+PRIORITY_LOGIN_PROMPT = 0
+PRIORITY_REPLY = 1
+PRIORITY_EDIT = 2
+PRIORITY_CLEANUP = 3  # Background edits of stale messages
+
+PRIORITY_NAMES = {
+    PRIORITY_LOGIN_PROMPT: "login_prompt",
+    PRIORITY_REPLY: "reply",
+    PRIORITY_EDIT: "edit",
+    PRIORITY_CLEANUP: "cleanup"
+}
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate` tokens per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # Set from Telegram's retry_after
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available (0 if available now)"""
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+class _SendJob:
+    __slots__ = ("priority", "seq", "chat_id", "send", "future", "submitted_at", "not_before", "attempts")
+
+    def __init__(self, priority: int, seq: int, chat_id: int, send: Callable[[], Awaitable[Any]], future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.send = send
+        self.future = future
+        self.submitted_at = time.monotonic()
+        self.not_before = 0.0
+        self.attempts = 0
+
+    def __lt__(self, other: "_SendJob") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+class TelegramSendScheduler:
+    """
+    Single dispatcher task that releases queued Bot API calls as fast as
+    the global and per-chat buckets allow, highest priority first
+    """
+
+    def __init__(
+        self,
+        global_rate: Optional[float] = None,
+        per_chat_rate: Optional[float] = None,
+        per_chat_burst: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        max_chat_buckets: int = 10000
+    ):
+        self.global_rate = global_rate if global_rate is not None else settings.TELEGRAM_GLOBAL_RATE
+        self.per_chat_rate = per_chat_rate if per_chat_rate is not None else settings.TELEGRAM_PER_CHAT_RATE
+        self.per_chat_burst = per_chat_burst if per_chat_burst is not None else settings.TELEGRAM_PER_CHAT_BURST
+        self.max_retries = max_retries if max_retries is not None else settings.TELEGRAM_SEND_MAX_RETRIES
+        self.max_chat_buckets = max_chat_buckets
+
+        self._global = TokenBucket(self.global_rate, self.global_rate)
+        self._chats: "OrderedDict[int, TokenBucket]" = OrderedDict()
+        self._jobs: List[_SendJob] = []  # Kept sorted by (priority, seq)
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight = set()
+
+        self.sent = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self._wait_total: Dict[int, float] = {p: 0.0 for p in PRIORITY_NAMES}
+        self._wait_count: Dict[int, int] = {p: 0 for p in PRIORITY_NAMES}
+        self._wait_max: Dict[int, float] = {p: 0.0 for p in PRIORITY_NAMES}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="telegram-send-scheduler")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        for job in self._jobs:
+            if not job.future.done():
+                job.future.cancel()
+        self._jobs.clear()
+
+    def submit(self, chat_id: int, send: Callable[[], Awaitable[Any]], priority: int = PRIORITY_REPLY) -> asyncio.Future:
+        """
+        Queue a Bot API call for chat_id
+        `send` is called with no arguments when the call may go out; the
+        returned future resolves to its result (or its final exception)
+        """
+        if not self.running:
+            self.start()
+
+        future = asyncio.get_running_loop().create_future()
+        bisect.insort(self._jobs, _SendJob(priority, next(self._seq), chat_id, send, future))
+        self._wakeup.set()
+        return future
+
+    def _chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+            self._chats[chat_id] = bucket
+            # Forget idle chats once the table is full; an idle bucket is full anyway
+            while len(self._chats) > self.max_chat_buckets:
+                oldest_id, oldest = next(iter(self._chats.items()))
+                if not oldest.is_idle(now):
+                    break
+                del self._chats[oldest_id]
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            sleep_for = None
+
+            global_wait = self._global.wait_time(now)
+            if self._jobs and global_wait == 0:
+                for index, job in enumerate(self._jobs):
+                    wait = max(job.not_before - now, self._chat_bucket(job.chat_id, now).wait_time(now))
+                    if wait <= 0:
+                        del self._jobs[index]
+                        self._release(job, now)
+                        break
+                    sleep_for = wait if sleep_for is None else min(sleep_for, wait)
+                else:
+                    # Nothing eligible yet; sleep until the earliest chat frees up
+                    await self._sleep(sleep_for)
+                continue
+
+            if self._jobs:
+                await self._sleep(global_wait)
+            else:
+                await self._sleep(None)
+
+    async def _sleep(self, timeout: Optional[float]):
+        """Sleep until timeout passes or a new job is submitted"""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _release(self, job: _SendJob, now: float):
+        self._global.take(now)
+        self._chat_bucket(job.chat_id, now).take(now)
+
+        if job.attempts == 0:
+            waited = now - job.submitted_at
+            self._wait_total[job.priority] = self._wait_total.get(job.priority, 0.0) + waited
+            self._wait_count[job.priority] = self._wait_count.get(job.priority, 0) + 1
+            self._wait_max[job.priority] = max(self._wait_max.get(job.priority, 0.0), waited)
+            TELEGRAM_QUEUE_WAIT_SECONDS.labels(PRIORITY_NAMES.get(job.priority, job.priority)).observe(waited)
+
+        task = asyncio.create_task(self._execute(job))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _execute(self, job: _SendJob):
+        job.attempts += 1
+        priority = PRIORITY_NAMES.get(job.priority, job.priority)
+        started = time.perf_counter()
+        try:
+            result = await job.send()
+        except RetryAfter as e:
+            self.rate_limited += 1
+            TELEGRAM_SENDS.labels(priority, "rate_limited").inc()
+            retry_after = e.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+
+            if job.attempts > self.max_retries:
+                logger.error(f"Giving up on chat {job.chat_id} after {job.attempts} rate-limited attempts")
+                self.failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+                return
+
+            # Honour Telegram's hint for this chat and requeue at the same priority
+            now = time.monotonic()
+            job.not_before = now + retry_after
+            bucket = self._chat_bucket(job.chat_id, now)
+            bucket.blocked_until = max(bucket.blocked_until, job.not_before)
+            logger.warning(f"Telegram rate limit for chat {job.chat_id}, retrying in {retry_after}s")
+            bisect.insort(self._jobs, job)
+            self._wakeup.set()
+        except Exception as e:
+            self.failed += 1
+            TELEGRAM_SENDS.labels(priority, "error").inc()
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            self.sent += 1
+            TELEGRAM_SENDS.labels(priority, "ok").inc()
+            TELEGRAM_SEND_SECONDS.observe(time.perf_counter() - started)
+            if not job.future.done():
+                job.future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, send counters and queue wait time per priority"""
+        return {
+            "queued": len(self._jobs),
+            "in_flight": len(self._in_flight),
+            "sent": self.sent,
+            "failed": self.failed,
+            "rate_limited": self.rate_limited,
+            "wait_seconds": {
+                name: {
+                    "avg": self._wait_total[p] / self._wait_count[p] if self._wait_count[p] else 0.0,
+                    "max": self._wait_max[p]
+                }
+                for p, name in PRIORITY_NAMES.items()
+            }
+        }
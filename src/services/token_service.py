@@ -4,72 +4,106 @@ Manages registration and login tokens
 """
 import secrets
 from datetime import datetime, timedelta
-from typing import Optional, Dict
+from typing import List, Optional
+from src.database.token_store import TokenStore, InMemoryTokenStore
 from src.utils.crypto import create_signed_token, verify_signed_token
+from src.utils.periodic import PeriodicTask
+from src.utils.metrics import REGISTRY
 from src.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+TOKENS_ISSUED = REGISTRY.counter("telelogin_registration_tokens_issued", "Registration tokens generated")
+TOKENS_VERIFIED = REGISTRY.counter(
+    "telelogin_registration_tokens_verified",
+    "Registration token verifications by result",
+    ["result"]
+)
+TOKENS_PURGED = REGISTRY.counter("telelogin_registration_tokens_purged", "Expired registration tokens removed")
+
 class TokenService:
     """Service for token management"""
     
-    def __init__(self):
-        self.tokens: Dict[str, dict] = {}  # In-memory storage, replace with Redis/DB in production
+    def __init__(self, store: Optional[TokenStore] = None):
+        # Default to process-local storage; pass a SQLiteTokenStore to share tokens between workers
+        self.store = store if store is not None else InMemoryTokenStore()
+        self.sweeper = PeriodicTask(
+            "registration-token-sweeper",
+            settings.TOKEN_SWEEP_INTERVAL_SECONDS,
+            self.purge_expired_tokens
+        )
     
-    def generate_registration_token(self, user_id: int, expires_in_minutes: int = 30) -> str:
+    async def generate_registration_token(self, user_id: int, expires_in_minutes: Optional[int] = None) -> str:
         """
         Generate a short registration token for Telegram deep links
         Returns the short token (not JWT) to fit in Telegram URL limits
         """
-        #token = secrets.token_urlsafe(32)
-        #generate simple string token 12 characters long
-        token = ''.join(secrets.choice('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789') for _ in range(12))
+        if expires_in_minutes is None:
+            expires_in_minutes = settings.REGISTRATION_TOKEN_EXPIRE_MINUTES
+        
+        token = self._new_token()
         expires_at = datetime.now() + timedelta(minutes=expires_in_minutes)
         
         # Store token metadata
-        self.tokens[token] = {
-            "user_id": user_id,
-            "type": "registration",
-            "expires_at": expires_at,
-            "used": False
-        }
+        await self.store.save(token, user_id, expires_at)
+        TOKENS_ISSUED.inc()
         
         # Return the short token directly (not the signed JWT)
         return token
     
-    def verify_registration_token(self, token: str) -> Optional[int]:
+    async def generate_registration_tokens(self, user_ids: List[int], expires_in_minutes: Optional[int] = None) -> List[str]:
+        """
+        Generate registration tokens for several users with a single store write
+        Tokens are returned in the order of user_ids
+        """
+        if expires_in_minutes is None:
+            expires_in_minutes = settings.REGISTRATION_TOKEN_EXPIRE_MINUTES
+        
+        expires_at = datetime.now() + timedelta(minutes=expires_in_minutes)
+        tokens = [self._new_token() for _ in user_ids]
+        await self.store.save_many([
+            (token, user_id, expires_at) for token, user_id in zip(tokens, user_ids)
+        ])
+        TOKENS_ISSUED.inc(len(tokens))
+        return tokens
+    
+    @staticmethod
+    def _new_token() -> str:
+        #token = secrets.token_urlsafe(32)
+        #generate simple string token 12 characters long
+        return ''.join(secrets.choice('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789') for _ in range(12))
+    
+    async def verify_registration_token(self, token: str) -> Optional[int]:
         """
         Verify registration token and return user_id
+        The token is consumed: a second verification of the same token fails
         """
         try:
-            # Check token metadata directly (token is now the short token, not JWT)
-            token_data = self.tokens.get(token)
-            if not token_data:
-                logger.warning("Token not found")
-                return None
-            
-            if token_data["type"] != "registration":
-                logger.warning("Invalid token type")
+            user_id = await self.store.consume(token)
+            if user_id is None:
+                logger.warning("Token not found, already used or expired")
+                TOKENS_VERIFIED.labels("invalid").inc()
                 return None
             
-            if token_data["used"]:
-                logger.warning("Token already used")
-                return None
-            
-            if datetime.now() > token_data["expires_at"]:
-                logger.warning("Token expired")
-                return None
-            
-            # Mark as used
-            token_data["used"] = True
-            
-            return token_data["user_id"]
+            TOKENS_VERIFIED.labels("ok").inc()
+            return user_id
         
         except Exception as e:
             logger.error(f"Error verifying token: {e}")
+            TOKENS_VERIFIED.labels("error").inc()
             return None
     
+    async def purge_expired_tokens(self) -> int:
+        """
+        Remove expired registration tokens from the store
+        """
+        purged = await self.store.purge_expired()
+        TOKENS_PURGED.inc(purged)
+        if purged:
+            logger.info(f"Purged {purged} expired registration tokens")
+        return purged
+    
     def create_telegram_link(self, token: str, bot_username: str = None) -> str:
         """
         Create Telegram deep link with token
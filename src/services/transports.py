@@ -0,0 +1,181 @@
+"""
+Bot <-> API transports
+HTTP transports for split deployments, in-process ones for the combined entry point
+"""
+import logging
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import httpx
+from src.services.notification_dispatcher import PermanentDeliveryError
+from src.utils.http import create_http_client, pool_stats
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+class NotificationTransport(ABC):
+    """Delivers login notifications from the API to the bot"""
+
+    http_client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def pool_stats(self) -> Dict[str, int]:
+        return pool_stats(self.http_client)
+
+    @abstractmethod
+    async def send_login_notification(self, telegram_id: int, login_id: str, username: str):
+        """
+        Hand a login prompt to the bot
+        Raises on failure so the dispatcher can retry; PermanentDeliveryError
+        for failures that retrying cannot fix
+        """
+        pass
+
+class HttpNotificationTransport(NotificationTransport):
+    """POSTs to the bot's /notify-login endpoint"""
+
+    def __init__(self, url: Optional[str] = None, timeout: float = 15.0):
+        self.url = url or settings.BOT_NOTIFY_URL
+        self.timeout = timeout
+        self.http_client = None
+
+    async def start(self):
+        if self.http_client is None:
+            self.http_client = create_http_client(timeout=self.timeout)
+
+    async def close(self):
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+
+    async def send_login_notification(self, telegram_id: int, login_id: str, username: str):
+        if self.http_client is None:
+            await self.start()
+
+        try:
+            response = await self.http_client.post(
+                self.url,
+                json={
+                    "telegram_id": telegram_id,
+                    "login_id": login_id,
+                    "username": username
+                }
+            )
+        except httpx.TimeoutException:
+            logger.warning(f"Timeout sending notification to telegram_id={telegram_id}. Bot may not be ready.")
+            raise
+        except httpx.ConnectError:
+            logger.warning(f"Cannot connect to bot service. Make sure bot is running.")
+            raise
+
+        if response.status_code == 200:
+            logger.info(f"Login notification sent successfully to telegram_id={telegram_id}")
+            return
+
+        if 400 <= response.status_code < 500:
+            raise PermanentDeliveryError(f"{response.status_code} - {response.text}")
+        response.raise_for_status()
+
+class InProcessNotificationTransport(NotificationTransport):
+    """Calls the bot's send function directly (bot and API in one process)"""
+
+    def __init__(self, send: Callable[[int, str, str], Awaitable[object]]):
+        self.send = send
+
+    async def send_login_notification(self, telegram_id: int, login_id: str, username: str):
+        await self.send(telegram_id, login_id, username)
+
+class ApiTransport(ABC):
+    """The bot's calls into the API: link, confirm and deny"""
+
+    http_client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def pool_stats(self) -> Dict[str, int]:
+        return pool_stats(self.http_client)
+
+    @abstractmethod
+    async def link_telegram(self, token: str, telegram_id: int) -> Tuple[bool, str]:
+        """Link a Telegram account with a registration token; returns (success, detail)"""
+        pass
+
+    @abstractmethod
+    async def confirm_login(self, login_id: str, telegram_id: int) -> bool:
+        pass
+
+    @abstractmethod
+    async def deny_login(self, login_id: str, telegram_id: int) -> bool:
+        pass
+
+class HttpApiTransport(ApiTransport):
+    """Calls the API's /auth endpoints over a shared keep-alive client"""
+
+    def __init__(self, base_url: Optional[str] = None, timeout: float = 10.0):
+        # Defaults to the 'api' hostname for Docker network communication
+        self.base_url = (base_url or settings.API_BASE_URL).rstrip("/")
+        self.timeout = timeout
+        self.http_client = None
+
+    async def start(self):
+        if self.http_client is None:
+            self.http_client = create_http_client(timeout=self.timeout)
+
+    async def close(self):
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+
+    async def _post(self, path: str, payload: Dict) -> httpx.Response:
+        if self.http_client is None:
+            await self.start()
+        return await self.http_client.post(f"{self.base_url}{path}", json=payload)
+
+    async def link_telegram(self, token: str, telegram_id: int) -> Tuple[bool, str]:
+        response = await self._post("/auth/link-telegram", {"token": token, "telegram_id": telegram_id})
+        logger.info(f"API response status={response.status_code}")
+
+        if response.status_code == 200:
+            return True, response.json().get("message", "")
+        return False, response.json().get("detail", "Unknown error")
+
+    async def confirm_login(self, login_id: str, telegram_id: int) -> bool:
+        response = await self._post("/auth/confirm-login", {"login_id": login_id, "telegram_id": telegram_id})
+        return response.status_code == 200
+
+    async def deny_login(self, login_id: str, telegram_id: int) -> bool:
+        response = await self._post("/auth/deny-login", {"login_id": login_id, "telegram_id": telegram_id})
+        return response.status_code == 200
+
+class InProcessApiTransport(ApiTransport):
+    """Calls the API's services directly (bot and API in one process)"""
+
+    def __init__(self, auth_service, user_service, token_service):
+        self.auth_service = auth_service
+        self.user_service = user_service
+        self.token_service = token_service
+
+    async def link_telegram(self, token: str, telegram_id: int) -> Tuple[bool, str]:
+        # Same steps and messages as POST /auth/link-telegram
+        user_id = await self.token_service.verify_registration_token(token)
+        if not user_id:
+            return False, "Invalid or expired token"
+
+        if not await self.user_service.link_telegram(user_id, telegram_id):
+            return False, "Failed to link Telegram account"
+
+        return True, "Telegram account linked successfully"
+
+    async def confirm_login(self, login_id: str, telegram_id: int) -> bool:
+        return await self.auth_service.confirm_login(login_id, telegram_id) is not None
+
+    async def deny_login(self, login_id: str, telegram_id: int) -> bool:
+        return await self.auth_service.deny_login(login_id, telegram_id)
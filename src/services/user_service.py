@@ -2,7 +2,7 @@
 User service
 Handles user profile operations
 """
-from typing import Optional
+from typing import List, Optional
 from src.database.base import DatabaseInterface
 from src.models.user import User
 import logging
@@ -20,19 +20,35 @@ class UserService:
         Create a new user
         """
         try:
-            # Check if user already exists
-            existing_user = await self.db.get_user_by_username(username)
-            if existing_user:
+            # Single INSERT ... ON CONFLICT DO NOTHING, so concurrent
+            # registrations of the same name cannot both succeed
+            user = await self.db.create_user_if_absent(username)
+            if not user:
                 logger.warning(f"User already exists: {username}")
                 return None
             
-            user = await self.db.create_user(username)
             logger.info(f"Created new user: {username}")
             return user
         except Exception as e:
             logger.error(f"Error creating user {username}: {e}")
             return None
     
+    async def create_users(self, usernames: List[str]) -> Optional[List[Optional[User]]]:
+        """
+        Create several users in one transaction
+        Returns one entry per username, in order; None marks a username that
+        already exists or repeats an earlier one in the same batch.
+        Returns None if the batch could not be written at all
+        """
+        try:
+            users = await self.db.create_users_if_absent(usernames)
+            created = sum(user is not None for user in users)
+            logger.info(f"Created {created} of {len(usernames)} users in batch")
+            return users
+        except Exception as e:
+            logger.error(f"Error creating batch of {len(usernames)} users: {e}")
+            return None
+    
     async def get_user(self, username: str) -> Optional[User]:
         """
         Get user by username
@@ -50,13 +66,12 @@ class UserService:
         Link Telegram account to user
         """
         try:
-            # Check if telegram_id is already linked
-            existing_user = await self.db.get_user_by_telegram_id(telegram_id)
-            if existing_user and existing_user.id != user_id:
-                logger.warning(f"Telegram ID {telegram_id} already linked to another user")
+            # Conditional UPDATE backed by a unique index on telegram_id
+            linked = await self.db.link_telegram_id_if_unclaimed(user_id, telegram_id)
+            if not linked:
+                logger.warning(f"Telegram ID {telegram_id} already linked to another user, or user {user_id} not found")
                 return False
             
-            await self.db.link_telegram_id(user_id, telegram_id)
             logger.info(f"Linked Telegram ID {telegram_id} to user {user_id}")
             return True
         except Exception as e:
@@ -0,0 +1,54 @@
+"""
+Bulk export
+Streams users or login history out of the database as JSONL or CSV
+Usage:
+    python -m src.tools.dump users [-o users.jsonl] [--format jsonl|csv]
+    python -m src.tools.dump login_requests -o logins.csv --chunk-size 5000
+"""
+import argparse
+import asyncio
+import sys
+from src.database.base import DatabaseInterface, EXPORT_COLUMNS
+from src.database.sharded import create_database
+from src.tools.rows import FORMATS, Progress, RowWriter, detect_format
+
+async def dump(db: DatabaseInterface, table: str, stream, fmt: str, chunk_size: int) -> int:
+    """Write every row of table to stream and return the row count"""
+    writer = RowWriter(stream, fmt, EXPORT_COLUMNS[table])
+    progress = Progress(f"dump {table}")
+    async for rows in db.export_rows(table, chunk_size):
+        for row in rows:
+            writer.write(row)
+        progress.add(len(rows))
+    progress.report(" done")
+    return progress.count
+
+def main():
+    parser = argparse.ArgumentParser(description="Export users or login requests")
+    parser.add_argument("table", choices=sorted(EXPORT_COLUMNS))
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    parser.add_argument("--format", choices=FORMATS, help="Default: from the file extension, else jsonl")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Rows per database query")
+    parser.add_argument("--db", default="db.sqlite3", help="SQLite database file")
+    parser.add_argument("--shards", type=int, help="Login request shards (default: DB_SHARDS)")
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.output)
+
+    async def run():
+        db = create_database(args.db, args.shards, pool_size=1)
+        try:
+            # Bring an older database up to the current schema first, as load does
+            await db.init_db()
+            if args.output:
+                with open(args.output, "w", newline="", encoding="utf-8") as stream:
+                    await dump(db, args.table, stream, fmt, args.chunk_size)
+            else:
+                await dump(db, args.table, sys.stdout, fmt, args.chunk_size)
+        finally:
+            await db.close()
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
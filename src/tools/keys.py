@@ -0,0 +1,30 @@
+"""
+Signing key management
+Usage:
+    python -m src.tools.keys generate [--dir keys] [--alg EdDSA|ES256]
+    python -m src.tools.keys retire KID [--dir keys]
+"""
+import argparse
+from src.utils.keys import generate_key, retire_key
+from src.config import settings
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage access token signing keys")
+    sub = parser.add_subparsers(dest="command", required=True)
+    
+    gen = sub.add_parser("generate", help="Create a new signing key and print its kid")
+    gen.add_argument("--dir", default=settings.JWT_KEYS_DIR or "keys")
+    gen.add_argument("--alg", choices=["EdDSA", "ES256"], default="EdDSA")
+    
+    ret = sub.add_parser("retire", help="Keep only the public half of a key (verify-only)")
+    ret.add_argument("kid")
+    ret.add_argument("--dir", default=settings.JWT_KEYS_DIR or "keys")
+    
+    args = parser.parse_args()
+    if args.command == "generate":
+        print(generate_key(args.dir, args.alg))
+    else:
+        retire_key(args.dir, args.kid)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Bulk import
+Loads users or login history from JSONL or CSV in chunked transactions
+Each chunk commits on its own, so an interrupted load can be resumed with
+--offset set to the row count it last reported
+Usage:
+    python -m src.tools.load users users.jsonl
+    python -m src.tools.load login_requests logins.csv --offset 250000
+"""
+import argparse
+import asyncio
+import itertools
+import sys
+from typing import Dict, Iterable
+from src.database.base import DatabaseInterface, EXPORT_COLUMNS
+from src.database.sharded import create_database
+from src.tools.rows import FORMATS, Progress, detect_format, read_rows
+
+async def load(db: DatabaseInterface, table: str, rows: Iterable[Dict], chunk_size: int, offset: int = 0) -> int:
+    """
+    Insert rows (skipping the first offset) chunk by chunk
+    Returns the number of rows inserted; rows that already exist are skipped
+    """
+    rows = iter(rows)
+    # Skip without materialising the skipped rows
+    for _ in itertools.islice(rows, offset):
+        pass
+
+    progress = Progress(f"load {table}", start=offset)
+    inserted = 0
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        try:
+            inserted += await db.import_rows(table, chunk)
+        except Exception:
+            progress.report(f"; chunk failed, resume with --offset {progress.count}")
+            raise
+        progress.add(len(chunk))
+
+    progress.report(f" done, {inserted} inserted, {progress.count - offset - inserted} skipped")
+    return inserted
+
+def main():
+    parser = argparse.ArgumentParser(description="Import users or login requests")
+    parser.add_argument("table", choices=sorted(EXPORT_COLUMNS))
+    parser.add_argument("input", help="Input file, or - for stdin")
+    parser.add_argument("--format", choices=FORMATS, help="Default: from the file extension, else jsonl")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Rows per transaction")
+    parser.add_argument("--offset", type=int, default=0, help="Skip this many input rows (resume)")
+    parser.add_argument("--db", default="db.sqlite3", help="SQLite database file")
+    parser.add_argument("--shards", type=int, help="Login request shards (default: DB_SHARDS)")
+    args = parser.parse_args()
+
+    path = None if args.input == "-" else args.input
+    fmt = args.format or detect_format(path)
+
+    async def run():
+        db = create_database(args.db, args.shards, pool_size=1)
+        try:
+            await db.init_db()
+            if path is None:
+                await load(db, args.table, read_rows(sys.stdin, fmt), args.chunk_size, args.offset)
+            else:
+                with open(path, newline="", encoding="utf-8") as stream:
+                    await load(db, args.table, read_rows(stream, fmt), args.chunk_size, args.offset)
+        finally:
+            await db.close()
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
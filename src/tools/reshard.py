@@ -0,0 +1,70 @@
+"""
+Resharding
+Moves login requests from one DB_SHARDS layout to another
+Run it while the API and bot are stopped, then restart them with the new
+DB_SHARDS value. Users, tokens and revocations stay in the directory file.
+Usage:
+    python -m src.tools.reshard --from 1 --to 4
+    python -m src.tools.reshard --from 4 --to 8 --delete-source
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime
+from src.database.base import DatabaseInterface
+from src.database.sharded import ShardedSQLiteDatabase, create_database
+from src.tools.rows import Progress
+
+async def reshard(source: DatabaseInterface, target: DatabaseInterface, chunk_size: int) -> int:
+    """Copy every login request from source to target; returns rows copied"""
+    await target.init_db()
+    progress = Progress("reshard login_requests")
+    async for rows in source.export_rows("login_requests", chunk_size):
+        await target.import_rows("login_requests", rows)
+        progress.add(len(rows))
+    progress.report(" done")
+    return progress.count
+
+async def delete_source(source: DatabaseInterface, chunk_size: int):
+    """Drop the old layout's login requests"""
+    if isinstance(source, ShardedSQLiteDatabase):
+        _, paths = source.paths()
+        await source.close()
+        for path in paths:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        return
+
+    # Single-file layout: the rows share the file with users, delete in batches
+    while await source.purge_login_requests(datetime.max, chunk_size):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Move login requests to a new shard count")
+    parser.add_argument("--from", dest="source", type=int, required=True, help="Current DB_SHARDS")
+    parser.add_argument("--to", dest="target", type=int, required=True, help="New DB_SHARDS")
+    parser.add_argument("--db", default="db.sqlite3", help="Directory database file")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Rows per transaction")
+    parser.add_argument("--delete-source", action="store_true", help="Remove the old layout's rows afterwards")
+    args = parser.parse_args()
+
+    if max(args.source, 1) == max(args.target, 1):
+        parser.error("--from and --to are the same layout")
+
+    async def run():
+        source = create_database(args.db, args.source)
+        target = create_database(args.db, args.target)
+        try:
+            await reshard(source, target, args.chunk_size)
+            if args.delete_source:
+                await delete_source(source, args.chunk_size)
+        finally:
+            await source.close()
+            await target.close()
+        print(f"Done; set DB_SHARDS={args.target} and restart the API and bot")
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Row file formats
+JSONL and CSV readers/writers shared by the dump and load tools
+Both stream one row at a time so memory stays flat for any file size
+"""
+import csv
+import json
+import sys
+import time
+from typing import Dict, IO, Iterator, Optional, Sequence
+
+FORMATS = ("jsonl", "csv")
+
+def detect_format(path: Optional[str], default: str = "jsonl") -> str:
+    """Pick the format from a file extension"""
+    if path and path.lower().endswith(".csv"):
+        return "csv"
+    return default
+
+class RowWriter:
+    """Writes dict rows with a fixed column order"""
+
+    def __init__(self, stream: IO[str], fmt: str, columns: Sequence[str]):
+        self.stream = stream
+        self.fmt = fmt
+        self.columns = list(columns)
+        if fmt == "csv":
+            self._csv = csv.DictWriter(stream, fieldnames=self.columns, extrasaction="ignore")
+            self._csv.writeheader()
+
+    def write(self, row: Dict):
+        if self.fmt == "csv":
+            self._csv.writerow(row)
+        else:
+            self.stream.write(json.dumps({column: row.get(column) for column in self.columns}, default=str) + "\n")
+
+def read_rows(stream: IO[str], fmt: str) -> Iterator[Dict]:
+    """Yield dict rows; CSV empty fields become None"""
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            yield {key: (value if value != "" else None) for key, value in row.items()}
+        return
+
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+class Progress:
+    """Rate-limited row counter on stderr"""
+
+    def __init__(self, label: str, start: int = 0, interval: float = 1.0):
+        self.label = label
+        self.count = start
+        self.start = start
+        self.interval = interval
+        self.began = time.monotonic()
+        self._last_report = self.began
+
+    def add(self, rows: int):
+        self.count += rows
+        now = time.monotonic()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+
+    def report(self, suffix: str = ""):
+        elapsed = max(time.monotonic() - self.began, 1e-9)
+        rate = (self.count - self.start) / elapsed
+        print(f"{self.label}: {self.count} rows ({rate:.0f} rows/s){suffix}", file=sys.stderr, flush=True)
@@ -5,13 +5,15 @@ from src.utils.crypto import (
     create_signed_token,
     verify_signed_token
 )
-from src.utils.logger import setup_logger, logger
+from src.utils.logger import setup_logger, setup_logging, shutdown_logging, logger
 
 __all__ = [
     "create_access_token",
     "verify_token",
     "create_signed_token",
-    "verify_signed_token"
+    "verify_signed_token",
     "setup_logger",
+    "setup_logging",
+    "shutdown_logging",
     "logger"
 ]
@@ -2,9 +2,11 @@
 Cryptographic utilities
 Token signing, hashing, and JWT management
 """
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 import jwt
+from src.utils.keys import get_keyring
 from src.config import settings
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -18,7 +20,15 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
+    # Unique id so a single token can be revoked
+    to_encode.setdefault("jti", uuid.uuid4().hex)
+    
+    # Asymmetric signing when a key ring is configured; kid selects the key
+    keyring = get_keyring()
+    if keyring is not None:
+        kid, algorithm, private_key = keyring.signing_key
+        return jwt.encode(to_encode, private_key, algorithm=algorithm, headers={"kid": kid})
     
     encoded_jwt = jwt.encode(
         to_encode,
@@ -31,8 +41,19 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 def verify_token(token: str) -> Optional[Dict[str, Any]]:
     """
     Verify and decode a JWT token
+    Tokens with a kid are checked against the key ring; tokens without one
+    (issued before asymmetric signing was enabled) against SECRET_KEY
     """
     try:
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is not None:
+            keyring = get_keyring()
+            key = keyring.verification_key(kid) if keyring is not None else None
+            if key is None:
+                return None
+            algorithm, public_key = key
+            return jwt.decode(token, public_key, algorithms=[algorithm])
+        
         payload = jwt.decode(
             token,
             settings.SECRET_KEY,
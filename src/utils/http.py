@@ -0,0 +1,51 @@
+"""
+Shared HTTP client helpers
+Long-lived, pooled httpx clients for bot <-> API calls
+"""
+import logging
+from typing import Dict, Optional
+import httpx
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package (pip install httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def create_http_client(timeout: float = 10.0, base_url: str = "", http2: Optional[bool] = None) -> httpx.AsyncClient:
+    """
+    Create a keep-alive client with pool limits from settings
+    Create one per service at startup and close it on shutdown
+    """
+    if http2 is None:
+        http2 = settings.HTTP2
+    if http2 and not http2_available():
+        logger.warning("HTTP2 is enabled but the h2 package is not installed; using HTTP/1.1")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS
+    )
+    return httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits, http2=http2)
+
+def pool_stats(client: Optional[httpx.AsyncClient]) -> Dict[str, int]:
+    """
+    Connection counts for a client's pool
+    Reads httpcore's pool through httpx's transport (not a public httpx API)
+    """
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {
+        "connections": len(connections),
+        "idle": idle,
+        "active": len(connections) - idle,
+        "max_connections": settings.HTTP_POOL_MAX_CONNECTIONS
+    }
@@ -0,0 +1,223 @@
+"""
+Signing key ring
+Loads EdDSA/ES256 PEM keys for access tokens and publishes them as a JWKS
+Requires the optional cryptography package
+"""
+import hashlib
+import json
+import logging
+import os
+import secrets
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+def cryptography_available() -> bool:
+    """Asymmetric signing needs the optional cryptography package"""
+    try:
+        import cryptography  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def _algorithm_for(key) -> str:
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+        return "EdDSA"
+    if isinstance(key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)) and key.curve.name == "secp256r1":
+        return "ES256"
+    raise ValueError(f"Unsupported signing key type: {type(key).__name__} (use Ed25519 or P-256)")
+
+def _fingerprint(keys_dir: str) -> Tuple[Tuple[str, int, int], ...]:
+    """(name, mtime, size) of every key file; changes when keys are added, retired or removed"""
+    entries = []
+    for name in sorted(os.listdir(keys_dir)):
+        if name.endswith(".pem"):
+            stat = os.stat(os.path.join(keys_dir, name))
+            entries.append((name, stat.st_mtime_ns, stat.st_size))
+    return tuple(entries)
+
+def _publish_seconds() -> int:
+    if settings.JWT_KEY_PUBLISH_SECONDS is not None:
+        return settings.JWT_KEY_PUBLISH_SECONDS
+    # Long enough for every worker to reload and every JWKS cache to expire
+    return settings.JWKS_MAX_AGE_SECONDS + settings.JWT_KEYS_RELOAD_SECONDS
+
+def _select_active(created: Dict[str, float], publish_seconds: int, now: float) -> str:
+    """
+    Newest private key that has been published for publish_seconds
+    If none has (a fresh key directory), the oldest one signs
+    """
+    due = [kid for kid, created_at in created.items() if now - created_at >= publish_seconds]
+    if due:
+        return sorted(due)[-1]
+    return min(created, key=lambda kid: (created[kid], kid))
+
+class KeyRing:
+    """
+    Every *.pem in a directory, keyed by file name (the kid)
+    Private keys can sign; public-only files are kept for verification so
+    tokens signed by a retired key stay valid until they expire. A new
+    private key is published in the JWKS first and only signs once it is
+    publish_seconds old, so other workers and JWKS caches know it by then.
+    """
+
+    def __init__(
+        self,
+        keys_dir: str,
+        active_kid: Optional[str] = None,
+        publish_seconds: Optional[int] = None,
+        now: Optional[float] = None
+    ):
+        if not cryptography_available():
+            raise RuntimeError("JWT_KEYS_DIR is set but the cryptography package is not installed")
+
+        from cryptography.hazmat.primitives.serialization import load_pem_private_key, load_pem_public_key
+
+        self.keys_dir = keys_dir
+        self.pinned_kid = active_kid
+        self.publish_seconds = publish_seconds if publish_seconds is not None else _publish_seconds()
+        self.fingerprint = _fingerprint(keys_dir)
+        # kid -> file mtime, i.e. when the key was generated (or copied in)
+        self.created: Dict[str, float] = {}
+        self.private_keys: Dict[str, Any] = {}
+        self.public_keys: Dict[str, Any] = {}
+        self.algorithms: Dict[str, str] = {}
+
+        for name in sorted(os.listdir(keys_dir)):
+            if not name.endswith(".pem"):
+                continue
+            kid = name[:-len(".pem")]
+            with open(os.path.join(keys_dir, name), "rb") as f:
+                data = f.read()
+
+            if b"PRIVATE KEY" in data:
+                key = load_pem_private_key(data, password=None)
+                self.private_keys[kid] = key
+                self.public_keys[kid] = key.public_key()
+                self.created[kid] = os.path.getmtime(os.path.join(keys_dir, name))
+            else:
+                self.public_keys[kid] = load_pem_public_key(data)
+            self.algorithms[kid] = _algorithm_for(self.public_keys[kid])
+
+        if not self.private_keys:
+            raise RuntimeError(f"No private signing key found in {keys_dir}")
+
+        # Sorted file names: the newest published key wins unless one is pinned
+        self.active_kid = active_kid or self._due_kid(time.time() if now is None else now)
+        if self.active_kid not in self.private_keys:
+            raise RuntimeError(f"Active signing key {self.active_kid} not found in {keys_dir}")
+
+        self._jwks = {"keys": [self._jwk(kid) for kid in sorted(self.public_keys)]}
+        self._jwks_body = json.dumps(self._jwks, separators=(",", ":"), sort_keys=True).encode()
+        self.etag = f'"{hashlib.sha256(self._jwks_body).hexdigest()[:32]}"'
+        logger.info(f"Loaded {len(self.public_keys)} signing keys, active kid={self.active_kid}")
+
+    def _due_kid(self, now: float) -> str:
+        return _select_active(self.created, self.publish_seconds, now)
+
+    def is_stale(self, now: float) -> bool:
+        """True once the key files changed or a published key is due to take over signing"""
+        if _fingerprint(self.keys_dir) != self.fingerprint:
+            return True
+        return self.pinned_kid is None and self._due_kid(now) != self.active_kid
+
+    def _jwk(self, kid: str) -> Dict[str, str]:
+        from jwt.algorithms import ECAlgorithm, OKPAlgorithm
+
+        algorithm = self.algorithms[kid]
+        exporter = OKPAlgorithm if algorithm == "EdDSA" else ECAlgorithm
+        jwk = json.loads(exporter.to_jwk(self.public_keys[kid]))
+        jwk.update({"kid": kid, "alg": algorithm, "use": "sig"})
+        return jwk
+
+    @property
+    def signing_key(self) -> Tuple[str, str, Any]:
+        """(kid, algorithm, private key) used for new tokens"""
+        return self.active_kid, self.algorithms[self.active_kid], self.private_keys[self.active_kid]
+
+    def verification_key(self, kid: str) -> Optional[Tuple[str, Any]]:
+        """(algorithm, public key) for a kid, or None if unknown"""
+        if kid not in self.public_keys:
+            return None
+        return self.algorithms[kid], self.public_keys[kid]
+
+    def jwks(self) -> Dict[str, Any]:
+        return self._jwks
+
+    def jwks_body(self) -> bytes:
+        """Serialized JWKS, computed once so the endpoint only compares ETags"""
+        return self._jwks_body
+
+_keyring: Optional[KeyRing] = None
+_keyring_checked_at = 0.0
+
+def get_keyring() -> Optional[KeyRing]:
+    """
+    Process-wide key ring, or None when access tokens use SECRET_KEY
+    Re-checked every JWT_KEYS_RELOAD_SECONDS, so added or retired keys and
+    promotions take effect without a restart
+    """
+    global _keyring, _keyring_checked_at
+    if not settings.JWT_KEYS_DIR:
+        return None
+
+    now = time.time()
+    if _keyring is None:
+        _keyring = KeyRing(settings.JWT_KEYS_DIR, settings.JWT_ACTIVE_KID, now=now)
+        _keyring_checked_at = now
+    elif settings.JWT_KEYS_RELOAD_SECONDS > 0 and now - _keyring_checked_at >= settings.JWT_KEYS_RELOAD_SECONDS:
+        _keyring_checked_at = now
+        try:
+            if _keyring.is_stale(now):
+                _keyring = KeyRing(settings.JWT_KEYS_DIR, settings.JWT_ACTIVE_KID, now=now)
+        except Exception as e:
+            # A half-written key file must not take signing down; retry next interval
+            logger.error(f"Keeping the current signing keys, reloading {settings.JWT_KEYS_DIR} failed: {e}")
+    return _keyring
+
+def generate_key(keys_dir: str, algorithm: str = "EdDSA") -> str:
+    """Write a new private key to keys_dir and return its kid"""
+    if not cryptography_available():
+        raise RuntimeError("Generating keys needs the cryptography package")
+
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+    if algorithm == "EdDSA":
+        key = ed25519.Ed25519PrivateKey.generate()
+    elif algorithm == "ES256":
+        key = ec.generate_private_key(ec.SECP256R1())
+    else:
+        raise ValueError(f"Unsupported algorithm: {algorithm}")
+
+    # Date prefix keeps kids in creation order
+    kid = f"{datetime.utcnow():%Y%m%d%H%M%S}-{secrets.token_hex(2)}"
+    os.makedirs(keys_dir, exist_ok=True)
+    path = os.path.join(keys_dir, f"{kid}.pem")
+    with open(path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        ))
+    os.chmod(path, 0o600)
+    return kid
+
+def retire_key(keys_dir: str, kid: str):
+    """Replace a private key file with its public half (verify-only)"""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.serialization import load_pem_private_key
+
+    path = os.path.join(keys_dir, f"{kid}.pem")
+    with open(path, "rb") as f:
+        key = load_pem_private_key(f.read(), password=None)
+    with open(path, "wb") as f:
+        f.write(key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo
+        ))
@@ -1,35 +1,138 @@
 """
 Logging configuration
+Shared setup for the API and the bot: records are handed to a queue and
+written by a background thread, so the event loop never blocks on I/O
 """
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
 import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
 from src.config import settings
 
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_setup_lock = threading.Lock()
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra` fields are included as keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and key not in entry:
+                entry[key] = value
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler with a cheaper prepare(): it merges args and exception
+    text into the record in place instead of formatting and copying it
+    (the root handler runs last, so nothing else sees the record after)
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    Keep one in every N DEBUG records per call site
+    INFO and above always pass
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._counts: Dict[Tuple[str, int], int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        if self.every == 0:
+            return False
+        site = (record.pathname, record.lineno)
+        count = self._counts.get(site, 0)
+        self._counts[site] = count + 1
+        return count % self.every == 0
+
+def _level() -> int:
+    if settings.LOG_LEVEL:
+        return logging.getLevelName(settings.LOG_LEVEL.upper())
+    return logging.DEBUG if settings.DEBUG else logging.INFO
+
+def setup_logging(level: Optional[int] = None, fmt: Optional[str] = None, stream=None):
+    """
+    Route all logging through a QueueHandler on the root logger
+    Safe to call more than once; later calls only adjust the level
+    """
+    global _listener
+
+    level = level if level is not None else _level()
+    root = logging.getLogger()
+
+    with _setup_lock:
+        root.setLevel(level)
+        if _listener is not None:
+            return
+
+        fmt = fmt or settings.LOG_FORMAT
+        output = logging.StreamHandler(stream or sys.stderr)
+        if fmt == "json":
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                datefmt='%Y-%m-%d %H:%M:%S'
+            ))
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = _QueueHandler(log_queue)
+        queue_handler.addFilter(DebugSamplingFilter(settings.LOG_DEBUG_SAMPLE_RATE))
+
+        # Replace whatever basicConfig or a library installed
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+
+        _listener = logging.handlers.QueueListener(log_queue, output)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
 def setup_logger(name: str = "telelogin") -> logging.Logger:
     """
-    Configure and return a logger instance
-    """
-    logger = logging.getLogger(name)
-    
-    # Set level based on debug setting
-    level = logging.DEBUG if settings.DEBUG else logging.INFO
-    logger.setLevel(level)
-    
-    # Console handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(level)
-    
-    # Formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    console_handler.setFormatter(formatter)
-    
-    # Add handler
-    logger.addHandler(console_handler)
-    
-    return logger
+    Configure logging (once) and return a named logger
+    """
+    setup_logging()
+    return logging.getLogger(name)
 
 # Default logger
-logger = setup_logger()
+logger = logging.getLogger("telelogin")
@@ -7,7 +7,15 @@ from src.web.schemas import (
     LoginStartResponse,
     LoginConfirmRequest,
     LoginConfirmResponse,
-    LoginStatusResponse
+    LoginDenyRequest,
+    LoginDenyResponse,
+    LoginStatusResponse,
+    IntrospectRequest,
+    IntrospectResponse,
+    IntrospectBatchRequest,
+    IntrospectBatchResponse,
+    RevokeRequest,
+    RevokeResponse
 )
 
 __all__ = [
@@ -18,5 +26,13 @@ __all__ = [
     "LoginStartResponse",
     "LoginConfirmRequest",
     "LoginConfirmResponse",
-    "LoginStatusResponse"
+    "LoginDenyRequest",
+    "LoginDenyResponse",
+    "LoginStatusResponse",
+    "IntrospectRequest",
+    "IntrospectResponse",
+    "IntrospectBatchRequest",
+    "IntrospectBatchResponse",
+    "RevokeRequest",
+    "RevokeResponse"
 ]
@@ -2,32 +2,116 @@
 API routes definition
 FastAPI router with all endpoints
 """
-from fastapi import APIRouter, HTTPException, Depends
+import json
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from src.web.schemas import (
     RegisterRequest,
     RegisterResponse,
+    RegisterBatchRequest,
+    RegisterBatchItem,
+    RegisterBatchResponse,
     LoginStartRequest,
     LoginStartResponse,
     LinkTelegramRequest,
     LinkTelegramResponse,
     LoginConfirmRequest,
     LoginConfirmResponse,
-    LoginStatusResponse
+    LoginDenyRequest,
+    LoginDenyResponse,
+    LoginStatusResponse,
+    IntrospectRequest,
+    IntrospectResponse,
+    IntrospectBatchRequest,
+    IntrospectBatchResponse,
+    RevokeRequest,
+    RevokeResponse,
+    RefreshRequest,
+    RefreshResponse,
+    LogoutRequest,
+    LogoutResponse
 )
 from src.services.auth_service import AuthService
+from src.services.notification_dispatcher import DispatchQueueFullError
 from src.services.user_service import UserService
 from src.services.token_service import TokenService
-from src.database.sqlite import SQLiteDatabase
+from src.services.introspection_service import IntrospectionService
+from src.services.session_service import SessionService
+from src.services.rate_limiter import RateLimiter, RateLimitExceeded
+from src.database.sharded import create_database
+from src.database.cached import CachedDatabase
+from src.database.token_store import create_token_store
+from src.database.revocation_store import create_revocation_store
+from src.database.session_store import create_session_store
+from src.database.rate_limit_store import create_rate_limit_store
+from src.utils.keys import get_keyring
+from src.config import settings
 
 router = APIRouter()
 
 # Initialize services (in production, use dependency injection)
-db = SQLiteDatabase()
-auth_service = AuthService(db)
-user_service = UserService(db)
-token_service = TokenService()
+db = create_database()
+user_cache = CachedDatabase(db)
+introspection_service = IntrospectionService(create_revocation_store(db))
+session_service = SessionService(create_session_store(db), introspection_service)
+auth_service = AuthService(user_cache, session_service=session_service)
+user_service = UserService(user_cache)
+token_service = TokenService(create_token_store(db))
+rate_limiter = RateLimiter(create_rate_limit_store(db))
 
-@router.post("/register", response_model=RegisterResponse)
+def client_ip(request: Request) -> str:
+    """Peer address (run uvicorn with --proxy-headers behind a reverse proxy)"""
+    return request.client.host if request.client else "unknown"
+
+async def _enforce(scope: str, key, limit: int, cost: int = 1):
+    try:
+        await rate_limiter.check(scope, key, limit, cost)
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, try again later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+async def limit_registration(http_request: Request):
+    """Per-IP limit on creating users"""
+    await _enforce("register_ip", client_ip(http_request), settings.REGISTER_LIMIT_PER_IP)
+
+async def limit_batch_registration(http_request: Request):
+    """
+    Per-IP limit on bulk onboarding, charged once per username in the batch
+    Counted apart from /register so a full batch fits in the default window
+    """
+    body = await http_request.json()
+    usernames = body.get("usernames") if isinstance(body, dict) else None
+    cost = max(1, len(usernames)) if isinstance(usernames, list) else 1
+    
+    limit = settings.REGISTER_BATCH_LIMIT_PER_IP
+    if 0 < limit < cost:
+        # Could never fit in the window, so waiting would not help
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {limit} usernames per window from one address"
+        )
+    await _enforce("register_batch_ip", client_ip(http_request), limit, cost)
+
+async def limit_start_login(http_request: Request):
+    """Per-IP, per-username and per-Telegram-chat limits on login prompts"""
+    await _enforce("login_ip", client_ip(http_request), settings.LOGIN_LIMIT_PER_IP)
+    
+    # FastAPI has already parsed the body; Starlette caches it on the request
+    body = await http_request.json()
+    username = body.get("username") if isinstance(body, dict) else None
+    if not isinstance(username, str):
+        return
+    await _enforce("login_username", username, settings.LOGIN_LIMIT_PER_USERNAME)
+    
+    # Keyed by chat, so the limit protects the Telegram account itself
+    user = await user_service.get_user(username)
+    if user and user.telegram_id:
+        await _enforce("login_telegram_id", user.telegram_id, settings.LOGIN_LIMIT_PER_TELEGRAM_ID)
+
+@router.post("/register", response_model=RegisterResponse, dependencies=[Depends(limit_registration)])
 async def register(request: RegisterRequest):
     """
     Register a new user and get Telegram link
@@ -39,20 +123,49 @@ async def register(request: RegisterRequest):
         raise HTTPException(status_code=400, detail="Username already exists")
     
     # Generate registration token
-    token = token_service.generate_registration_token(user.id)
+    token = await token_service.generate_registration_token(user.id)
     
     # Create Telegram link
     link = token_service.create_telegram_link(token)
     
     return RegisterResponse(link=link)
 
+@router.post(
+    "/register/batch",
+    response_model=RegisterBatchResponse,
+    response_model_exclude_none=True,
+    dependencies=[Depends(limit_batch_registration)]
+)
+async def register_batch(request: RegisterBatchRequest):
+    """
+    Register many users at once (tenant onboarding)
+    Results keep request order; taken or repeated usernames are reported per item
+    """
+    users = await user_service.create_users(request.usernames)
+    
+    if users is None:
+        # The transaction was rolled back, so no user of the batch exists
+        raise HTTPException(status_code=500, detail="Could not register users, retry the batch")
+    
+    created = [user for user in users if user is not None]
+    tokens = await token_service.generate_registration_tokens([user.id for user in created])
+    links = iter(token_service.create_telegram_link(token) for token in tokens)
+    
+    results = [
+        RegisterBatchItem(username=username, link=next(links))
+        if user is not None else
+        RegisterBatchItem(username=username, error="Username already exists")
+        for username, user in zip(request.usernames, users)
+    ]
+    return RegisterBatchResponse(created=len(created), results=results)
+
 @router.post("/auth/link-telegram", response_model=LinkTelegramResponse)
 async def link_telegram(request: LinkTelegramRequest):
     """
     Link Telegram account to user (called by bot after /start with token)
     """
     # Verify registration token
-    user_id = token_service.verify_registration_token(request.token)
+    user_id = await token_service.verify_registration_token(request.token)
     
     if not user_id:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
@@ -68,12 +181,19 @@ async def link_telegram(request: LinkTelegramRequest):
         message="Telegram account linked successfully"
     )
 
-@router.post("/auth/start-login", response_model=LoginStartResponse)
+@router.post("/auth/start-login", response_model=LoginStartResponse, dependencies=[Depends(limit_start_login)])
 async def start_login(request: LoginStartRequest):
     """
     Start the login process
     """
-    result = await auth_service.start_login(request.username)
+    try:
+        result = await auth_service.start_login(request.username, request.idempotency_key)
+    except DispatchQueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many pending login notifications, try again shortly",
+            headers={"Retry-After": "1"}
+        )
     
     if not result:
         raise HTTPException(status_code=404, detail="User not found or Telegram not linked")
@@ -92,6 +212,94 @@ async def confirm_login(request: LoginConfirmRequest):
     
     return LoginConfirmResponse(**result)
 
+@router.post("/auth/deny-login", response_model=LoginDenyResponse)
+async def deny_login(request: LoginDenyRequest):
+    """
+    Deny login request (called by bot)
+    """
+    success = await auth_service.deny_login(request.login_id, request.telegram_id)
+    
+    if not success:
+        raise HTTPException(status_code=400, detail="Invalid login request")
+    
+    return LoginDenyResponse(status="denied")
+
+@router.post("/auth/introspect", response_model=IntrospectResponse, response_model_exclude_none=True)
+async def introspect(request: IntrospectRequest):
+    """
+    Validate a session token (for downstream services)
+    Returns active=false for invalid, expired or revoked tokens
+    """
+    return IntrospectResponse(**introspection_service.introspect(request.token))
+
+@router.post("/auth/introspect/batch", response_model=IntrospectBatchResponse, response_model_exclude_none=True)
+async def introspect_batch(request: IntrospectBatchRequest):
+    """
+    Validate several session tokens in one call; results keep request order
+    """
+    results = introspection_service.introspect_many(request.tokens)
+    return IntrospectBatchResponse(results=[IntrospectResponse(**result) for result in results])
+
+@router.post("/auth/revoke", response_model=RevokeResponse)
+async def revoke(request: RevokeRequest):
+    """
+    Revoke a session token (logout); it introspects as inactive from now on
+    """
+    revoked = await introspection_service.revoke(request.token)
+    
+    if not revoked:
+        raise HTTPException(status_code=400, detail="Invalid or expired token")
+    
+    return RevokeResponse(revoked=True)
+
+@router.post("/auth/refresh", response_model=RefreshResponse)
+async def refresh(request: RefreshRequest):
+    """
+    Exchange a refresh token for a new session token and refresh token
+    The old refresh token stops working; presenting it again revokes the session
+    """
+    result = await session_service.refresh(request.refresh_token)
+    
+    if not result:
+        raise HTTPException(status_code=401, detail="Invalid, expired or revoked refresh token")
+    
+    return RefreshResponse(**result)
+
+@router.post("/auth/logout", response_model=LogoutResponse)
+async def logout(request: LogoutRequest):
+    """
+    End the session holding the refresh token (or every session of its user)
+    """
+    revoked = await session_service.logout(request.refresh_token, request.all_sessions)
+    
+    if not revoked:
+        raise HTTPException(status_code=400, detail="Invalid, expired or revoked refresh token")
+    
+    if request.session_token:
+        await introspection_service.revoke(request.session_token)
+    
+    return LogoutResponse(revoked=revoked)
+
+@router.get("/.well-known/jwks.json")
+async def jwks(request: Request):
+    """
+    Public keys for verifying session tokens offline
+    Served with an ETag; unchanged key sets are answered with 304
+    """
+    keyring = get_keyring()
+    if keyring is None:
+        # HS256 tokens cannot be verified without the secret
+        return {"keys": []}
+    
+    headers = {
+        "ETag": keyring.etag,
+        "Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}"
+    }
+    if request.headers.get("if-none-match") == keyring.etag:
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=keyring.jwks_body(), media_type="application/json", headers=headers)
+
 @router.get("/status/{login_id}", response_model=LoginStatusResponse)
 async def get_login_status(login_id: str):
     """
@@ -103,3 +311,52 @@ async def get_login_status(login_id: str):
         raise HTTPException(status_code=404, detail="Login request not found")
     
     return LoginStatusResponse(**result)
+
+@router.get("/status/{login_id}/wait", response_model=LoginStatusResponse)
+async def wait_login_status(
+    login_id: str,
+    timeout: float = Query(default=25, gt=0, le=settings.STATUS_LONG_POLL_MAX_SECONDS)
+):
+    """
+    Long-poll login request status
+    Returns as soon as the request is approved, denied or expired,
+    or with the pending status once timeout seconds have passed
+    """
+    result = await auth_service.wait_for_login_status(login_id, timeout)
+    
+    if not result:
+        raise HTTPException(status_code=404, detail="Login request not found")
+    
+    return LoginStatusResponse(**result)
+
+@router.get("/status/{login_id}/events")
+async def stream_login_status(login_id: str):
+    """
+    Stream login request status as Server-Sent Events
+    Sends the current status, then the final one, then closes
+    """
+    result = await auth_service.get_login_status(login_id)
+    
+    if not result:
+        raise HTTPException(status_code=404, detail="Login request not found")
+    
+    async def events():
+        status = result
+        yield f"event: status\ndata: {json.dumps(status)}\n\n"
+        
+        while status["status"] == "pending":
+            status = await auth_service.wait_for_login_status(
+                login_id, settings.STATUS_STREAM_KEEPALIVE_SECONDS
+            )
+            if status is None:
+                break
+            if status["status"] == "pending":
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: status\ndata: {json.dumps(status)}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,7 +1,9 @@
 """
 Pydantic schemas for API validation
 """
+from typing import Annotated, List, Optional
 from pydantic import BaseModel, Field
+from src.config import settings
 
 # Registration schemas
 class RegisterRequest(BaseModel):
@@ -10,9 +12,27 @@ class RegisterRequest(BaseModel):
 class RegisterResponse(BaseModel):
     link: str
 
+class RegisterBatchRequest(BaseModel):
+    usernames: List[Annotated[str, Field(min_length=3, max_length=50)]] = Field(
+        ..., min_length=1, max_length=settings.REGISTER_BATCH_MAX
+    )
+
+class RegisterBatchItem(BaseModel):
+    username: str
+    # Exactly one of link / error is set
+    link: Optional[str] = None
+    error: Optional[str] = None
+
+class RegisterBatchResponse(BaseModel):
+    created: int
+    results: List[RegisterBatchItem]
+
 # Login schemas
 class LoginStartRequest(BaseModel):
     username: str
+    # Random per login attempt and repeated on retries; lets a retry get
+    # the same pending request back (see LOGIN_COALESCE_WINDOW_SECONDS)
+    idempotency_key: Optional[str] = Field(default=None, min_length=16, max_length=128)
 
 class LoginStartResponse(BaseModel):
     login_id: str
@@ -34,6 +54,56 @@ class LoginConfirmResponse(BaseModel):
     status: str
     session_token: str
 
+class LoginDenyRequest(BaseModel):
+    login_id: str
+    telegram_id: int
+
+class LoginDenyResponse(BaseModel):
+    status: str
+
 class LoginStatusResponse(BaseModel):
     status: str
     session_token: str = None  # Optional, only present when status is 'approved'
+    refresh_token: Optional[str] = None  # Only on the first read after approval
+
+# Session schemas
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class RefreshResponse(BaseModel):
+    session_token: str
+    refresh_token: str  # Replaces the one sent; that one no longer works
+
+class LogoutRequest(BaseModel):
+    refresh_token: str
+    session_token: Optional[str] = None  # Also revoked when given
+    all_sessions: bool = False  # End every session of the user, not just this one
+
+class LogoutResponse(BaseModel):
+    revoked: int  # Sessions ended
+
+# Session token introspection schemas
+class IntrospectRequest(BaseModel):
+    token: str
+
+class IntrospectResponse(BaseModel):
+    active: bool
+    # Claims, only present when active
+    sub: Optional[str] = None
+    user_id: Optional[int] = None
+    exp: Optional[int] = None
+    iat: Optional[int] = None
+    jti: Optional[str] = None
+    sid: Optional[str] = None
+
+class IntrospectBatchRequest(BaseModel):
+    tokens: List[str] = Field(..., max_length=settings.INTROSPECT_BATCH_MAX)
+
+class IntrospectBatchResponse(BaseModel):
+    results: List[IntrospectResponse]
+
+class RevokeRequest(BaseModel):
+    token: str
+
+class RevokeResponse(BaseModel):
+    revoked: bool